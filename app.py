@@ -1,17 +1,27 @@
 import streamlit as st
+import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
 import time
-import datetime
 import os
-import json
-import requests
-import base64
-import pandas as pd
+import dataclasses
+import functools
 from dotenv import load_dotenv
 import threading
-import sys
-import numpy as np
-from PIL import Image
-from io import BytesIO
+import uuid
+import queue
+from importlib.util import find_spec
+
+# The CV stack (cv2, mediapipe and the modules built on them) and the LLM
+# clients are imported and built on first use, not on every rerun
+from proctoring.eventlog import EventLog, log_path, replay
+from proctoring.metrics import REGISTRY as METRICS, start_http_server
+from proctoring.quiz import BankFiller, QuestionBank, QuizCache, assemble_quiz, cache_key
+from proctoring.quizserver import quiz_frame_html, start_quiz_server, submit_watch_js
+from proctoring.report import build_report, frame_timeline
+from proctoring.risk import RiskEngine
+from proctoring.stats import SessionStats
+from proctoring.store import FrameStore
+from proctoring.tabs import HEARTBEAT_MS, TabActivityTracker, listener_js
 
 # Set page configuration
 st.set_page_config(
@@ -24,25 +34,18 @@ st.set_page_config(
 # Load environment variables
 load_dotenv()
 
-# Initialize global variables for proctoring
-face_detection = None
-face_mesh = None
-mp_drawing = None
+# 'mesh' derives face counts and blink landmarks from a single FaceMesh pass,
+# 'dual' also runs FaceDetection on every frame, 'adaptive' detects on a
+# downscaled frame and runs FaceMesh only on the tracked face region
+INFERENCE_MODE = os.getenv("PROCTORING_INFERENCE_MODE", "mesh")
 
-# Try to import OpenCV and MediaPipe
-try:
-    import cv2
-    import mediapipe as mp
-    
-    mp_face_detection = mp.solutions.face_detection
-    mp_face_mesh = mp.solutions.face_mesh
-    mp_drawing = mp.solutions.drawing_utils
-    face_detection = mp_face_detection.FaceDetection(min_detection_confidence=0.5)
-    face_mesh = mp_face_mesh.FaceMesh(min_detection_confidence=0.5, min_tracking_confidence=0.5)
-    
-    CV_AVAILABLE = True
-except ImportError:
-    CV_AVAILABLE = False
+# 'threshold' counts blinks with fixed per-frame EAR thresholds, 'series'
+# smooths the EAR series and compares it with an adaptive open-eye baseline
+BLINK_DETECTOR = os.getenv("PROCTORING_BLINK_DETECTOR", "threshold")
+
+# Check for OpenCV and MediaPipe without importing them
+CV_AVAILABLE = find_spec("cv2") is not None and find_spec("mediapipe") is not None
+if not CV_AVAILABLE:
     st.sidebar.warning("OpenCV or MediaPipe couldn't be imported. Camera-based proctoring features will be limited.")
 
 # Try to import streamlit_javascript
@@ -53,35 +56,138 @@ except ImportError:
     JS_AVAILABLE = False
     st.sidebar.warning("streamlit-javascript couldn't be imported. Tab switching detection will be disabled.")
 
-# Initialize Groq client
+# Groq settings; the client itself is built lazily by get_quiz_client
 groq_api_key = os.getenv("GROQ_API_KEY")
-groq_client = None
 GROQ_MODEL = "llama3-8b-8192"
 
-try:
-    from groq import Groq
-    if groq_api_key:
-        groq_client = Groq(api_key=groq_api_key)
-    else:
-        st.sidebar.error("GROQ_API_KEY not found. Please add it to your .env file or Streamlit secrets.")
-    GROQ_AVAILABLE = True
-except ImportError:
-    GROQ_AVAILABLE = False
+GROQ_AVAILABLE = find_spec("groq") is not None
+if GROQ_AVAILABLE and not groq_api_key:
+    st.sidebar.error("GROQ_API_KEY not found. Please add it to your .env file or Streamlit secrets.")
+elif not GROQ_AVAILABLE:
     st.sidebar.error("The groq package is not installed. Please make sure it's in your requirements.txt file.")
 
+# "groq" generates quizzes with the Groq API, "fake" with a local stand-in (no network)
+LLM_BACKEND = os.getenv("PROCTORING_LLM_BACKEND", "groq")
+LLM_CONCURRENCY = int(os.getenv("PROCTORING_LLM_CONCURRENCY", "4"))
+
+# Target analysis rate for the webcam pipeline
+TARGET_FPS = int(os.getenv("PROCTORING_TARGET_FPS", "15"))
+
+# Directory for spilling long sessions' per-frame data to disk (unset keeps it in memory)
+SPILL_DIR = os.getenv("PROCTORING_SPILL_DIR")
+
+# Webcam preview: encoded once per frame at its own, lower rate than the analysis
+PREVIEW_FPS = float(os.getenv("PROCTORING_PREVIEW_FPS", "5"))
+PREVIEW_FORMAT = os.getenv("PROCTORING_PREVIEW_FORMAT", "jpeg")
+PREVIEW_QUALITY = int(os.getenv("PROCTORING_PREVIEW_QUALITY", "70"))
+PREVIEW_WIDTH = int(os.getenv("PROCTORING_PREVIEW_WIDTH", "640"))
+PREVIEW_OVERLAYS = os.getenv("PROCTORING_PREVIEW_OVERLAYS", "1") != "0"
+
+# While the scene is static, run full inference only every this many seconds (0 analyzes every frame)
+STATIC_INTERVAL = float(os.getenv("PROCTORING_STATIC_INTERVAL", "0"))
+
+# Local port serving /metrics and /metrics.json (unset disables the endpoint)
+METRICS_PORT = os.getenv("PROCTORING_METRICS_PORT")
+
+# Generated quizzes and the question bank are kept here ("" keeps them in memory only)
+QUIZ_CACHE_DIR = os.getenv("PROCTORING_QUIZ_CACHE_DIR", ".quiz_cache")
+QUIZ_CACHE_TTL = float(os.getenv("PROCTORING_QUIZ_CACHE_TTL", str(7 * 24 * 3600)))
+# Comma-separated "topic:difficulty" banks to pre-generate in the background
+QUIZ_BANK_TOPICS = [spec for spec in os.getenv("PROCTORING_QUIZ_BANK_TOPICS", "").split(",") if spec.strip()]
+
+# Per-session append-only event logs, replayed when a session is resumed (unset disables them)
+EVENT_LOG_DIR = os.getenv("PROCTORING_EVENT_LOG_DIR")
+
+# Number of inference worker processes shared by all sessions (0 runs inference in-process)
+INFERENCE_WORKERS = int(os.getenv("PROCTORING_INFERENCE_WORKERS", "0"))
+# Hand frames to inference workers through shared memory rings instead of pickling them
+SHARED_MEMORY_FRAMES = os.getenv("PROCTORING_SHARED_MEMORY_FRAMES", "1") != "0"
+
+# Quizzes come from the LLM only if its backend can run; otherwise the demo quiz is used
+LLM_READY = LLM_BACKEND == "fake" or (GROQ_AVAILABLE and bool(groq_api_key))
+
+# Serve the Take Quiz page from a small local HTTP server instead of rerunning
+# the app on every click (unset keeps the Streamlit widgets)
+QUIZ_PORT = os.getenv("PROCTORING_QUIZ_PORT")
+# The same server receives the tab listener's events, so it always runs (on 8502 by default)
+QUIZ_SERVER_PORT = int(QUIZ_PORT or "8502")
+# Candidates' browsers post to it, so it listens on every interface unless told otherwise
+QUIZ_HOST = os.getenv("PROCTORING_QUIZ_HOST", "0.0.0.0")
+# The server's URL as candidates' browsers reach it (e.g. behind a TLS proxy); unset means
+# the same host as the app, on QUIZ_SERVER_PORT, over the app's scheme
+QUIZ_URL = os.getenv("PROCTORING_QUIZ_URL", "").rstrip("/")
+QUIZ_FRAME_HEIGHT = 450
+
+# How long ending the exam waits for the webcam loop to record its last results (seconds)
+WEBCAM_STOP_TIMEOUT = 5.0
+
+# Build the CV models and LLM client in the background when the server starts
+WARMUP = os.getenv("PROCTORING_WARMUP", "0") != "0"
+
+TAB_SWITCH_WARNING = "Tab switch detected! Please focus on the exam."
+# Warn when the page's tab listener has not posted for this long (it posts at least every HEARTBEAT_MS)
+TAB_LISTENER_TIMEOUT = 3 * HEARTBEAT_MS / 1000
+
+def requested_session_id():
+    """Session id from the URL if it is well formed, so a refreshed page can resume its event log"""
+    requested = st.query_params.get('session', '')
+    try:
+        return requested if uuid.UUID(hex=requested).hex == requested else None
+    except ValueError:
+        return None
+
+def session_report(proctoring_data, end):
+    """Report for a session's proctoring data, with open away periods counted up to ``end``"""
+    return build_report(
+        proctoring_data['stats'].snapshot(),
+        proctoring_data['time_on_camera'],
+        proctoring_data['tab_switches'],
+        proctoring_data['risk'].snapshot(),
+        proctoring_data['tabs'].snapshot(end),
+        frame_timeline(proctoring_data['frames'])
+    )
+
+def restore_session(session):
+    """Load a session rebuilt by eventlog.replay into session state"""
+    st.session_state.proctoring_data = session['proctoring_data']
+    st.session_state.start_time = session['start_time']
+    st.session_state.quiz_data = session['quiz_data']
+    st.session_state.user_answers = session['user_answers']
+    st.session_state.quiz_submitted = session['submitted']
+    if session['submitted']:
+        proctoring_data = session['proctoring_data']
+        st.session_state.report_data = session_report(proctoring_data, proctoring_data['stats'].last_timestamp)
+        proctoring_data['frames'].close()
+    # This page load starts a fresh tab listener
+    st.session_state.proctoring_data['tabs'].reset_sequence()
+
 # Session state initialization
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = (EVENT_LOG_DIR and requested_session_id()) or uuid.uuid4().hex
+    st.query_params['session'] = st.session_state.session_id
+if 'event_log' not in st.session_state:
+    st.session_state.event_log = None
+    if EVENT_LOG_DIR:
+        path = log_path(EVENT_LOG_DIR, st.session_state.session_id)
+        if os.path.exists(path):
+            restore_session(replay(path, spill_dir=SPILL_DIR))
+        # A submitted exam's log is complete; it is only reopened while the exam runs
+        if not st.session_state.get('quiz_submitted'):
+            st.session_state.event_log = EventLog(path)
+            st.session_state.event_log.page_load(time.time())
 if 'start_time' not in st.session_state:
     st.session_state.start_time = None
 if 'proctoring_data' not in st.session_state:
     st.session_state.proctoring_data = {
-        'face_counts': [],
-        'blink_counts': [],
+        'frames': FrameStore(spill_dir=SPILL_DIR),
+        'stats': SessionStats(),
+        'risk': RiskEngine(),
         'tab_switches': 0,
-        'time_on_camera': 0,
-        'timestamps': []
+        'tabs': TabActivityTracker(),
+        'time_on_camera': 0
     }
-if 'tab_switch_detected' not in st.session_state:
-    st.session_state.tab_switch_detected = False
+if 'tab_token' not in st.session_state:
+    st.session_state.tab_token = None
 if 'quiz_data' not in st.session_state:
     st.session_state.quiz_data = None
 if 'user_answers' not in st.session_state:
@@ -92,12 +198,8 @@ if 'report_data' not in st.session_state:
     st.session_state.report_data = None
 if 'quiz_submitted' not in st.session_state:
     st.session_state.quiz_submitted = False
-if 'blink_counter' not in st.session_state:
-    st.session_state.blink_counter = 0
-if 'last_blink_check' not in st.session_state:
-    st.session_state.last_blink_check = time.time()
-if 'blink_state' not in st.session_state:
-    st.session_state.blink_state = 'OPEN'
+if 'quiz_token' not in st.session_state:
+    st.session_state.quiz_token = None
 
 # CSS for better UI
 st.markdown("""
@@ -136,7 +238,7 @@ st.markdown("""
 
 def generate_quiz(topic, difficulty, num_questions, time_limit):
     """Generate a quiz using Groq API or fallback to demo data if API is unavailable"""
-    if groq_client is None:
+    if not LLM_READY:
         st.warning("Groq API key not configured. Using demo quiz data.")
         return {
             "title": f"Demo Quiz: {topic}",
@@ -176,57 +278,42 @@ def generate_quiz(topic, difficulty, num_questions, time_limit):
             ]
         }
     
+    quiz_client = get_quiz_client()
+    quiz_cache = get_quiz_cache()
+    key = cache_key(quiz_client.model, topic, difficulty, num_questions, time_limit)
+    cached = quiz_cache.get(key)
+    if cached is not None:
+        METRICS.increment('proctoring_quiz_cache_total', result='hit')
+        return cached
+
+    bank, bank_filler = get_question_bank()
+    questions = bank.sample(topic, difficulty, num_questions)
+    if questions is not None:
+        METRICS.increment('proctoring_quiz_cache_total', result='bank')
+        bank_filler.request(topic, difficulty)
+        return assemble_quiz(questions, topic, difficulty, time_limit)
+
+    METRICS.increment('proctoring_quiz_cache_total', result='miss')
     try:
-        prompt = f"""
-        Create a quiz on the topic of {topic} with {num_questions} questions.
-        Difficulty level: {difficulty}
-        Time limit: {time_limit} minutes
-        
-        Format the questions as a JSON array with the following structure:
-        {{
-            "title": "Quiz title",
-            "description": "Brief description of the quiz",
-            "time_limit_minutes": {time_limit},
-            "questions": [
-                {{
-                    "id": 1,
-                    "question": "Question text",
-                    "options": ["Option A", "Option B", "Option C", "Option D"],
-                    "correct_answer": "Correct option letter"
-                }},
-                ...
-            ]
-        }}
-        
-        Ensure that all questions are well-structured and appropriate for the given difficulty level.
-        Return only the JSON structure without any additional text.
-        """
-        
-        chat_completion = groq_client.chat.completions.create(
-            model=GROQ_MODEL,
-            messages=[
-                {"role": "system", "content": "You are a helpful quiz generator assistant."},
-                {"role": "user", "content": prompt}
-            ],
-            max_tokens=4000,
-            temperature=0.5
-        )
-        
-        response_text = chat_completion.choices[0].message.content
-        
-        import re
-        json_match = re.search(r'```json\n([\s\S]*?)\n```', response_text)
-        if json_match:
-            json_str = json_match.group(1)
-        else:
-            json_str = response_text
-            
-        start_idx = json_str.find('{')
-        end_idx = json_str.rfind('}') + 1
-        if start_idx != -1 and end_idx != -1:
-            json_str = json_str[start_idx:end_idx]
-            
-        quiz_data = json.loads(json_str)
+        # Questions stream in on the client's loop thread; show them as they arrive
+        progress = st.empty()
+        streamed = queue.Queue()
+        future = quiz_client.submit(topic, difficulty, num_questions, time_limit, on_question=streamed.put)
+        with METRICS.stage('quiz_llm_request'):
+            received = 0
+            while not future.done() or not streamed.empty():
+                try:
+                    question = streamed.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                received += 1
+                progress.info(f"Received question {received}/{num_questions}: {question.get('question', '')}")
+            quiz_data = future.result()
+        progress.empty()
+
+        quiz_cache.put(key, quiz_data)
+        bank.add(topic, difficulty, quiz_data.get('questions', []))
+        bank_filler.request(topic, difficulty)
         return quiz_data
     
     except Exception as e:
@@ -257,243 +344,369 @@ def generate_quiz(topic, difficulty, num_questions, time_limit):
             ]
         }
 
-def detect_blinks(landmarks, face_oval):
-    """Detect eye blinks using facial landmarks with state machine"""
-    if not CV_AVAILABLE or not landmarks:
-        return False
-        
-    try:
-        # Corrected landmark indices for left and right eyes
-        left_eye = [
-            landmarks[362],  # p1: left
-            landmarks[386],  # p2: top left
-            landmarks[387],  # p3: top right
-            landmarks[385],  # p4: right
-            landmarks[380],  # p5: bottom right
-            landmarks[374]   # p6: bottom left
-        ]
-        
-        right_eye = [
-            landmarks[33],   # p1: right
-            landmarks[159],  # p2: top right
-            landmarks[158],  # p3: top left
-            landmarks[133],  # p4: left
-            landmarks[145],  # p5: bottom left
-            landmarks[144]   # p6: bottom right
-        ]
-        
-        def calculate_ear(eye_points):
-            height_1 = np.linalg.norm(np.array(eye_points[1]) - np.array(eye_points[5]))
-            height_2 = np.linalg.norm(np.array(eye_points[2]) - np.array(eye_points[4]))
-            width = np.linalg.norm(np.array(eye_points[0]) - np.array(eye_points[3]))
-            ear = (height_1 + height_2) / (2.0 * width)
-            return ear
-        
-        left_ear = calculate_ear(left_eye)
-        right_ear = calculate_ear(right_eye)
-        
-        EAR_THRESHOLD = 0.2
-        OPEN_THRESHOLD = 0.3
-        
-        current_time = time.time()
-        
-        # State machine for blink detection
-        if st.session_state.blink_state == 'OPEN' and left_ear < EAR_THRESHOLD and right_ear < EAR_THRESHOLD:
-            st.session_state.blink_state = 'CLOSED'
-            st.session_state.last_blink_check = current_time
-        elif st.session_state.blink_state == 'CLOSED' and left_ear > OPEN_THRESHOLD and right_ear > OPEN_THRESHOLD:
-            if current_time - st.session_state.last_blink_check < 0.5:  # Ensure blink duration is reasonable
-                st.session_state.blink_counter += 1
-                st.session_state.blink_state = 'OPEN'
-                st.session_state.last_blink_check = current_time
-                return True
-            st.session_state.blink_state = 'OPEN'
-        
-        return False
-    
-    except Exception as e:
-        st.error(f"Error in blink detection: {str(e)}")
-        return False
+@st.cache_resource
+def get_metrics_server():
+    """Start the metrics endpoint once per process"""
+    return start_http_server(int(METRICS_PORT)) if METRICS_PORT else None
+
+get_metrics_server()
+
+@st.cache_resource
+def get_quiz_client():
+    """Async quiz generation client shared by every session"""
+    from proctoring.llm import AsyncQuizClient, FakeBackend, GroqBackend
+
+    if LLM_BACKEND == "fake":
+        backend = FakeBackend()
+    else:
+        backend = GroqBackend(api_key=groq_api_key, model=GROQ_MODEL)
+    return AsyncQuizClient(backend, max_concurrency=LLM_CONCURRENCY).start()
+
+@st.cache_resource
+def get_quiz_cache():
+    """Generated quizzes shared across sessions and persisted under QUIZ_CACHE_DIR"""
+    return QuizCache(cache_dir=QUIZ_CACHE_DIR or None, ttl=QUIZ_CACHE_TTL)
+
+@st.cache_resource
+def get_question_bank():
+    """Question bank and its background filler, pre-filled for QUIZ_BANK_TOPICS"""
+    bank = QuestionBank(cache_dir=QUIZ_CACHE_DIR or None)
+    quiz_client = get_quiz_client() if LLM_READY else None
+    filler = BankFiller(
+        bank,
+        lambda topic, difficulty, count: quiz_client.generate_sync(topic, difficulty, count, 10)
+    )
+    if LLM_READY:
+        for spec in QUIZ_BANK_TOPICS:
+            topic, _, difficulty = spec.rpartition(':')
+            if topic:
+                filler.request(topic.strip(), difficulty.strip())
+    return bank, filler
+
+@st.cache_resource
+def get_quiz_store():
+    """Start the quiz server once per process; returns its session store"""
+    return start_quiz_server(QUIZ_SERVER_PORT, host=QUIZ_HOST)[1]
+
+@st.cache_resource
+def get_model_pool():
+    """MediaPipe graphs reused across reruns and sessions (each session holds its own pair)"""
+    from proctoring.engine import ModelPool
+
+    return ModelPool(INFERENCE_MODE)
+
+@st.cache_resource
+def start_warmup():
+    """Build the LLM client, inference workers and CV graphs once per server process"""
+    if LLM_READY:
+        get_quiz_client()
+    if not CV_AVAILABLE:
+        return None
+    if INFERENCE_WORKERS > 0:
+        get_inference_server()
+        return None
+    # Graph construction takes seconds; keep it off the script thread
+    thread = threading.Thread(target=get_model_pool().warm_up, name='proctoring-warmup', daemon=True)
+    thread.start()
+    return thread
 
-def process_webcam_feed():
-    """Process webcam feed to detect faces and eye blinks"""
-    if not st.session_state.monitoring_active or not CV_AVAILABLE:
+@st.cache_resource
+def get_inference_server():
+    """Process-wide inference worker pool shared by every Streamlit session"""
+    from proctoring.server import InferenceServer, series_analyzer_factory
+
+    options = {'analyzer_factory': series_analyzer_factory} if BLINK_DETECTOR == "series" else {}
+    return InferenceServer(num_workers=INFERENCE_WORKERS, mode=INFERENCE_MODE,
+                           shared_memory=SHARED_MEMORY_FRAMES, **options).start()
+
+if WARMUP:
+    start_warmup()
+
+class WebcamFeed:
+    """State the webcam threads share with the script thread
+
+    Everything the threads write to (stats, risk engine, frame store, event
+    log) is captured here by reference on the script thread, so they never
+    touch ``st.session_state``. Each script run points ``preview`` at its
+    own placeholder; the webcam thread only ever writes the preview image
+    there, and leaves errors in ``error`` for the script thread to show.
+    """
+
+    def __init__(self, proctoring_data, event_log, start_time, session_id):
+        self.proctoring_data = proctoring_data
+        self.event_log = event_log
+        self.start_time = start_time
+        self.session_id = session_id
+        self.stop = threading.Event()
+        self.preview = None
+        self.error = None
+        self.thread = None
+
+def record_frame_result(result, feed, blink_offset=0):
+    """Store a FrameResult from the analysis engine in the feed's proctoring data
+
+    Runs on the pipeline's inference thread. ``blink_offset`` is the count
+    from before this analyzer started (an earlier run, or a resumed
+    session), which its own count continues.
+    """
+    blink_count = result.blink_count + blink_offset
+    event_log = feed.event_log
+    if event_log is not None and not event_log.closed:
+        event_log.frame(result.timestamp, result.face_count, blink_count)
+    proctoring_data = feed.proctoring_data
+    proctoring_data['frames'].append(
+        timestamps=result.timestamp,
+        face_counts=result.face_count,
+        blink_counts=blink_count
+    )
+    proctoring_data['stats'].update(result.timestamp, result.face_count, blink_count)
+    proctoring_data['risk'].observe_frame(result.timestamp, result.face_count, blink_count)
+
+    if feed.start_time is not None:
+        proctoring_data['time_on_camera'] = result.timestamp - feed.start_time
+
+def record_final_blinks(feed, blink_count):
+    """Store the blink count from flushing the detector when monitoring stops"""
+    stats = feed.proctoring_data['stats']
+    if blink_count == stats.blink_count:
+        return
+    stats.set_blink_count(blink_count)
+    event_log = feed.event_log
+    if event_log is not None and not event_log.closed:
+        event_log.blinks(time.time(), blink_count)
+
+def start_monitoring():
+    """Start the webcam loop on its own thread, capturing what it needs on the script thread"""
+    feed = WebcamFeed(
+        st.session_state.proctoring_data,
+        st.session_state.event_log,
+        st.session_state.start_time,
+        st.session_state.session_id
+    )
+    feed.preview = st.empty()
+    feed.thread = threading.Thread(target=process_webcam_feed, args=(feed,), name='proctoring-webcam', daemon=True)
+    # Only the preview placeholder is written from this thread; it needs the session's context for that
+    add_script_run_ctx(feed.thread, get_script_run_ctx())
+    st.session_state.webcam_feed = feed
+    feed.thread.start()
+
+def stop_monitoring():
+    """Stop the webcam loop and wait for it, so its last blinks are counted before a report is built"""
+    st.session_state.monitoring_active = False
+    feed = st.session_state.get('webcam_feed')
+    if feed is not None:
+        feed.stop.set()
+        if feed.thread is not threading.current_thread():
+            feed.thread.join(WEBCAM_STOP_TIMEOUT)
+    st.session_state.webcam_feed = None
+
+def close_event_log():
+    """Flush and close the session's event log once the exam is submitted"""
+    if st.session_state.event_log is not None:
+        st.session_state.event_log.close()
+        st.session_state.event_log = None
+
+def close_tab_inbox():
+    """Stop accepting tab events for this session once the exam is submitted"""
+    if st.session_state.tab_token is not None:
+        get_quiz_store().close_inbox(st.session_state.tab_token)
+        st.session_state.tab_token = None
+
+def finish_exam():
+    """Stop proctoring, build the report and release what the running exam held"""
+    stop_monitoring()
+    st.session_state.report_data = generate_report()
+    close_event_log()
+    close_tab_inbox()
+    # The report has the frame timeline; drop the frames and any spill files
+    st.session_state.proctoring_data['frames'].close()
+
+def process_webcam_feed(feed):
+    """Process webcam feed to detect faces and eye blinks (runs on the feed's thread)"""
+    if feed.stop.is_set() or not CV_AVAILABLE:
         return
     
+    import cv2
+    from proctoring.blinks import SeriesBlinkDetector
+    from proctoring.engine import FrameAnalyzer
+    from proctoring.pipeline import ProctoringPipeline
+    from proctoring.preview import PreviewEncoder
+    from proctoring.scheduler import InferenceScheduler
+
+    models = None
+    blink_offset = None
     try:
         cap = cv2.VideoCapture(0)
         if not cap.isOpened():
-            st.error("Could not open webcam. Please check your camera connection.")
+            feed.error = "Could not open webcam. Please check your camera connection."
             return
         
-        stframe = st.empty()
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
         
-        while st.session_state.monitoring_active:
-            ret, frame = cap.read()
-            if not ret:
-                st.error("Failed to get frame from webcam.")
-                break
-            
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_results = face_detection.process(rgb_frame)
-            mesh_results = face_mesh.process(rgb_frame)
-            
-            face_count = 0
-            if face_results.detections:
-                face_count = len(face_results.detections)
-                for detection in face_results.detections:
-                    mp_drawing.draw_detection(frame, detection)
-            
-            landmarks_list = []
-            if mesh_results.multi_face_landmarks:
-                for face_landmarks in mesh_results.multi_face_landmarks:
-                    landmarks = []
-                    for landmark in face_landmarks.landmark:
-                        x = int(landmark.x * frame.shape[1])
-                        y = int(landmark.y * frame.shape[0])
-                        landmarks.append((x, y))
-                    
-                    landmarks_list.append(landmarks)
-                    
-                    face_oval = [
-                        10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288,
-                        397, 365, 379, 378, 400, 377, 152, 148, 176, 149, 150, 136,
-                        172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109
-                    ]
-                    
-                    blink_detected = detect_blinks(landmarks, face_oval)
-                    
-                    mp_drawing.draw_landmarks(
-                        frame, 
-                        face_landmarks,
-                        mp_face_mesh.FACEMESH_CONTOURS,
-                        landmark_drawing_spec=None,
-                        connection_drawing_spec=mp.solutions.drawing_styles.get_default_face_mesh_contours_style()
-                    )
-            
-            timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-            st.session_state.proctoring_data['face_counts'].append(face_count)
-            st.session_state.proctoring_data['blink_counts'].append(st.session_state.blink_counter)
-            st.session_state.proctoring_data['timestamps'].append(timestamp)
-            
-            frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            info_text = f"Faces: {face_count} | Blinks: {st.session_state.blink_counter} | Tab Switches: {st.session_state.proctoring_data['tab_switches']}"
-            cv2.putText(frame, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-            
-            if face_count > 1:
-                warning_text = "WARNING: Multiple faces detected!"
-                cv2.putText(frame, warning_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            
-            if face_count == 0:
-                warning_text = "WARNING: No face detected!"
-                cv2.putText(frame, warning_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 0, 255), 2)
-            
-            stframe.image(frame, channels="RGB", use_column_width=True)
-            
-            if st.session_state.start_time is not None:
-                st.session_state.proctoring_data['time_on_camera'] = time.time() - st.session_state.start_time
-            
-            time.sleep(0.5)  # Reduced frequency to optimize performance
+        metrics_labels = {'session': feed.session_id[:8]}
+        if INFERENCE_WORKERS > 0:
+            analyzer = get_inference_server().open_session(feed.session_id)
+        else:
+            scheduler = InferenceScheduler(static_interval=STATIC_INTERVAL) if STATIC_INTERVAL > 0 else None
+            models = get_model_pool().acquire()
+            blink_detector = SeriesBlinkDetector() if BLINK_DETECTOR == "series" else None
+            analyzer = FrameAnalyzer(*models, blink_detector=blink_detector, mode=INFERENCE_MODE,
+                                     metrics_labels=metrics_labels, scheduler=scheduler)
+        # A new analyzer counts blinks from 0; keep the ones already recorded
+        blink_offset = feed.proctoring_data['stats'].blink_count
+        analyzer.subscribe(functools.partial(record_frame_result, feed=feed, blink_offset=blink_offset))
+        preview = PreviewEncoder(
+            format=PREVIEW_FORMAT,
+            quality=PREVIEW_QUALITY,
+            max_width=PREVIEW_WIDTH,
+            fps=PREVIEW_FPS,
+            overlays=PREVIEW_OVERLAYS
+        )
+        # Only frames the preview will show are copied out of the capture ring and handed over
+        pipeline = ProctoringPipeline(cap, analyzer, target_fps=TARGET_FPS, metrics_labels=metrics_labels,
+                                      render_due=preview.due).start()
+        
+        # Render stage: show the newest analyzed frame, older ones are dropped
+        while not feed.stop.is_set() and pipeline.running:
+            item = pipeline.get_rendered(timeout=1.0)
+            if item is None:
+                continue
+            frame, result = item
+            if blink_offset:
+                result = dataclasses.replace(result, blink_count=result.blink_count + blink_offset)
+            image = preview.encode(frame, result, feed.proctoring_data['tab_switches'])
+            with METRICS.stage('ui_push'):
+                feed.preview.image(image, use_column_width=True)
+        
+        if pipeline.error:
+            feed.error = pipeline.error
     
     except Exception as e:
-        st.error(f"Error in webcam processing: {str(e)}")
+        feed.error = f"Error in webcam processing: {str(e)}"
     finally:
+        if 'pipeline' in locals() and pipeline is not None:
+            pipeline.stop()
+        if blink_offset is not None:
+            try:
+                # The series detector holds back blinks until later frames arrive
+                record_final_blinks(feed, analyzer.flush() + blink_offset)
+            except Exception as e:
+                feed.error = f"Could not count the final blinks: {str(e)}"
+        if INFERENCE_WORKERS > 0 and 'analyzer' in locals():
+            analyzer.close()
+        if models is not None:
+            get_model_pool().release(models)
         if 'cap' in locals() and cap is not None:
             cap.release()
+        if 'metrics_labels' in locals():
+            # Per-session series would otherwise pile up for as long as the server runs
+            METRICS.remove(**metrics_labels)
 
-def detect_tab_switch():
-    """Detect tab switching using JavaScript"""
+def get_tab_inbox():
+    """Inbox on the quiz server that this session's tab listener posts events to"""
+    store = get_quiz_store()
+    inbox = store.inbox(st.session_state.tab_token) if st.session_state.tab_token else None
+    if inbox is None:
+        st.session_state.tab_token, inbox = store.open_inbox()
+    return inbox
+
+def install_tab_listener():
+    """Render the component that installs the tab listener in the exam page"""
     if not st.session_state.monitoring_active or not JS_AVAILABLE:
         return
-        
     try:
-        js_code = """
-        var hidden, visibilityChange;
-        if (typeof document.hidden !== "undefined") {
-            hidden = "hidden";
-            visibilityChange = "visibilitychange";
-        } else if (typeof document.msHidden !== "undefined") {
-            hidden = "msHidden";
-            visibilityChange = "msvisibilitychange";
-        } else if (typeof document.webkitHidden !== "undefined") {
-            hidden = "webkitHidden";
-            visibilityChange = "webkitvisibilitychange";
-        }
-        
-        var isHidden = function() {
-            return document[hidden];
-        };
+        inbox = get_tab_inbox()
+        # Same code and key on every rerun: the component mounts (and installs the listener) once per
+        # inbox; it only runs its code on mounting, so a new inbox needs a new key to repoint the listener
+        st_js.st_javascript(listener_js(f"/api/{st.session_state.tab_token}/tabs", QUIZ_URL, QUIZ_SERVER_PORT),
+                            key=f"tab_listener_{st.session_state.tab_token}")
+    except Exception as e:
+        st.warning(f"Tab switch detection could not be started: {str(e)}")
+        return
+    if inbox.silent_for() > TAB_LISTENER_TIMEOUT:
+        server = QUIZ_URL or f"port {QUIZ_SERVER_PORT} of this host"
+        st.warning(f"Tab switch detection is not reaching the quiz server ({server}); "
+                   "tab switches are not being recorded.")
+
+def detect_tab_switch():
+    """Apply the tab visibility/focus events the listener posted since the last call; True if the candidate left the page"""
+    if not st.session_state.monitoring_active or not JS_AVAILABLE:
+        return False
         
-        isHidden();
-        """
+    try:
+        tabs = st.session_state.proctoring_data['tabs']
+        with METRICS.stage('tab_events'):
+            events = get_tab_inbox().drain()
+        if events and st.session_state.event_log is not None:
+            st.session_state.event_log.tab_events(events)
+        METRICS.increment('proctoring_tab_events_total', len(events))
+        switch_times = tabs.ingest(events)
         
-        is_hidden = st_js.st_javascript(js_code)
+        for timestamp in switch_times:
+            st.session_state.proctoring_data['risk'].record_event('tab_switch', timestamp)
+        st.session_state.proctoring_data['tab_switches'] = tabs.switches
         
-        if is_hidden and not st.session_state.tab_switch_detected:
-            st.session_state.tab_switch_detected = True
-            st.session_state.proctoring_data['tab_switches'] += 1
-            st.warning("Tab switch detected! Please focus on the exam.")
-        elif not is_hidden:
-            st.session_state.tab_switch_detected = False
+        return bool(switch_times) or tabs.away
     except Exception as e:
-        pass
+        st.warning(f"Could not read tab switch events: {str(e)}")
+        return False
+
+def show_time_remaining(timer, deadline):
+    remaining_time = max(0, deadline - time.time())
+    minutes, seconds = divmod(int(remaining_time), 60)
+    timer.markdown(f"**Time Remaining:** {minutes:02d}:{seconds:02d}")
+    return remaining_time
+
+def serve_quiz(quiz_data, timer=None, deadline=None):
+    """Embed the quiz from the quiz server; its submission (or running out of time) reruns the app once"""
+    store = get_quiz_store()
+    quiz_session = store.get(st.session_state.quiz_token) if st.session_state.quiz_token else None
+    if quiz_session is None:
+        event_log = st.session_state.event_log
+        st.session_state.quiz_token, quiz_session = store.register(
+            quiz_data,
+            on_answer=event_log.answer if event_log is not None else None,
+            on_submit=event_log.submit if event_log is not None else None,
+            answers=st.session_state.user_answers
+        )
+    quiz_session.deadline = deadline
+    
+    st.session_state.user_answers.update(quiz_session.answers)
+    if quiz_session.submitted:
+        st.session_state.quiz_submitted = True
+        finish_exam()
+        store.remove(st.session_state.quiz_token)
+        st.session_state.quiz_token = None
+        st.success("Quiz submitted.")
+        return
+    
+    if timer is not None:
+        # The quiz page counts down (and submits when time runs out) itself
+        timer.empty()
+    components.html(quiz_frame_html(st.session_state.quiz_token, QUIZ_URL, QUIZ_SERVER_PORT, QUIZ_FRAME_HEIGHT),
+                    height=QUIZ_FRAME_HEIGHT + 10)
+    if detect_tab_switch():
+        st.warning(TAB_SWITCH_WARNING)
+    # Answering inside the frame never reruns the app; submitting it does,
+    # through this component, which mounts once per quiz and then waits
+    if JS_AVAILABLE:
+        try:
+            st_js.st_javascript(submit_watch_js(st.session_state.quiz_token),
+                                key=f"quiz_submit_{st.session_state.quiz_token}")
+            return
+        except Exception as e:
+            st.warning(f"Quiz submission cannot be followed automatically: {str(e)}")
+    st.caption("After submitting the quiz, click below to see your result.")
+    # Any click reruns the app, which picks up the submission
+    st.button("Continue")
 
 def generate_report():
     """Generate a comprehensive proctoring report"""
     if not st.session_state.proctoring_data:
         return None
     
-    total_time = st.session_state.proctoring_data['time_on_camera']
-    face_counts = st.session_state.proctoring_data['face_counts']
-    no_face_count = face_counts.count(0)
-    multiple_face_instances = sum(1 for count in face_counts if count > 1)
-    
-    time_per_frame = total_time / len(face_counts) if len(face_counts) > 0 else 0
-    time_without_face = no_face_count * time_per_frame
-    
-    face_visibility_percentage = (1 - (time_without_face / total_time)) * 100 if total_time > 0 else 0
-    
-    # Adjust blink rate to exclude no-face periods
-    valid_frames = len([count for count in face_counts if count == 1])
-    valid_time = valid_frames * time_per_frame if valid_frames > 0 else 0
-    blink_rate = st.session_state.blink_counter / (valid_time / 60) if valid_time > 0 else 0
-    
-    report = {
-        'total_exam_time_minutes': round(total_time / 60, 2),
-        'face_visibility_percentage': round(face_visibility_percentage, 2),
-        'no_face_detected_instances': no_face_count,
-        'multiple_faces_detected_instances': multiple_face_instances,
-        'total_blinks': st.session_state.blink_counter,
-        'blink_rate_per_minute': round(blink_rate, 2),
-        'tab_switches': st.session_state.proctoring_data['tab_switches'],
-        'potential_cheating_risk': calculate_cheating_risk(
-            face_visibility_percentage, 
-            multiple_face_instances,
-            st.session_state.proctoring_data['tab_switches'],
-            total_time
-        )
-    }
-    
-    return report
-
-def calculate_cheating_risk(face_visibility, multiple_faces, tab_switches, total_time):
-    """Calculate a simple cheating risk score"""
-    total_time_minutes = total_time / 60
-    risk_score = 0
-    
-    if face_visibility < 90:
-        risk_score += (90 - face_visibility) * 0.5
-    risk_score += multiple_faces * 20
-    risk_score += tab_switches * 10
-    risk_score = risk_score / max(total_time_minutes, 1)
-    risk_score = min(risk_score, 100)
-    
-    if risk_score < 20:
-        return "Low"
-    elif risk_score < 50:
-        return "Medium"
-    else:
-        return "High"
+    with METRICS.stage('report'):
+        return session_report(st.session_state.proctoring_data, time.time())
 
 def main():
     st.markdown("<h1 class='header'>AI-Based Proctoring System with Quiz Generation</h1>", unsafe_allow_html=True)
@@ -521,21 +734,36 @@ def main():
             st.subheader("Proctoring Information")
             if st.session_state.monitoring_active:
                 st.success("Proctoring is active")
+                feed = st.session_state.get('webcam_feed')
+                if feed is not None:
+                    # The webcam thread draws into this run's placeholder from now on
+                    feed.preview = st.empty()
+                    if feed.error:
+                        st.error(feed.error)
                 if st.button("Stop Proctoring"):
-                    st.session_state.monitoring_active = False
+                    stop_monitoring()
                     
-                st.metric("Faces Detected", 
-                          st.session_state.proctoring_data['face_counts'][-1] if st.session_state.proctoring_data['face_counts'] else 0)
-                st.metric("Total Blinks", st.session_state.blink_counter)
+                stats = st.session_state.proctoring_data['stats']
+                st.metric("Faces Detected", stats.last_face_count)
+                st.metric("Total Blinks", stats.blink_count)
                 st.metric("Tab Switches", st.session_state.proctoring_data['tab_switches'])
+                risk = st.session_state.proctoring_data['risk'].snapshot()
+                st.metric("Live Risk", f"{risk['level']} ({risk['score']:.0f})")
+                if risk['alert_count']:
+                    latest_alert = st.session_state.proctoring_data['risk'].alerts[-1]
+                    st.warning(f"Risk alert: {latest_alert['rule'].replace('_', ' ')} ({latest_alert['score']:.0f})")
                 time_on_camera = st.session_state.proctoring_data['time_on_camera']
                 st.metric("Time (minutes)", round(time_on_camera / 60, 2) if time_on_camera else 0)
             else:
                 st.warning("Proctoring is not active")
                 if st.button("Start Proctoring"):
                     st.session_state.monitoring_active = True
-                    st.session_state.start_time = time.time()
-                    threading.Thread(target=process_webcam_feed, daemon=True).start()
+                    # Resuming (after a refresh or a stop) keeps the exam's original start
+                    if st.session_state.start_time is None or st.session_state.quiz_submitted:
+                        st.session_state.start_time = time.time()
+                    if st.session_state.event_log is not None:
+                        st.session_state.event_log.start(st.session_state.start_time)
+                    start_monitoring()
         
         elif page == "View Report":
             st.subheader("Report Information")
@@ -554,7 +782,7 @@ def main():
             difficulty = st.select_slider("Difficulty Level", options=["Easy", "Medium", "Hard"])
         
         with col2:
-            num_questions = st.number_inputNUMBER OF QUESTIONS", min_value=1, max_value=20, value=5)
+            num_questions = st.number_input("Number of Questions", min_value=1, max_value=20, value=5)
             time_limit = st.number_input("Time Limit (minutes)", min_value=1, max_value=180, value=10)
         
         if st.button("Generate Quiz"):
@@ -564,6 +792,11 @@ def main():
                 if quiz_data:
                     st.session_state.quiz_data = quiz_data
                     st.session_state.user_answers = {}
+                    if st.session_state.quiz_token is not None:
+                        get_quiz_store().remove(st.session_state.quiz_token)
+                        st.session_state.quiz_token = None
+                    if st.session_state.event_log is not None:
+                        st.session_state.event_log.quiz(time.time(), quiz_data)
                     st.success("Quiz generated successfully! Go to 'Take Quiz' page to start.")
                     
                     with st.expander("Preview Quiz"):
@@ -581,7 +814,9 @@ def main():
     elif page == "Take Quiz":
         st.subheader("📝 Take Quiz")
         
-        detect_tab_switch()
+        install_tab_listener()
+        if detect_tab_switch():
+            st.warning(TAB_SWITCH_WARNING)
         
         if st.session_state.quiz_data:
             quiz_data = st.session_state.quiz_data
@@ -589,20 +824,23 @@ def main():
             st.markdown(f"### {quiz_data['title']}")
             st.markdown(quiz_data['description'])
             
+            timer = st.empty()
+            deadline = None
             if st.session_state.start_time is not None:
-                elapsed_time = time.time() - st.session_state.start_time
-                remaining_time = max(0, quiz_data['time_limit_minutes'] * 60 - elapsed_time)
-                minutes, seconds = divmod(int(remaining_time), 60)
-                st.markdown(f"**Time Remaining:** {minutes:02d}:{seconds:02d}")
+                deadline = st.session_state.start_time + quiz_data['time_limit_minutes'] * 60
+                remaining_time = show_time_remaining(timer, deadline)
                 
                 if remaining_time <= 0 and not st.session_state.quiz_submitted:
                     st.warning("Time's up! Quiz has been automatically submitted.")
                     st.session_state.quiz_submitted = True
-                    st.session_state.monitoring_active = False
-                    st.session_state.report_data = generate_report()
+                    if st.session_state.event_log is not None:
+                        st.session_state.event_log.submit(time.time())
+                    finish_exam()
                     st.experimental_rerun()
             
-            if not st.session_state.quiz_submitted:
+            if not st.session_state.quiz_submitted and QUIZ_PORT:
+                serve_quiz(quiz_data, timer, deadline)
+            elif not st.session_state.quiz_submitted:
                 # Paginate questions
                 current_question = st.session_state.get('current_question', 0)
                 total_questions = len(quiz_data['questions'])
@@ -613,12 +851,15 @@ def main():
                     st.markdown(f"**Question {current_question + 1} of {total_questions}: {question['question']}**")
                     
                     options = question['options']
+                    previous_answer = st.session_state.user_answers.get(q_id)
                     st.session_state.user_answers[q_id] = st.radio(
                         f"Select answer for question {current_question + 1}",
                         options=options,
                         key=f"q_{q_id}",
                         index=options.index(st.session_state.user_answers.get(q_id, options[0])) if q_id in st.session_state.user_answers else 0
                     )
+                    if st.session_state.event_log is not None and st.session_state.user_answers[q_id] != previous_answer:
+                        st.session_state.event_log.answer(time.time(), q_id, st.session_state.user_answers[q_id])
                     
                     col1, col2 = st.columns(2)
                     with col1:
@@ -631,3 +872,6 @@ def main():
                             st.experimental_rerun()
                         elif current_question == total_questions - 1 and st.button("Submit Quiz"):
                             st.session_state.quiz_submitted = True
+                            if st.session_state.event_log is not None:
+                                st.session_state.event_log.submit(time.time())
+                            finish_exam()
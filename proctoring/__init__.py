@@ -0,0 +1 @@
+"""Headless proctoring components shared by the Streamlit app and offline tools"""
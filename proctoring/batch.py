@@ -0,0 +1,240 @@
+"""Offline batch analysis of recorded exam videos
+
+Runs the same FrameAnalyzer, SessionStats and build_report logic as the
+live app over video files. Long files are split into chunks that workers
+open independently and seek into, so a single recording is spread across
+cores as well as many recordings.
+
+Usage::
+
+    python -m proctoring.batch recordings/ --workers 8 --output reports.json
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+from proctoring.blinks import count_blinks
+from proctoring.engine import CV_AVAILABLE, INFERENCE_MODES, FrameAnalyzer, cv2
+from proctoring.report import build_report
+from proctoring.stats import MAX_FRAME_GAP, SessionStats
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mkv', '.mov', '.webm', '.m4v')
+DEFAULT_CHUNK_SECONDS = 300.0
+# 'threshold' sums the live per-frame detector's counts per chunk; 'series'
+# re-detects blinks over the whole recording's EAR series (proctoring.blinks)
+BLINK_METHODS = ('threshold', 'series')
+# Sampled frames further apart than this many sampling intervals are a gap (e.g. unreadable frames)
+SAMPLE_GAP_FACTOR = 1.5
+
+
+def find_videos(paths):
+    """Expand files and directories (recursively) into a sorted list of video files"""
+    videos = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                videos.extend(
+                    os.path.join(root, name) for name in files
+                    if name.lower().endswith(VIDEO_EXTENSIONS)
+                )
+        else:
+            videos.append(path)
+    return sorted(videos)
+
+
+def probe_video(path):
+    """Return (fps, frame_count) for a video file"""
+    cap = cv2.VideoCapture(path)
+    try:
+        if not cap.isOpened():
+            raise IOError(f"Could not open video {path}")
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        frame_count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        return fps, frame_count
+    finally:
+        cap.release()
+
+
+def plan_chunks(path, chunk_seconds=DEFAULT_CHUNK_SECONDS):
+    """Split a video into (path, chunk_index, start_frame, end_frame, fps) jobs"""
+    fps, frame_count = probe_video(path)
+    if frame_count <= 0:
+        # Unknown length (some containers): process the whole file in one job
+        return [(path, 0, 0, None, fps)]
+    chunk_frames = max(1, int(chunk_seconds * fps)) if chunk_seconds else frame_count
+    return [
+        (path, index, start, min(start + chunk_frames, frame_count), fps)
+        for index, start in enumerate(range(0, frame_count, chunk_frames))
+    ]
+
+
+def sample_step(fps, sample_fps=None):
+    """Analyze every ``step``-th frame to get at most ``sample_fps`` frames per second"""
+    return max(1, int(round(fps / sample_fps))) if sample_fps else 1
+
+
+def max_frame_gap(fps, step):
+    """SessionStats gap limit for frames sampled ``step`` frames apart
+
+    Sampling slower than the live camera's gap limit would otherwise make
+    every interval a gap and credit no face time at all.
+    """
+    return max(MAX_FRAME_GAP, SAMPLE_GAP_FACTOR * step / fps)
+
+
+def analyze_chunk(path, start_frame, end_frame, fps, mode='mesh', sample_fps=None, ear_series=None):
+    """Analyze frames [start_frame, end_frame) of a video and return SessionStats
+
+    ``ear_series``, if given, is a list that collects ``(timestamp, left_ear,
+    right_ear)`` for every frame with a face.
+    """
+    step = sample_step(fps, sample_fps)
+    stats = SessionStats(max_frame_gap(fps, step))
+    cap = cv2.VideoCapture(path)
+    analyzer = FrameAnalyzer(mode=mode)
+    try:
+        if start_frame:
+            cap.set(cv2.CAP_PROP_POS_FRAMES, start_frame)
+        index = start_frame
+        while end_frame is None or index < end_frame:
+            # grab() skips the color conversion for frames we don't analyze
+            if not cap.grab():
+                break
+            if (index - start_frame) % step == 0:
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                result = analyzer.process(frame, index / fps)
+                stats.update(result.timestamp, result.face_count, result.blink_count)
+                if ear_series is not None and result.analyzed and result.left_ear is not None:
+                    ear_series.append((result.timestamp, result.left_ear, result.right_ear))
+            index += 1
+    finally:
+        cap.release()
+        analyzer.close()
+    return stats
+
+
+def _run_chunk(job, mode, sample_fps, blinks='threshold'):
+    path, chunk_index, start_frame, end_frame, fps = job
+    ear_series = [] if blinks == 'series' else None
+    stats = analyze_chunk(path, start_frame, end_frame, fps, mode, sample_fps, ear_series)
+    if ear_series is not None:
+        ear_series = np.array(ear_series, dtype=np.float64).reshape(-1, 3)
+    return path, chunk_index, stats, ear_series
+
+
+def report_from_stats(stats, duration=None):
+    """Build the same report dict as the app's generate_report for a recording"""
+    snapshot = stats.snapshot()
+    if duration is None:
+        duration = (snapshot['last_timestamp'] or 0.0) - (snapshot['first_timestamp'] or 0.0)
+    return build_report(snapshot, duration, tab_switches=0)
+
+
+def analyze_videos(paths, workers=None, mode='mesh', chunk_seconds=DEFAULT_CHUNK_SECONDS,
+                   sample_fps=None, progress=None, blinks='threshold'):
+    """Analyze recordings in parallel and return {path: report}
+
+    ``paths`` may mix files and directories. ``progress`` is called with
+    ``(done, total)`` after each chunk finishes. ``blinks`` is one of
+    ``BLINK_METHODS``.
+    """
+    if blinks not in BLINK_METHODS:
+        raise ValueError(f"Unknown blink method {blinks!r}, expected one of {BLINK_METHODS}")
+    if sample_fps is not None and sample_fps <= 0:
+        raise ValueError(f"sample_fps must be positive, got {sample_fps!r}")
+    if not CV_AVAILABLE:
+        raise RuntimeError("OpenCV and MediaPipe are required for video analysis")
+    videos = find_videos(paths)
+    jobs = []
+    durations = {}
+    reports = {}
+    for path in videos:
+        try:
+            chunks = plan_chunks(path, chunk_seconds)
+        except IOError as e:
+            reports[path] = {'error': str(e)}
+            continue
+        jobs.extend(chunks)
+        fps = chunks[0][4]
+        last_end = chunks[-1][3]
+        durations[path] = last_end / fps if last_end else None
+
+    chunk_stats = {path: {} for path in durations}
+    chunk_ears = {path: {} for path in durations}
+
+    def collect(job, run):
+        # One unreadable chunk fails its own recording, not the whole batch
+        try:
+            path, chunk_index, stats, ears = run()
+        except Exception as e:
+            reports.setdefault(job[0], {'error': f"chunk {job[1]}: {e}"})
+            return
+        chunk_stats[path][chunk_index] = stats
+        chunk_ears[path][chunk_index] = ears
+
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for done, job in enumerate(jobs, 1):
+            collect(job, lambda: _run_chunk(job, mode, sample_fps, blinks))
+            if progress:
+                progress(done, len(jobs))
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_run_chunk, job, mode, sample_fps, blinks) for job in jobs]
+            for done, (job, future) in enumerate(zip(jobs, futures), 1):
+                collect(job, future.result)
+                if progress:
+                    progress(done, len(jobs))
+
+    for path, chunks in chunk_stats.items():
+        if path in reports:
+            continue
+        # Takes the first chunk's gap limit, so chunk boundaries are credited like sampled intervals
+        stats = SessionStats()
+        for chunk_index in sorted(chunks):
+            stats.merge(chunks[chunk_index])
+        if blinks == 'series':
+            # Chunks are contiguous, so blinks spanning a chunk boundary are found once
+            ears = np.concatenate([chunk_ears[path][index] for index in sorted(chunks)] or [np.empty((0, 3))])
+            stats.blink_count = count_blinks(ears[:, 0], ears[:, 1], ears[:, 2])
+        reports[path] = report_from_stats(stats, durations[path])
+    return {path: reports[path] for path in videos if path in reports}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Analyze recorded exam videos offline")
+    parser.add_argument('paths', nargs='+', help="Video files or directories of recordings")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: CPU count)")
+    parser.add_argument('--mode', choices=INFERENCE_MODES, default='mesh', help="Inference mode")
+    parser.add_argument('--chunk-seconds', type=float, default=DEFAULT_CHUNK_SECONDS,
+                        help="Split long recordings into chunks of this length (0 disables)")
+    parser.add_argument('--sample-fps', type=float, default=None,
+                        help="Analyze at most this many frames per second of video")
+    parser.add_argument('--blinks', choices=BLINK_METHODS, default='threshold',
+                        help="Blink counting: per-frame thresholds or the smoothed EAR series")
+    parser.add_argument('--output', '-o', default=None, help="Write reports as JSON to this file")
+    args = parser.parse_args(argv)
+
+    def progress(done, total):
+        print(f"\r{done}/{total} chunks", end='', file=sys.stderr, flush=True)
+
+    reports = analyze_videos(args.paths, args.workers, args.mode, args.chunk_seconds,
+                             args.sample_fps, progress, args.blinks)
+    print(file=sys.stderr)
+    output = json.dumps(reports, indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,248 @@
+"""Benchmarks for the CV hot path, per-frame bookkeeping and reporting
+
+Runs each stage against synthetic frames and landmarks and reports
+throughput and p50/p99 latency, plus memory growth over a simulated
+session. Results can be written as JSON and compared against a previous
+run to catch regressions.
+
+The synthetic inference frame is noise with no face in it, so FaceMesh
+never runs its landmark model and ``inference_mesh`` only times the
+detector. Pass ``--frame`` with a photo of a face to time the full path.
+
+Usage::
+
+    python -m proctoring.benchmark --json after.json --compare before.json
+    python -m proctoring.benchmark --frame face.jpg
+"""
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+import types
+
+import numpy as np
+
+from proctoring.engine import (CV_AVAILABLE, BlinkDetector, FrameAnalyzer, cv2, detect_blinks,
+                               eye_aspect_ratios, landmarks_to_array)
+from proctoring.report import build_report, calculate_cheating_risk
+from proctoring.risk import RiskEngine
+from proctoring.stats import SessionStats
+from proctoring.store import FrameStore
+
+NUM_LANDMARKS = 468
+
+NO_FACE_WARNING = ("no face found in the inference frame: inference_mesh excludes landmark "
+                   "inference and understates its cost (pass --frame with a photo of a face)")
+
+
+def synthetic_landmarks(rng, num_faces=1):
+    """(F, 468, 2) pixel landmarks plus MediaPipe-like landmark objects"""
+    normalized = rng.random((num_faces, NUM_LANDMARKS, 2), dtype=np.float32)
+    faces = [
+        types.SimpleNamespace(landmark=[types.SimpleNamespace(x=float(x), y=float(y)) for x, y in face])
+        for face in normalized
+    ]
+    return normalized * np.array([640, 480], dtype=np.float32), faces
+
+
+def synthetic_frame(rng, width=640, height=480):
+    return rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+
+
+def measure(fn, iterations=1000, warmup=50):
+    """Time ``fn`` and return throughput and latency percentiles"""
+    for _ in range(warmup):
+        fn()
+    samples = np.empty(iterations, dtype=np.float64)
+    for i in range(iterations):
+        start = time.perf_counter()
+        fn()
+        samples[i] = time.perf_counter() - start
+    total = samples.sum()
+    return {
+        'iterations': iterations,
+        'fps': round(iterations / total, 2) if total > 0 else None,
+        'mean_ms': round(samples.mean() * 1000, 4),
+        'p50_ms': round(float(np.percentile(samples, 50)) * 1000, 4),
+        'p99_ms': round(float(np.percentile(samples, 99)) * 1000, 4),
+    }
+
+
+def load_frame(path):
+    """BGR image to run inference on"""
+    if not CV_AVAILABLE:
+        raise RuntimeError("OpenCV is required to read --frame")
+    frame = cv2.imread(path)
+    if frame is None:
+        raise IOError(f"Could not read image {path}")
+    return frame
+
+
+def bench_stages(iterations=1000, seed=0, frame=None):
+    rng = np.random.default_rng(seed)
+    points, faces = synthetic_landmarks(rng)
+    batch, _ = synthetic_landmarks(rng, num_faces=64)
+    detector = BlinkDetector()
+    stats = SessionStats()
+    for i in range(1000):
+        stats.update(i / 15, 1, i // 60)
+    snapshot = stats.snapshot()
+
+    stages = {
+        'landmark_conversion': lambda: landmarks_to_array(faces[0], 640, 480),
+        'detect_blinks': lambda: detect_blinks(points[0], detector, time.time()),
+        'ear_batch_64_faces': lambda: eye_aspect_ratios(batch),
+        'generate_report': lambda: build_report(stats.snapshot(), 3600.0, 2),
+        'build_report_only': lambda: build_report(snapshot, 3600.0, 2),
+        'calculate_cheating_risk': lambda: calculate_cheating_risk(87.5, 1.5, 2, 3600.0),
+    }
+
+    store = FrameStore()
+    risk = RiskEngine()
+    counter = iter(range(10 ** 9))
+
+    def record_frame():
+        i = next(counter)
+        timestamp = i / 15
+        store.append(timestamps=timestamp, face_counts=1, blink_counts=i // 60)
+        stats.update(timestamp, 1, i // 60)
+        risk.observe_frame(timestamp, 1, i // 60)
+
+    stages['record_frame'] = record_frame
+
+    results = {name: measure(fn, iterations) for name, fn in stages.items()}
+
+    if CV_AVAILABLE:
+        analyzer = FrameAnalyzer(mode='mesh')
+        frame = synthetic_frame(rng) if frame is None else frame
+        faces = analyzer.process(frame).face_count
+        results['inference_mesh'] = measure(lambda: analyzer.process(frame), max(iterations // 20, 20), warmup=5)
+        results['inference_mesh']['faces'] = faces
+        if not faces:
+            results['inference_mesh']['warning'] = NO_FACE_WARNING
+        analyzer.close()
+    else:
+        results['inference_mesh'] = {'skipped': "OpenCV/MediaPipe not installed"}
+    return results
+
+
+def bench_session_memory(hours=3.0, fps=15.0):
+    """Memory growth of per-frame bookkeeping over a simulated session"""
+    frames = int(hours * 3600 * fps)
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    store = FrameStore()
+    stats = SessionStats()
+    risk = RiskEngine()
+    start = time.perf_counter()
+    for i in range(frames):
+        timestamp = i / fps
+        face_count = 0 if i % 900 < 30 else 1
+        store.append(timestamps=timestamp, face_counts=face_count, blink_counts=i // 60)
+        stats.update(timestamp, face_count, i // 60)
+        risk.observe_frame(timestamp, face_count, i // 60)
+    elapsed = time.perf_counter() - start
+    report_start = time.perf_counter()
+    build_report(stats.snapshot(), frames / fps, 0, risk.snapshot())
+    report_ms = (time.perf_counter() - report_start) * 1000
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return {
+        'simulated_hours': hours,
+        'simulated_fps': fps,
+        'frames': frames,
+        'record_fps': round(frames / elapsed, 2),
+        'growth_bytes': current - before,
+        'peak_bytes': peak - before,
+        'bytes_per_frame': round((current - before) / frames, 2),
+        'store_bytes': store.nbytes,
+        'final_report_ms': round(report_ms, 4),
+    }
+
+
+def run(iterations=1000, session_hours=3.0, session_fps=15.0, frame=None):
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cv_available': CV_AVAILABLE,
+            'timestamp': time.time(),
+        },
+        'stages': bench_stages(iterations, frame=frame),
+        'memory': bench_session_memory(session_hours, session_fps),
+    }
+
+
+def compare(current, baseline, tolerance=0.2):
+    """Return regressions where p50 latency grew by more than ``tolerance``"""
+    regressions = []
+    for name, result in current['stages'].items():
+        previous = baseline.get('stages', {}).get(name)
+        if not previous or 'p50_ms' not in result or 'p50_ms' not in previous:
+            continue
+        if previous['p50_ms'] > 0 and result['p50_ms'] > previous['p50_ms'] * (1 + tolerance):
+            regressions.append({
+                'stage': name,
+                'baseline_p50_ms': previous['p50_ms'],
+                'p50_ms': result['p50_ms'],
+                'change': round(result['p50_ms'] / previous['p50_ms'] - 1, 3),
+            })
+    # Fixed overheads dominate short sessions, so only compare equal-length runs
+    previous_memory = baseline.get('memory', {})
+    same_session = previous_memory.get('frames') == current['memory']['frames']
+    previous_memory = previous_memory.get('bytes_per_frame')
+    if same_session and previous_memory and current['memory']['bytes_per_frame'] > previous_memory * (1 + tolerance):
+        regressions.append({
+            'stage': 'memory',
+            'baseline_bytes_per_frame': previous_memory,
+            'bytes_per_frame': current['memory']['bytes_per_frame'],
+        })
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the proctoring hot path")
+    parser.add_argument('--iterations', type=int, default=1000)
+    parser.add_argument('--session-hours', type=float, default=3.0)
+    parser.add_argument('--session-fps', type=float, default=15.0)
+    parser.add_argument('--json', default=None, help="Write results to this file")
+    parser.add_argument('--compare', default=None, help="Baseline JSON to check for regressions")
+    parser.add_argument('--tolerance', type=float, default=0.2, help="Allowed p50 slowdown (0.2 = 20%%)")
+    parser.add_argument('--frame', default=None, help="Image with a face to run inference on")
+    args = parser.parse_args(argv)
+
+    frame = load_frame(args.frame) if args.frame else None
+    results = run(args.iterations, args.session_hours, args.session_fps, frame)
+
+    print(f"{'stage':<26}{'fps':>12}{'p50 ms':>12}{'p99 ms':>12}")
+    for name, result in results['stages'].items():
+        if 'skipped' in result:
+            print(f"{name:<26}  skipped: {result['skipped']}")
+            continue
+        print(f"{name:<26}{result['fps']:>12}{result['p50_ms']:>12}{result['p99_ms']:>12}")
+    for name, result in results['stages'].items():
+        if 'warning' in result:
+            print(f"WARNING: {result['warning']}", file=sys.stderr)
+    memory = results['memory']
+    print(f"\n{memory['frames']} frames ({memory['simulated_hours']}h @ {memory['simulated_fps']} fps): "
+          f"{memory['growth_bytes'] / 1e6:.2f} MB growth, {memory['bytes_per_frame']} B/frame")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance)
+        for regression in regressions:
+            print(f"REGRESSION: {regression}", file=sys.stderr)
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,203 @@
+"""Blink detection over a buffered, timestamped EAR series
+
+Instead of fixed thresholds applied frame by frame, the mean EAR of both
+eyes is smoothed over a short time window, compared with an adaptive
+open-eye baseline (the median of per-second medians over the trailing
+``baseline_window`` seconds) and segmented with hysteresis: a blink is a
+run where the EAR dropped by at least ``close_drop`` of the baseline and
+recovered to within ``open_drop`` of it, lasting between ``min_duration``
+and ``max_duration`` seconds. All windows are in seconds, so results do not
+depend on the frame rate.
+
+``detect_blink_series`` processes a whole recording in one vectorized call.
+``SeriesBlinkDetector`` runs the same function over a rolling buffer and
+only reports a blink once every sample it depends on has arrived, so live
+counts match a batch run over the same frames.
+"""
+import math
+import warnings
+
+import numpy as np
+
+SMOOTHING_WINDOW = 0.1
+BASELINE_BIN = 1.0
+BASELINE_WINDOW = 30.0
+DEFAULT_OPEN_EAR = 0.3
+CLOSE_DROP = 0.3
+OPEN_DROP = 0.15
+MIN_BLINK_DURATION = 0.04
+MAX_BLINK_DURATION = 0.5
+
+
+def smooth(timestamps, values, window=SMOOTHING_WINDOW):
+    """Centered moving average over ``window`` seconds (variable frame spacing)"""
+    if not len(values) or not window:
+        return np.asarray(values, dtype=np.float64)
+    lo = np.searchsorted(timestamps, timestamps - window / 2, side='left')
+    hi = np.searchsorted(timestamps, timestamps + window / 2, side='right')
+    cumulative = np.concatenate(([0.0], np.cumsum(values, dtype=np.float64)))
+    return (cumulative[hi] - cumulative[lo]) / (hi - lo)
+
+
+def adaptive_baseline(timestamps, values, bin_seconds=BASELINE_BIN, window=BASELINE_WINDOW,
+                      default=DEFAULT_OPEN_EAR):
+    """Per-sample open-eye baseline from trailing per-bin medians
+
+    Bins are aligned to absolute time, so the baseline of a sample only
+    depends on the samples in its own and the preceding bins.
+    """
+    bins = np.floor(timestamps / bin_seconds).astype(np.int64)
+    unique_bins, inverse = np.unique(bins, return_inverse=True)
+    order = np.lexsort((values, inverse))
+    counts = np.bincount(inverse)
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    ordered = values[order]
+    bin_medians = (ordered[starts + (counts - 1) // 2] + ordered[starts + counts // 2]) / 2
+
+    span = int(max(1, round(window / bin_seconds)))
+    first = unique_bins[0]
+    dense = np.full(unique_bins[-1] - first + 1 + span - 1, np.nan)
+    dense[unique_bins - first + span - 1] = bin_medians
+    windows = np.lib.stride_tricks.sliding_window_view(dense, span)
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        trailing = np.nanmedian(windows, axis=1)
+    trailing = np.where(np.isnan(trailing), default, trailing)
+    return trailing[unique_bins - first][inverse]
+
+
+def detect_blink_series(timestamps, left_ears, right_ears, smoothing=SMOOTHING_WINDOW,
+                        baseline_bin=BASELINE_BIN, baseline_window=BASELINE_WINDOW,
+                        close_drop=CLOSE_DROP, open_drop=OPEN_DROP,
+                        min_duration=MIN_BLINK_DURATION, max_duration=MAX_BLINK_DURATION):
+    """Find blinks in a whole EAR series
+
+    Returns ``(blink_times, end_times)``: the time of the lowest EAR in each
+    blink and the time of the frame at which the eyes were open again.
+    Frames without a face should simply be left out; frames with a NaN or
+    infinite EAR are dropped (one would poison every later moving average).
+    """
+    timestamps = np.asarray(timestamps, dtype=np.float64)
+    ears = (np.asarray(left_ears, dtype=np.float64) + np.asarray(right_ears, dtype=np.float64)) / 2
+    finite = np.isfinite(ears) & np.isfinite(timestamps)
+    if not finite.all():
+        timestamps, ears = timestamps[finite], ears[finite]
+    if len(timestamps) < 2:
+        return np.empty(0), np.empty(0)
+    smoothed = smooth(timestamps, ears, smoothing)
+    baseline = adaptive_baseline(timestamps, smoothed, baseline_bin, baseline_window)
+    drop = 1.0 - smoothed / baseline
+
+    # Hysteresis: closed once the drop passes close_drop, open again once it
+    # is back under open_drop, unchanged in between -- but only for up to
+    # max_duration, so the state never depends on older frames
+    defined = (drop >= close_drop) | (drop <= open_drop)
+    last_defined = np.maximum.accumulate(np.where(defined, np.arange(len(drop)), -1))
+    anchor = np.maximum(last_defined, 0)
+    recent = (last_defined >= 0) & (timestamps - timestamps[anchor] <= max_duration)
+    closed = recent & (drop[anchor] >= close_drop)
+
+    edges = np.diff(closed.astype(np.int8))
+    starts = np.flatnonzero(edges == 1) + 1
+    ends = np.flatnonzero(edges == -1) + 1
+    if closed[0]:
+        # Already closed when the series starts: the blink's onset is unknown
+        ends = ends[1:]
+    # A trailing run that has not reopened yet is not a blink (yet)
+    starts = starts[:len(ends)]
+    if not len(starts):
+        return np.empty(0), np.empty(0)
+
+    durations = timestamps[ends] - timestamps[starts]
+    keep = (durations >= min_duration) & (durations <= max_duration)
+    starts, ends = starts[keep], ends[keep]
+    if not len(starts):
+        return np.empty(0), np.empty(0)
+    # Lowest smoothed EAR inside each closed run
+    minima = np.minimum.reduceat(smoothed, starts)
+    blink_times = np.empty(len(starts))
+    for i, (start, end, minimum) in enumerate(zip(starts, ends, minima)):
+        blink_times[i] = timestamps[start + int(np.argmax(smoothed[start:end] == minimum))]
+    return blink_times, timestamps[ends]
+
+
+def count_blinks(timestamps, left_ears, right_ears, **params):
+    return len(detect_blink_series(timestamps, left_ears, right_ears, **params)[0])
+
+
+class SeriesBlinkDetector:
+    """Live counterpart of ``detect_blink_series`` with the BlinkDetector interface
+
+    ``update`` buffers each frame and, at most once per baseline bin,
+    re-runs the series detector over the buffer. Blinks are counted when
+    they are final: their closing frame plus half the smoothing window has
+    been seen and their baseline bin is complete. Each closing frame is
+    decided exactly once, so later trimming of the buffer cannot change it.
+    ``flush`` finalizes the rest at the end of a session.
+    """
+
+    def __init__(self, **params):
+        self.params = params
+        self.smoothing = params.get('smoothing', SMOOTHING_WINDOW)
+        self.baseline_bin = params.get('baseline_bin', BASELINE_BIN)
+        baseline_bins = int(max(1, round(params.get('baseline_window', BASELINE_WINDOW) / self.baseline_bin)))
+        margin = int(math.ceil(params.get('max_duration', MAX_BLINK_DURATION) / self.baseline_bin)) + 1
+        # Whole bins kept behind the newest one, enough for every unfinished blink's baseline
+        self.retained_bins = baseline_bins + 2 * margin
+        self.blink_count = 0
+        # Every blink ending before this has been decided, counted or not
+        self.final_until = -math.inf
+        self._timestamps = []
+        self._left = []
+        self._right = []
+        self._next_check = None
+
+    def update(self, left_ear, right_ear, timestamp):
+        """Buffer a frame; returns True when at least one blink became final"""
+        self._timestamps.append(timestamp)
+        self._left.append(left_ear)
+        self._right.append(right_ear)
+        if self._next_check is None:
+            self._next_check = self._bin_end(timestamp)
+        if timestamp < self._next_check:
+            return False
+        self._next_check = self._bin_end(timestamp)
+        found = self._finalize(timestamp)
+        self._trim(timestamp)
+        return found > 0
+
+    def flush(self):
+        """Count every remaining complete blink (end of session); returns how many were added"""
+        return self._finalize(math.inf)
+
+    def reset(self):
+        self.blink_count = 0
+        self.final_until = -math.inf
+        self._timestamps, self._left, self._right = [], [], []
+        self._next_check = None
+
+    def _bin_end(self, timestamp):
+        return (math.floor(timestamp / self.baseline_bin) + 1) * self.baseline_bin + self.smoothing / 2
+
+    def _finalize(self, now):
+        if len(self._timestamps) < 2:
+            return 0
+        _, ends = detect_blink_series(self._timestamps, self._left, self._right, **self.params)
+        # A bin's median is settled once the smoothing window has moved past its end
+        settled = now - self.smoothing / 2
+        complete_until = math.floor(settled / self.baseline_bin) * self.baseline_bin if math.isfinite(now) else now
+        until = min(settled, complete_until)
+        # Each end is decided once, with the buffer it had when it became final
+        final = ends[(ends >= self.final_until) & (ends < until)]
+        self.final_until = max(self.final_until, until)
+        self.blink_count += len(final)
+        return len(final)
+
+    def _trim(self, timestamp):
+        oldest_bin = math.floor(timestamp / self.baseline_bin) - self.retained_bins
+        cutoff = oldest_bin * self.baseline_bin
+        drop = int(np.searchsorted(self._timestamps, cutoff, side='left'))
+        if drop:
+            del self._timestamps[:drop]
+            del self._left[:drop]
+            del self._right[:drop]
@@ -0,0 +1,453 @@
+"""Frame analysis engine for face counting and blink detection (no Streamlit)"""
+import dataclasses
+import threading
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from proctoring.metrics import REGISTRY
+from proctoring.roi import DETECT_INTERVAL, DETECT_WIDTH, FaceTracker, downscale
+
+# Try to import OpenCV and MediaPipe
+try:
+    import cv2
+    import mediapipe as mp
+
+    mp_face_detection = mp.solutions.face_detection
+    mp_face_mesh = mp.solutions.face_mesh
+    mp_drawing = mp.solutions.drawing_utils
+    CV_AVAILABLE = True
+except ImportError:
+    cv2 = None
+    mp = None
+    CV_AVAILABLE = False
+
+# Landmark indices for the eye aspect ratio, ordered p1..p6
+LEFT_EYE = [362, 386, 387, 385, 380, 374]   # left, top left, top right, right, bottom right, bottom left
+RIGHT_EYE = [33, 159, 158, 133, 145, 144]   # right, top right, top left, left, bottom left, bottom right
+
+# (2, 6) index array so both eyes are gathered with one fancy-indexing call
+EYE_INDICES = np.array([LEFT_EYE, RIGHT_EYE], dtype=np.intp)
+
+FACE_OVAL = [
+    10, 338, 297, 332, 284, 251, 389, 356, 454, 323, 361, 288,
+    397, 365, 379, 378, 400, 377, 152, 148, 176, 149, 150, 136,
+    172, 58, 132, 93, 234, 127, 162, 21, 54, 103, 67, 109
+]
+
+# Inference modes: 'dual' runs FaceDetection and FaceMesh on every frame,
+# 'mesh' runs only a multi-face FaceMesh and counts faces from its output,
+# 'adaptive' detects on a downscaled frame every few frames and runs
+# FaceMesh only on a crop around the tracked face
+INFERENCE_MODES = ('dual', 'mesh', 'adaptive')
+MAX_NUM_FACES = 4
+
+EAR_THRESHOLD = 0.2
+OPEN_THRESHOLD = 0.3
+MAX_BLINK_DURATION = 0.5
+
+
+def calculate_ear(eye_points):
+    """Calculate the eye aspect ratio for six eye landmarks
+
+    ``eye_points`` has shape (..., 6, 2); leading dimensions are treated as a
+    batch and the result has shape (...).
+    """
+    eye_points = np.asarray(eye_points, dtype=np.float32)
+    height_1 = np.linalg.norm(eye_points[..., 1, :] - eye_points[..., 5, :], axis=-1)
+    height_2 = np.linalg.norm(eye_points[..., 2, :] - eye_points[..., 4, :], axis=-1)
+    width = np.linalg.norm(eye_points[..., 0, :] - eye_points[..., 3, :], axis=-1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        return (height_1 + height_2) / (2.0 * width)
+
+
+def eye_aspect_ratios(points):
+    """Left and right EAR for landmark arrays of shape (..., N, 2)
+
+    Works on a single face (N, 2), several faces (F, N, 2) or a batch of
+    frames (T, F, N, 2) and returns an array of shape (..., 2).
+    """
+    points = np.asarray(points, dtype=np.float32)
+    return calculate_ear(points[..., EYE_INDICES, :])
+
+
+def landmarks_to_array(face_landmarks, width, height):
+    """Convert a MediaPipe landmark list to an (N, 2) float32 array of pixels"""
+    landmarks = face_landmarks.landmark
+    points = np.fromiter(
+        (coord for landmark in landmarks for coord in (landmark.x, landmark.y)),
+        dtype=np.float32, count=2 * len(landmarks)
+    ).reshape(-1, 2)
+    points *= np.array([width, height], dtype=np.float32)
+    return points
+
+
+class BlinkDetector:
+    """Open/closed state machine that counts blinks from per-frame EAR values"""
+
+    def __init__(self, ear_threshold=EAR_THRESHOLD, open_threshold=OPEN_THRESHOLD,
+                 max_blink_duration=MAX_BLINK_DURATION):
+        self.ear_threshold = ear_threshold
+        self.open_threshold = open_threshold
+        self.max_blink_duration = max_blink_duration
+        self.state = 'OPEN'
+        self.last_transition = time.time()
+        self.blink_count = 0
+
+    def update(self, left_ear, right_ear, timestamp):
+        """Advance the state machine and return True when a blink completes"""
+        if self.state == 'OPEN' and left_ear < self.ear_threshold and right_ear < self.ear_threshold:
+            self.state = 'CLOSED'
+            self.last_transition = timestamp
+        elif self.state == 'CLOSED' and left_ear > self.open_threshold and right_ear > self.open_threshold:
+            self.state = 'OPEN'
+            if timestamp - self.last_transition < self.max_blink_duration:  # Ensure blink duration is reasonable
+                self.blink_count += 1
+                self.last_transition = timestamp
+                return True
+        return False
+
+    def reset(self):
+        self.state = 'OPEN'
+        self.last_transition = time.time()
+        self.blink_count = 0
+
+
+def detect_blinks(landmarks, detector, timestamp=None):
+    """Compute both eyes' EAR from an (N, 2) landmark array and feed the blink detector
+
+    Returns (left_ear, right_ear, blink_detected).
+    """
+    if landmarks is None or len(landmarks) == 0:
+        return None, None, False
+    if timestamp is None:
+        timestamp = time.time()
+    left_ear, right_ear = (float(ear) for ear in eye_aspect_ratios(landmarks))
+    return left_ear, right_ear, detector.update(left_ear, right_ear, timestamp)
+
+
+def create_models(mode='dual', max_num_faces=MAX_NUM_FACES, min_detection_confidence=0.5,
+                  min_tracking_confidence=0.5):
+    """Build the MediaPipe graphs needed for an inference mode
+
+    Returns ``(face_detection, face_mesh)``; ``face_detection`` is None in
+    'mesh' mode.
+    """
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unknown inference mode {mode!r}, expected one of {INFERENCE_MODES}")
+    if not CV_AVAILABLE:
+        raise RuntimeError("OpenCV and MediaPipe are required for frame analysis")
+    face_detection = None
+    if mode in ('dual', 'adaptive'):
+        face_detection = mp_face_detection.FaceDetection(min_detection_confidence=min_detection_confidence)
+        # Face count comes from the detector, blinks only need the primary face; an
+        # adaptive crop's mesh also looks for a second face joining between detections
+        max_num_faces = 1 if mode == 'dual' else min(2, max_num_faces)
+    face_mesh = mp_face_mesh.FaceMesh(
+        max_num_faces=max_num_faces,
+        min_detection_confidence=min_detection_confidence,
+        min_tracking_confidence=min_tracking_confidence)
+    return face_detection, face_mesh
+
+
+class ModelPool:
+    """Process-wide reusable MediaPipe graphs for one inference mode
+
+    Graphs are expensive to build but not safe to share between concurrent
+    sessions, so each session ``acquire``s its own pair and ``release``s it
+    for the next session when done. At most ``max_idle`` pairs are kept.
+    """
+
+    def __init__(self, mode='dual', max_idle=4, **model_kwargs):
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode {mode!r}, expected one of {INFERENCE_MODES}")
+        self.mode = mode
+        self.max_idle = max_idle
+        self.model_kwargs = model_kwargs
+        self._idle = []
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """An idle ``(face_detection, face_mesh)`` pair, built on first use"""
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+        return create_models(self.mode, **self.model_kwargs)
+
+    def release(self, models):
+        with self._lock:
+            if len(self._idle) < self.max_idle:
+                self._idle.append(models)
+                return
+        _close_models(models)
+
+    def warm_up(self, count=1, frame_shape=(480, 640, 3)):
+        """Build ``count`` pairs ahead of time and run one blank frame through each"""
+        frame = np.zeros(frame_shape, dtype=np.uint8)
+        pairs = [self.acquire() for _ in range(count)]
+        for face_detection, face_mesh in pairs:
+            FrameAnalyzer(face_detection, face_mesh, mode=self.mode).process(frame, 0.0)
+        for models in pairs:
+            self.release(models)
+
+    @property
+    def idle(self):
+        return len(self._idle)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for models in idle:
+            _close_models(models)
+
+
+def _close_models(models):
+    for graph in models:
+        if hasattr(graph, 'close'):
+            graph.close()
+
+
+@dataclass
+class FrameResult:
+    """Everything the engine learned about a single frame"""
+    timestamp: float
+    face_count: int = 0
+    left_ear: float = None
+    right_ear: float = None
+    blink_detected: bool = False
+    blink_count: int = 0
+    analyzed: bool = True
+    landmarks: np.ndarray = field(default_factory=lambda: np.empty((0, 0, 2), dtype=np.float32))
+    ears: np.ndarray = field(default_factory=lambda: np.empty((0, 2), dtype=np.float32))
+    detections: list = field(default_factory=list)
+    face_landmarks: list = field(default_factory=list)
+
+
+class FrameAnalyzer:
+    """Runs face detection, face mesh and blink detection on BGR frames
+
+    The analyzer holds no UI state. Callers push frames through ``process``
+    and either use the returned ``FrameResult`` or register subscribers that
+    receive every result. With an ``InferenceScheduler`` frames the scheduler
+    skips reuse the last analyzed result (``analyzed=False``) instead of
+    running the models.
+    """
+
+    def __init__(self, face_detection=None, face_mesh=None, blink_detector=None, mode='dual',
+                 max_num_faces=MAX_NUM_FACES, min_detection_confidence=0.5, min_tracking_confidence=0.5,
+                 metrics=None, metrics_labels=None, detect_width=DETECT_WIDTH,
+                 detect_interval=DETECT_INTERVAL, scheduler=None):
+        if mode not in INFERENCE_MODES:
+            raise ValueError(f"Unknown inference mode {mode!r}, expected one of {INFERENCE_MODES}")
+        if face_mesh is None:
+            default_detection, face_mesh = create_models(
+                mode, max_num_faces, min_detection_confidence, min_tracking_confidence)
+            face_detection = face_detection or default_detection
+        elif mode in ('dual', 'adaptive') and face_detection is None:
+            if not CV_AVAILABLE:
+                raise RuntimeError("OpenCV and MediaPipe are required for frame analysis")
+            face_detection = mp_face_detection.FaceDetection(min_detection_confidence=min_detection_confidence)
+        self.mode = mode
+        self.face_detection = face_detection if mode != 'mesh' else None
+        self.face_mesh = face_mesh
+        self.blink_detector = blink_detector or BlinkDetector()
+        self.metrics = metrics or REGISTRY
+        self.metrics_labels = metrics_labels or {}
+        self.detect_width = detect_width
+        self.tracker = FaceTracker(detect_interval) if mode == 'adaptive' else None
+        self.scheduler = scheduler
+        self._last_result = None
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    @property
+    def blink_count(self):
+        return self.blink_detector.blink_count
+
+    def subscribe(self, callback):
+        """Register a callable that receives each FrameResult"""
+        with self._lock:
+            self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def process(self, frame, timestamp=None):
+        """Analyze one BGR frame and publish the result to subscribers"""
+        if timestamp is None:
+            timestamp = time.time()
+        if self.scheduler is not None:
+            with self.metrics.stage('schedule', **self.metrics_labels):
+                analyze = self.scheduler.should_analyze(frame, timestamp) or self._last_result is None
+            if not analyze:
+                result = self._carry_forward(timestamp)
+                self._publish(result)
+                return result
+        if self.mode == 'adaptive':
+            result = self._process_adaptive(frame, timestamp)
+            self._record(result)
+            return result
+
+        height, width = frame.shape[:2]
+        metrics, labels = self.metrics, self.metrics_labels
+
+        with metrics.stage('color_conversion', **labels):
+            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        result = FrameResult(timestamp=timestamp)
+
+        if self.face_detection is not None:
+            with metrics.stage('detection', **labels):
+                face_results = self.face_detection.process(rgb_frame)
+            if face_results.detections:
+                result.detections = list(face_results.detections)
+                result.face_count = len(result.detections)
+
+        with metrics.stage('mesh', **labels):
+            mesh_results = self.face_mesh.process(rgb_frame)
+        if mesh_results.multi_face_landmarks:
+            with metrics.stage('blink', **labels):
+                result.face_landmarks = list(mesh_results.multi_face_landmarks)
+                result.landmarks = np.stack([
+                    landmarks_to_array(face_landmarks, width, height)
+                    for face_landmarks in result.face_landmarks
+                ])
+                result.ears = eye_aspect_ratios(result.landmarks)
+                # Blinks are tracked for the primary face only
+                result.left_ear, result.right_ear = (float(ear) for ear in result.ears[0])
+                result.blink_detected = self.blink_detector.update(
+                    result.left_ear, result.right_ear, timestamp)
+
+        if self.face_detection is None:
+            result.face_count = len(result.face_landmarks)
+
+        result.blink_count = self.blink_detector.blink_count
+        metrics.increment('proctoring_frames_analyzed_total', **labels)
+        self._record(result)
+        return result
+
+    def _record(self, result):
+        if self.scheduler is not None:
+            self.scheduler.observe(result)
+        self._last_result = result
+        self._publish(result)
+
+    def _carry_forward(self, timestamp):
+        """Result for a skipped frame: the last analysis, re-stamped"""
+        self.metrics.increment('proctoring_frames_skipped_total', **self.metrics_labels)
+        return dataclasses.replace(self._last_result, timestamp=timestamp, blink_detected=False,
+                                   blink_count=self.blink_detector.blink_count, analyzed=False)
+
+    def _detect_downscaled(self, frame, result):
+        metrics, labels = self.metrics, self.metrics_labels
+        with metrics.stage('color_conversion', **labels):
+            rgb_small = cv2.cvtColor(downscale(frame, self.detect_width), cv2.COLOR_BGR2RGB)
+        with metrics.stage('detection', **labels):
+            face_results = self.face_detection.process(rgb_small)
+        result.detections = list(face_results.detections or [])
+        self.tracker.update_from_detections(result.detections)
+
+    def _mesh_roi(self, frame, result):
+        """Run FaceMesh on the tracked crop; returns False when the face was lost"""
+        metrics, labels = self.metrics, self.metrics_labels
+        height, width = frame.shape[:2]
+        x0, y0, x1, y1 = self.tracker.crop_rect(width, height)
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return False
+        with metrics.stage('color_conversion', **labels):
+            rgb_crop = cv2.cvtColor(frame[y0:y1, x0:x1], cv2.COLOR_BGR2RGB)
+        with metrics.stage('mesh', **labels):
+            mesh_results = self.face_mesh.process(rgb_crop)
+        if not mesh_results.multi_face_landmarks:
+            return False
+        self.tracker.saw_faces(len(mesh_results.multi_face_landmarks))
+        with metrics.stage('blink', **labels):
+            points = landmarks_to_array(mesh_results.multi_face_landmarks[0], x1 - x0, y1 - y0)
+            points += np.array([x0, y0], dtype=np.float32)
+            self.tracker.update_from_landmarks(points, width, height)
+            result.landmarks = points[np.newaxis]
+            result.ears = eye_aspect_ratios(result.landmarks)
+            result.left_ear, result.right_ear = (float(ear) for ear in result.ears[0])
+            result.blink_detected = self.blink_detector.update(
+                result.left_ear, result.right_ear, result.timestamp)
+        return True
+
+    def _process_adaptive(self, frame, timestamp):
+        result = FrameResult(timestamp=timestamp)
+        tracker = self.tracker
+        detected = False
+        if tracker.needs_detection():
+            self._detect_downscaled(frame, result)
+            detected = True
+        if tracker.tracking and not self._mesh_roi(frame, result):
+            tracker.lose()
+            if not detected:
+                # Tracking lost between detections: search the full frame again right away
+                self._detect_downscaled(frame, result)
+                if tracker.tracking and not self._mesh_roi(frame, result):
+                    tracker.lose()
+        tracker.advance()
+        # Landmarks are in full-frame pixels; the crop-relative MediaPipe
+        # protobufs would draw in the wrong place, so none are kept
+        result.face_count = tracker.face_count
+        result.blink_count = self.blink_detector.blink_count
+        self.metrics.increment('proctoring_frames_analyzed_total', **self.metrics_labels)
+        return result
+
+    def _publish(self, result):
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for callback in subscribers:
+            callback(result)
+
+    def flush(self):
+        """Count blinks a buffering detector still holds (end of session); returns the blink count"""
+        flush = getattr(self.blink_detector, 'flush', None)
+        if flush is not None:
+            flush()
+        return self.blink_detector.blink_count
+
+    def close(self):
+        _close_models((self.face_detection, self.face_mesh))
+
+
+# Overlay text colors in BGR
+INFO_COLOR = (0, 255, 0)
+WARNING_COLOR = (255, 0, 0)
+
+
+def draw_overlays(frame, result, tab_switches=0):
+    """Draw detections, mesh contours and status text onto a BGR frame in place"""
+    with REGISTRY.stage('drawing'):
+        for detection in result.detections:
+            mp_drawing.draw_detection(frame, detection)
+        for face_landmarks in result.face_landmarks:
+            mp_drawing.draw_landmarks(
+                frame,
+                face_landmarks,
+                mp_face_mesh.FACEMESH_CONTOURS,
+                landmark_drawing_spec=None,
+                connection_drawing_spec=mp.solutions.drawing_styles.get_default_face_mesh_contours_style()
+            )
+
+        info_text = f"Faces: {result.face_count} | Blinks: {result.blink_count} | Tab Switches: {tab_switches}"
+        cv2.putText(frame, info_text, (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 0.7, INFO_COLOR, 2)
+
+        if result.face_count > 1:
+            warning_text = "WARNING: Multiple faces detected!"
+            cv2.putText(frame, warning_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, WARNING_COLOR, 2)
+
+        if result.face_count == 0:
+            warning_text = "WARNING: No face detected!"
+            cv2.putText(frame, warning_text, (10, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, WARNING_COLOR, 2)
+
+    return frame
+
+
+def annotate_frame(frame, result, tab_switches=0):
+    """Draw detections, mesh contours and status text; returns an RGB frame"""
+    draw_overlays(frame, result, tab_switches)
+    return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
@@ -0,0 +1,318 @@
+"""Durable, append-only per-session event log and replay
+
+Each session appends framed binary records to its own file::
+
+    header  = magic b"PLOG" + format version (uint16)
+    record  = kind (uint8) | timestamp (float64) | payload length (uint32)
+              | crc32 of the preceding fields and payload (uint32) | payload
+
+Appends only touch an in-memory buffer. A single background ``LogFlusher``
+writes every open log's buffer in one ``write`` call and fsyncs it on a
+fixed interval, so the per-frame cost stays a struct pack and a bytearray
+extend however many sessions are running. At most ``fsync_interval``
+seconds of events can be lost in a crash; a torn final record is detected
+by its length/CRC, dropped on replay and cut off when the log is reopened,
+so records appended after a resume stay readable.
+"""
+import json
+import os
+import struct
+import threading
+import time
+import weakref
+import zlib
+
+from proctoring.metrics import REGISTRY
+from proctoring.risk import RiskEngine
+from proctoring.stats import SessionStats
+from proctoring.store import FrameStore
+from proctoring.tabs import TabActivityTracker
+
+MAGIC = b"PLOG"
+VERSION = 1
+FILE_HEADER = struct.Struct("<4sH")
+RECORD_HEADER = struct.Struct("<BdII")
+
+# Record kinds
+START = 1
+FRAME = 2
+TAB_EVENT = 3
+ANSWER = 4
+QUIZ = 5
+SUBMIT = 6
+# The exam page (re)loaded, so the tab listener's sequence numbers restart
+PAGE_LOAD = 7
+# Monitoring stopped and the blink detector counted what it still buffered
+BLINKS = 8
+
+FRAME_PAYLOAD = struct.Struct("<bi")
+TAB_PAYLOAD = struct.Struct("<Ic")
+BLINKS_PAYLOAD = struct.Struct("<i")
+
+LOG_SUFFIX = ".plog"
+BUFFER_SIZE = 64 * 1024
+FSYNC_INTERVAL = 1.0
+
+
+def _record(kind, timestamp, payload=b""):
+    header = struct.pack("<BdI", kind, timestamp, len(payload))
+    crc = zlib.crc32(payload, zlib.crc32(header))
+    return RECORD_HEADER.pack(kind, timestamp, len(payload), crc) + payload
+
+
+def log_path(log_dir, session_id):
+    return os.path.join(log_dir, f"{session_id}{LOG_SUFFIX}")
+
+
+class EventLog:
+    """Buffered writer for one session's event log
+
+    Appends are thread-safe. The buffer is written out when it passes
+    ``buffer_size`` bytes or when the flusher's interval elapses.
+    """
+
+    def __init__(self, path, buffer_size=BUFFER_SIZE, flusher=None, metrics=None):
+        self.path = path
+        self.buffer_size = buffer_size
+        self.metrics = metrics or REGISTRY
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        length = valid_length(path)
+        self._file = open(path, "ab")
+        torn = self._file.seek(0, os.SEEK_END) - length
+        if torn:
+            # Replay stops at the first bad record, so anything appended after it would be lost
+            self._file.truncate(length)
+            self.metrics.increment("proctoring_event_log_truncated_bytes_total", torn)
+        if length == 0:
+            self._file.write(FILE_HEADER.pack(MAGIC, VERSION))
+        self._buffer = bytearray()
+        self._lock = threading.Lock()
+        self._io_lock = threading.Lock()
+        self.records = 0
+        self.closed = False
+        self.flusher = flusher if flusher is not None else default_flusher()
+        self.flusher.register(self)
+
+    def append(self, kind, timestamp, payload=b""):
+        record = _record(kind, timestamp, payload)
+        with self._lock:
+            if self.closed:
+                raise ValueError(f"Event log {self.path} is closed")
+            self._buffer += record
+            self.records += 1
+            full = len(self._buffer) >= self.buffer_size
+        if full:
+            self.flush()
+
+    def start(self, timestamp):
+        self.append(START, timestamp)
+
+    def frame(self, timestamp, face_count, blink_count):
+        self.append(FRAME, timestamp, FRAME_PAYLOAD.pack(min(face_count, 127), blink_count))
+
+    def tab_events(self, events):
+        """Log ``(seq, code, seconds)`` events as drained from the tab listener"""
+        for seq, code, timestamp in events:
+            self.append(TAB_EVENT, timestamp, TAB_PAYLOAD.pack(seq, code.encode("ascii")[:1]))
+
+    def answer(self, timestamp, question_id, answer):
+        self.append(ANSWER, timestamp, json.dumps({"id": question_id, "answer": answer}).encode("utf-8"))
+
+    def quiz(self, timestamp, quiz_data):
+        self.append(QUIZ, timestamp, json.dumps(quiz_data).encode("utf-8"))
+
+    def submit(self, timestamp):
+        self.append(SUBMIT, timestamp)
+
+    def page_load(self, timestamp):
+        self.append(PAGE_LOAD, timestamp)
+
+    def blinks(self, timestamp, blink_count):
+        self.append(BLINKS, timestamp, BLINKS_PAYLOAD.pack(blink_count))
+
+    def flush(self, fsync=False):
+        """Write buffered records; with ``fsync`` also force them to stable storage"""
+        with self._io_lock:
+            with self._lock:
+                data = bytes(self._buffer)
+                self._buffer.clear()
+            if self._file.closed:
+                return
+            if data:
+                self._file.write(data)
+                self._file.flush()
+                self.metrics.increment("proctoring_event_log_bytes_total", len(data))
+            if fsync:
+                start = time.perf_counter()
+                os.fsync(self._file.fileno())
+                self.metrics.observe("proctoring_event_log_fsync_seconds", time.perf_counter() - start)
+
+    def close(self):
+        with self._lock:
+            if self.closed:
+                return
+            self.closed = True
+        self.flush(fsync=True)
+        self.flusher.unregister(self)
+        with self._io_lock:
+            self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+
+class LogFlusher:
+    """Background thread that flushes and fsyncs every registered log each ``interval``"""
+
+    def __init__(self, interval=FSYNC_INTERVAL):
+        self.interval = interval
+        self._logs = weakref.WeakSet()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="proctoring-event-log", daemon=True)
+        self._thread.start()
+
+    def register(self, log):
+        with self._lock:
+            self._logs.add(log)
+
+    def unregister(self, log):
+        with self._lock:
+            self._logs.discard(log)
+
+    def flush_all(self):
+        with self._lock:
+            logs = list(self._logs)
+        for log in logs:
+            try:
+                log.flush(fsync=True)
+            except (OSError, ValueError):
+                pass
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.flush_all()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.flush_all()
+
+
+_default_flusher = None
+_default_flusher_lock = threading.Lock()
+
+
+def default_flusher():
+    """Process-wide flusher shared by all logs"""
+    global _default_flusher
+    with _default_flusher_lock:
+        if _default_flusher is None:
+            _default_flusher = LogFlusher()
+        return _default_flusher
+
+
+def _scan(data, path):
+    """Yield ``(kind, timestamp, payload, end)`` for each intact record of a log's contents"""
+    magic, version = FILE_HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError(f"{path} is not a proctoring event log")
+    if version != VERSION:
+        raise ValueError(f"Unsupported event log version {version} in {path}")
+    offset = FILE_HEADER.size
+    while offset + RECORD_HEADER.size <= len(data):
+        kind, timestamp, length, crc = RECORD_HEADER.unpack_from(data, offset)
+        start = offset + RECORD_HEADER.size
+        payload = data[start:start + length]
+        if len(payload) < length:
+            return
+        if zlib.crc32(payload, zlib.crc32(data[offset:offset + RECORD_HEADER.size - 4])) != crc:
+            return
+        offset = start + length
+        yield kind, timestamp, payload, offset
+
+
+def read_records(path):
+    """Yield ``(kind, timestamp, payload)`` records, stopping at a torn or corrupt tail"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < FILE_HEADER.size:
+        return
+    for kind, timestamp, payload, _ in _scan(data, path):
+        yield kind, timestamp, payload
+
+
+def valid_length(path):
+    """Bytes up to the end of the last intact record (0 for a missing file or one without a header)"""
+    try:
+        with open(path, "rb") as f:
+            data = f.read()
+    except FileNotFoundError:
+        return 0
+    if len(data) < FILE_HEADER.size:
+        return 0
+    end = FILE_HEADER.size
+    for *_, end in _scan(data, path):
+        pass
+    return end
+
+
+def replay(path, spill_dir=None):
+    """Rebuild a session from its log
+
+    Returns a dict with ``proctoring_data`` (the same structure the app keeps
+    in session state, ready for ``generate_report``), ``start_time``,
+    ``quiz_data``, ``user_answers``, ``blink_count`` and ``submitted``. The
+    caller owns ``proctoring_data['frames']`` and closes it when done.
+    """
+    proctoring_data = {
+        'frames': FrameStore(spill_dir=spill_dir),
+        'stats': SessionStats(),
+        'risk': RiskEngine(),
+        'tab_switches': 0,
+        'tabs': TabActivityTracker(),
+        'time_on_camera': 0,
+    }
+    session = {
+        'proctoring_data': proctoring_data,
+        'start_time': None,
+        'quiz_data': None,
+        'user_answers': {},
+        'blink_count': 0,
+        'submitted': False,
+    }
+    for kind, timestamp, payload in read_records(path):
+        if kind == FRAME:
+            face_count, blink_count = FRAME_PAYLOAD.unpack(payload)
+            proctoring_data['frames'].append(
+                timestamps=timestamp, face_counts=face_count, blink_counts=blink_count)
+            proctoring_data['stats'].update(timestamp, face_count, blink_count)
+            proctoring_data['risk'].observe_frame(timestamp, face_count, blink_count)
+            session['blink_count'] = blink_count
+            if session['start_time'] is not None:
+                proctoring_data['time_on_camera'] = timestamp - session['start_time']
+        elif kind == TAB_EVENT:
+            seq, code = TAB_PAYLOAD.unpack(payload)
+            tabs = proctoring_data['tabs']
+            for switch_time in tabs.ingest([(seq, code.decode("ascii"), timestamp)]):
+                proctoring_data['risk'].record_event('tab_switch', switch_time)
+            proctoring_data['tab_switches'] = tabs.switches
+        elif kind == START:
+            session['start_time'] = timestamp
+        elif kind == ANSWER:
+            answer = json.loads(payload)
+            session['user_answers'][answer['id']] = answer['answer']
+        elif kind == QUIZ:
+            session['quiz_data'] = json.loads(payload)
+            session['user_answers'] = {}
+        elif kind == SUBMIT:
+            session['submitted'] = True
+        elif kind == PAGE_LOAD:
+            proctoring_data['tabs'].reset_sequence()
+        elif kind == BLINKS:
+            session['blink_count'], = BLINKS_PAYLOAD.unpack(payload)
+            proctoring_data['stats'].set_blink_count(session['blink_count'])
+    return session
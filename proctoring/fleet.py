@@ -0,0 +1,265 @@
+"""Cohort analytics over many exam sessions
+
+Session event logs (``*.plog``) and saved report JSON files (single reports
+or the ``{path: report}`` output of ``proctoring.batch``) are reduced to one
+row per session in a pandas DataFrame. Cohort statistics are computed with
+vectorized column operations. ``FleetIndex`` remembers each source file's
+size and mtime and, on refresh, only reads files that are new or changed,
+so re-running as sessions finish costs time proportional to what changed.
+
+Usage::
+
+    python -m proctoring.fleet session_logs/ reports/ --cache fleet.pkl
+"""
+import argparse
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from proctoring.eventlog import LOG_SUFFIX, replay
+from proctoring.report import build_report, frame_timeline
+
+NUMERIC_COLUMNS = (
+    'total_exam_time_minutes',
+    'face_visibility_percentage',
+    'no_face_detected_instances',
+    'no_face_duration_seconds',
+    'multiple_faces_detected_instances',
+    'multiple_faces_duration_seconds',
+    'total_blinks',
+    'blink_rate_per_minute',
+    'tab_switches',
+    'tab_away_seconds',
+    'longest_tab_away_seconds',
+    'live_risk_score',
+    'peak_risk_score',
+    'risk_alerts',
+)
+CATEGORY_COLUMNS = ('potential_cheating_risk', 'peak_risk_level')
+RISK_LEVELS = ('Low', 'Medium', 'High')
+PERCENTILES = (50, 90, 95, 99)
+# Modified z-score above which a blink rate is reported as an outlier
+OUTLIER_Z = 3.5
+# Keys every report from build_report has; other JSON files are not reports
+REPORT_KEYS = ('total_exam_time_minutes', 'tab_switches', 'potential_cheating_risk')
+
+
+def find_sources(paths, exclude=()):
+    """Expand files and directories (recursively) into session logs and JSON files, minus ``exclude``"""
+    excluded = {os.path.abspath(path) for path in exclude if path}
+    sources = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                sources.extend(
+                    os.path.join(root, name) for name in files
+                    if name.endswith((LOG_SUFFIX, '.json'))
+                )
+        else:
+            sources.append(path)
+    return sorted(path for path in sources if os.path.abspath(path) not in excluded)
+
+
+def is_report(data):
+    return isinstance(data, dict) and all(key in data for key in REPORT_KEYS)
+
+
+def report_from_log(path):
+    """Replay a session log into the same report dict generate_report builds"""
+    session = replay(path)
+    data = session['proctoring_data']
+    try:
+        end = data['stats'].last_timestamp
+        return build_report(
+            data['stats'].snapshot(),
+            data['time_on_camera'],
+            data['tab_switches'],
+            data['risk'].snapshot(),
+            data['tabs'].snapshot(end),
+            frame_timeline(data['frames'])
+        )
+    finally:
+        data['frames'].close()
+
+
+def load_source(path):
+    """Rows (dicts with a ``session`` key) for one source file
+
+    JSON that is neither a report nor batch output (e.g. a cohort summary
+    written next to the reports) yields no rows.
+    """
+    if path.endswith(LOG_SUFFIX):
+        session = os.path.basename(path)[:-len(LOG_SUFFIX)]
+        return [dict(report_from_log(path), session=session)]
+    with open(path) as f:
+        data = json.load(f)
+    if is_report(data):
+        return [dict(data, session=os.path.splitext(os.path.basename(path))[0])]
+    # Batch output: {recording path: report}; failed recordings only carry an error
+    if not isinstance(data, dict) or not data or not all(
+            is_report(report) or (isinstance(report, dict) and 'error' in report) for report in data.values()):
+        return []
+    return [dict(report, session=name) for name, report in data.items() if is_report(report)]
+
+
+def _signature(path):
+    stat = os.stat(path)
+    return stat.st_size, stat.st_mtime_ns
+
+
+def to_frame(rows):
+    """One row per session with typed numeric and categorical columns"""
+    frame = pd.DataFrame.from_records(rows, columns=('session', 'source') + NUMERIC_COLUMNS + CATEGORY_COLUMNS)
+    for column in NUMERIC_COLUMNS:
+        frame[column] = pd.to_numeric(frame[column], errors='coerce').astype(np.float64)
+    for column in CATEGORY_COLUMNS:
+        frame[column] = pd.Categorical(frame[column], categories=RISK_LEVELS)
+    return frame
+
+
+class FleetIndex:
+    """Incrementally maintained table of per-session report rows
+
+    ``cache_path`` (optional) persists the table and the file signatures it
+    was built from between runs.
+    """
+
+    def __init__(self, cache_path=None):
+        self.cache_path = cache_path
+        self.signatures = {}
+        self.frame = to_frame([])
+        if cache_path and os.path.exists(cache_path):
+            cached = pd.read_pickle(cache_path)
+            self.signatures = cached['signatures']
+            self.frame = cached['frame']
+
+    def refresh(self, paths, workers=1, exclude=()):
+        """Load new or changed sources and drop vanished ones; returns the number of files read
+
+        ``exclude`` lists files to skip, such as this tool's own output.
+        """
+        sources = find_sources(paths, exclude)
+        current = {}
+        for path in sources:
+            try:
+                current[path] = _signature(path)
+            except OSError:
+                continue
+        stale = [path for path, signature in current.items() if self.signatures.get(path) != signature]
+        removed = set(self.signatures) - set(current)
+
+        rows = []
+        failed = set()
+        if workers > 1 and len(stale) > 1:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                loaded = list(pool.map(_load_tagged, stale))
+        else:
+            loaded = [_load_tagged(path) for path in stale]
+        for path, source_rows in loaded:
+            if source_rows is None:
+                failed.add(path)
+                continue
+            rows.extend(dict(row, source=path) for row in source_rows)
+
+        replaced = set(stale) | removed
+        if replaced:
+            keep = ~self.frame['source'].isin(replaced)
+            self.frame = pd.concat([self.frame[keep], to_frame(rows)], ignore_index=True) if rows \
+                else self.frame[keep].reset_index(drop=True)
+        for path in removed:
+            del self.signatures[path]
+        for path in stale:
+            if path not in failed:
+                self.signatures[path] = current[path]
+        if self.cache_path and replaced:
+            pd.to_pickle({'signatures': self.signatures, 'frame': self.frame}, self.cache_path)
+        return len(stale)
+
+    def cohort_stats(self):
+        return cohort_stats(self.frame)
+
+
+def _load_tagged(path):
+    try:
+        return path, load_source(path)
+    except (OSError, ValueError, KeyError):
+        return path, None
+
+
+def _percentiles(values):
+    values = values[~np.isnan(values)]
+    if not len(values):
+        return {f"p{p}": None for p in PERCENTILES}
+    return {f"p{p}": float(v) for p, v in zip(PERCENTILES, np.percentile(values, PERCENTILES))}
+
+
+def blink_rate_outliers(frame, threshold=OUTLIER_Z):
+    """Sessions whose blink rate is far from the cohort median (modified z-score on MAD)"""
+    rates = frame['blink_rate_per_minute'].to_numpy()
+    valid = ~np.isnan(rates)
+    if not valid.any():
+        return frame.iloc[:0][['session', 'blink_rate_per_minute']].assign(z_score=[])
+    median = np.median(rates[valid])
+    deviations = np.abs(rates[valid] - median)
+    mad = np.median(deviations)
+    if mad:
+        scale = mad / 0.6745
+    else:
+        # More than half the cohort shares one rate: scale by the mean absolute deviation
+        scale = 1.253314 * np.mean(deviations) or 1.0
+    z = (rates - median) / scale
+    mask = valid & (np.abs(z) > threshold)
+    return frame.loc[mask, ['session', 'blink_rate_per_minute']].assign(z_score=z[mask])
+
+
+def cohort_stats(frame):
+    """Risk distributions, blink-rate outliers and tab-switch percentiles for a cohort"""
+    stats = {'sessions': int(len(frame))}
+    for column in CATEGORY_COLUMNS:
+        counts = frame[column].value_counts(sort=False)
+        stats[f"{column}_distribution"] = {level: int(counts.get(level, 0)) for level in RISK_LEVELS}
+    for column in ('peak_risk_score', 'live_risk_score'):
+        scores = frame[column].to_numpy()
+        scores = scores[~np.isnan(scores)]
+        histogram, edges = np.histogram(scores, bins=10, range=(0.0, 100.0))
+        stats[f"{column}_histogram"] = {'counts': histogram.tolist(), 'edges': edges.tolist()}
+        stats[f"{column}_percentiles"] = _percentiles(frame[column].to_numpy())
+    for column in ('tab_switches', 'tab_away_seconds', 'face_visibility_percentage', 'blink_rate_per_minute'):
+        stats[f"{column}_percentiles"] = _percentiles(frame[column].to_numpy())
+    outliers = blink_rate_outliers(frame)
+    stats['blink_rate_outliers'] = [
+        {'session': session, 'blink_rate_per_minute': float(rate), 'z_score': round(float(z), 2)}
+        for session, rate, z in outliers.itertuples(index=False)
+    ]
+    return stats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Aggregate proctoring reports across exam sessions")
+    parser.add_argument('paths', nargs='+', help="Session logs, report JSON files or directories of them")
+    parser.add_argument('--cache', default=None, help="Persist the aggregated table here between runs")
+    parser.add_argument('--workers', type=int, default=1, help="Worker processes for reading new files")
+    parser.add_argument('--csv', default=None, help="Also write the per-session table as CSV")
+    parser.add_argument('--output', '-o', default=None, help="Write cohort statistics as JSON to this file")
+    args = parser.parse_args(argv)
+
+    index = FleetIndex(args.cache)
+    read = index.refresh(args.paths, args.workers, exclude=(args.output, args.csv))
+    print(f"{read} files read, {len(index.frame)} sessions", file=sys.stderr)
+    if args.csv:
+        index.frame.to_csv(args.csv, index=False)
+    output = json.dumps(index.cohort_stats(), indent=2)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(output)
+    else:
+        print(output)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,272 @@
+"""Asynchronous quiz generation client with pluggable backends
+
+``AsyncQuizClient`` runs on its own event loop thread, so Streamlit's
+script thread only waits on a future. Identical in-flight requests share
+one generation, concurrency is capped, transient failures are retried with
+exponential backoff, and questions are handed to callbacks as soon as
+their JSON object has streamed in. ``FakeBackend`` produces well-formed
+quizzes locally with configurable latency and failure rate, for load tests
+and offline development.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+
+from proctoring.metrics import REGISTRY
+from proctoring.quiz import (
+    QUIZ_MAX_TOKENS, QUIZ_SYSTEM_PROMPT, QUIZ_TEMPERATURE, QuestionStreamParser, QuizValidationError,
+    assemble_quiz, build_prompt, cache_key, question_fingerprint
+)
+
+try:
+    from groq import AsyncGroq
+    GROQ_AVAILABLE = True
+except ImportError:
+    AsyncGroq = None
+    GROQ_AVAILABLE = False
+
+MAX_CONCURRENCY = 4
+MAX_RETRIES = 3
+MAX_REPAIRS = 2
+BACKOFF_BASE = 0.5
+BACKOFF_MAX = 8.0
+
+
+class FakeBackendError(RuntimeError):
+    """Injected failure from ``FakeBackend``"""
+
+
+class GroqBackend:
+    """Streams chat completions from the Groq API"""
+
+    def __init__(self, api_key=None, model="llama3-8b-8192", client=None):
+        if client is None:
+            if not GROQ_AVAILABLE:
+                raise RuntimeError("The groq package is not installed")
+            client = AsyncGroq(api_key=api_key)
+        self.client = client
+        self.model = model
+
+    async def stream(self, topic, difficulty, num_questions, time_limit, exclude=()):
+        response = await self.client.chat.completions.create(
+            model=self.model,
+            messages=[
+                {"role": "system", "content": QUIZ_SYSTEM_PROMPT},
+                {"role": "user", "content": build_prompt(topic, difficulty, num_questions, time_limit, exclude)}
+            ],
+            max_tokens=QUIZ_MAX_TOKENS,
+            temperature=QUIZ_TEMPERATURE,
+            stream=True
+        )
+        async for chunk in response:
+            text = chunk.choices[0].delta.content
+            if text:
+                yield text
+
+
+class FakeBackend:
+    """Local stand-in that streams a generated quiz with realistic timing
+
+    ``latency`` is the time to first token, ``tokens_per_second`` the
+    streaming rate (about four characters per token), ``failure_rate``
+    the probability that a request fails part-way through and
+    ``invalid_rate`` the probability that a question is malformed.
+    """
+
+    model = "fake"
+
+    def __init__(self, latency=0.5, tokens_per_second=200.0, failure_rate=0.0, invalid_rate=0.0,
+                 chunk_chars=32, seed=None):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.failure_rate = failure_rate
+        self.invalid_rate = invalid_rate
+        self.chunk_chars = chunk_chars
+        self._random = random.Random(seed)
+        self.requests = 0
+
+    def quiz(self, topic, difficulty, num_questions, time_limit):
+        letters = "ABCD"
+        salt = self._random.randrange(1 << 30)
+        quiz = {
+            "title": f"{topic} Quiz",
+            "description": f"A {difficulty.lower()} quiz on {topic}.",
+            "time_limit_minutes": time_limit,
+            "questions": [
+                {
+                    "id": i + 1,
+                    "question": f"{topic} question {salt}-{i + 1}?",
+                    "options": [f"Option {letter}" for letter in letters],
+                    "correct_answer": letters[(salt + i) % len(letters)]
+                }
+                for i in range(num_questions)
+            ]
+        }
+        for question in quiz["questions"]:
+            if self._random.random() < self.invalid_rate:
+                question["correct_answer"] = "Z"
+        return quiz
+
+    async def stream(self, topic, difficulty, num_questions, time_limit, exclude=()):
+        self.requests += 1
+        text = "```json\n" + json.dumps(self.quiz(topic, difficulty, num_questions, time_limit), indent=2) + "\n```"
+        fail_at = len(text) * self._random.random() if self._random.random() < self.failure_rate else None
+        await asyncio.sleep(self.latency)
+        delay = self.chunk_chars / 4.0 / self.tokens_per_second if self.tokens_per_second else 0.0
+        for start in range(0, len(text), self.chunk_chars):
+            if fail_at is not None and start >= fail_at:
+                raise FakeBackendError("Injected backend failure")
+            yield text[start:start + self.chunk_chars]
+            await asyncio.sleep(delay)
+
+
+class _Generation:
+    """One in-flight request, shared by every caller that asked for the same quiz"""
+
+    def __init__(self):
+        self.questions = []
+        self.listeners = []
+        self.seen = set()
+        self.task = None
+
+    def publish(self, question):
+        fingerprint = question_fingerprint(question)
+        if fingerprint in self.seen:
+            return
+        self.seen.add(fingerprint)
+        self.questions.append(question)
+        for listener in list(self.listeners):
+            listener(question)
+
+
+class AsyncQuizClient:
+    """Coalescing, rate-capped, retrying quiz generator
+
+    Questions failing validation are dropped as they stream in, and up to
+    ``max_repairs`` follow-up requests ask only for the missing ones.
+
+    Coroutines (``generate``) run on the client's event loop; ``submit`` and
+    ``generate_sync`` may be called from any other thread.
+    """
+
+    def __init__(self, backend, max_concurrency=MAX_CONCURRENCY, max_retries=MAX_RETRIES,
+                 backoff=BACKOFF_BASE, max_backoff=BACKOFF_MAX, max_repairs=MAX_REPAIRS, metrics=None):
+        self.backend = backend
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.max_repairs = max_repairs
+        self.metrics = metrics or REGISTRY
+        self._inflight = {}
+        self._semaphore = None
+        self._loop = None
+        self._thread = None
+
+    @property
+    def model(self):
+        return self.backend.model
+
+    def start(self):
+        """Run the event loop on a daemon thread"""
+        if self._thread is None:
+            self._loop = asyncio.new_event_loop()
+            self._thread = threading.Thread(target=self._loop.run_forever, name='quiz-llm-client', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        if self._thread is not None:
+            self._loop.call_soon_threadsafe(self._loop.stop)
+            self._thread.join()
+            self._loop.close()
+            self._thread = None
+            self._loop = None
+
+    def submit(self, topic, difficulty, num_questions, time_limit, on_question=None):
+        """Schedule a generation from another thread; returns a concurrent.futures.Future
+
+        ``on_question`` is called on the client's loop thread.
+        """
+        self.start()
+        return asyncio.run_coroutine_threadsafe(
+            self.generate(topic, difficulty, num_questions, time_limit, on_question), self._loop)
+
+    def generate_sync(self, topic, difficulty, num_questions, time_limit, timeout=None):
+        return self.submit(topic, difficulty, num_questions, time_limit).result(timeout)
+
+    async def generate(self, topic, difficulty, num_questions, time_limit, on_question=None):
+        """Generate (or join an identical in-flight generation of) a quiz"""
+        key = cache_key(self.model, topic, difficulty, num_questions, time_limit)
+        generation = self._inflight.get(key)
+        if generation is None:
+            generation = _Generation()
+            self._inflight[key] = generation
+            generation.task = asyncio.ensure_future(
+                self._run(key, generation, topic, difficulty, num_questions, time_limit))
+        else:
+            self.metrics.increment('proctoring_quiz_requests_coalesced_total')
+        if on_question is not None:
+            for question in generation.questions:
+                on_question(question)
+            generation.listeners.append(on_question)
+        try:
+            # Shielded so one caller being cancelled does not abort the shared generation
+            return await asyncio.shield(generation.task)
+        finally:
+            if on_question is not None:
+                generation.listeners.remove(on_question)
+
+    async def _run(self, key, generation, topic, difficulty, num_questions, time_limit):
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        header = {}
+        failures = repairs = 0
+        try:
+            async with self._semaphore:
+                while len(generation.questions) < num_questions:
+                    # Later rounds only ask for the questions still missing
+                    missing = num_questions - len(generation.questions)
+                    exclude = [question['question'] for question in generation.questions]
+                    try:
+                        round_header = await self._attempt(
+                            generation, topic, difficulty, missing, time_limit, exclude)
+                    except Exception:
+                        self.metrics.increment('proctoring_quiz_request_errors_total')
+                        failures += 1
+                        if failures > self.max_retries:
+                            if generation.questions:
+                                break
+                            raise
+                        delay = min(self.max_backoff, self.backoff * 2 ** (failures - 1))
+                        await asyncio.sleep(delay * random.uniform(0.5, 1.0))
+                        continue
+                    header = header or round_header
+                    if len(generation.questions) < num_questions:
+                        repairs += 1
+                        if repairs > self.max_repairs:
+                            break
+                        self.metrics.increment('proctoring_quiz_repair_requests_total')
+        finally:
+            del self._inflight[key]
+        if not generation.questions:
+            raise QuizValidationError("The model returned no valid questions")
+        return assemble_quiz(generation.questions[:num_questions], topic, difficulty, time_limit, header)
+
+    async def _attempt(self, generation, topic, difficulty, num_questions, time_limit, exclude=()):
+        """Stream one response, publishing valid questions; returns its header fields"""
+        parser = QuestionStreamParser()
+        start = time.perf_counter()
+        first_token = None
+        async for chunk in self.backend.stream(topic, difficulty, num_questions, time_limit, exclude):
+            if first_token is None:
+                first_token = time.perf_counter() - start
+                self.metrics.observe('proctoring_quiz_first_token_seconds', first_token)
+            for question in parser.feed(chunk):
+                generation.publish(question)
+        self.metrics.observe('proctoring_quiz_generation_seconds', time.perf_counter() - start)
+        if parser.invalid:
+            self.metrics.increment('proctoring_quiz_invalid_questions_total', parser.invalid)
+        return parser.header()
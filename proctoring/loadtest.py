@@ -0,0 +1,561 @@
+"""Load test: many simulated candidates against the proctoring stack on one node
+
+Each simulated candidate runs what a real exam session runs: a
+ProctoringPipeline fed from synthetic frames (or a recorded video, looped)
+instead of the webcam, the frame bookkeeping (FrameStore, SessionStats,
+RiskEngine and, optionally, an event log), tab switches posted to a tab
+inbox on the quiz server the way the page's listener posts them, a quiz generated by the AsyncQuizClient on a local
+FakeBackend, and answers posted to the quiz HTTP server until it submits.
+
+Candidates run in levels of increasing session counts. Each level reports
+per-session achieved FPS and capture-to-result latency percentiles, plus
+CPU and memory per session across this process and its inference workers.
+Levels stop at the first saturated one: its mean FPS falls below
+``fps_ratio`` of the target or its p95 latency exceeds ``max_latency_ms``.
+
+Usage::
+
+    python -m proctoring.loadtest --sessions 1 2 4 8 16 --duration 30 --workers 4
+    python -m proctoring.loadtest --video sample.mp4 --sessions 4 8 --output load.json
+
+Frames are decoded once up front and shared, so camera decoding is not part
+of the measured load.
+
+The synthetic frames contain no face, so FaceMesh never runs its landmark
+model on them and capacity comes out optimistic. Pass ``--video`` with a
+recording of a candidate for realistic numbers. Every level reports the
+share of analyzed frames that had a face. When that share is low, the
+results carry a ``warning`` and it is printed with the capacity.
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+
+import numpy as np
+
+from proctoring.engine import CV_AVAILABLE, INFERENCE_MODES, FrameAnalyzer, cv2
+from proctoring.eventlog import EventLog, log_path
+from proctoring.llm import AsyncQuizClient, FakeBackend
+from proctoring.pipeline import ProctoringPipeline
+from proctoring.quizserver import start_quiz_server
+from proctoring.report import build_report
+from proctoring.risk import RiskEngine
+from proctoring.server import InferenceServer
+from proctoring.stats import SessionStats
+from proctoring.store import FrameStore
+from proctoring.tabs import BLUR, FOCUS, HIDDEN, VISIBLE, TabActivityTracker
+
+try:
+    import psutil
+    PSUTIL_AVAILABLE = True
+except ImportError:
+    PSUTIL_AVAILABLE = False
+
+DEFAULT_SESSIONS = (1, 2, 4, 8, 16, 32)
+DEFAULT_TOPICS = ("Python", "Statistics", "Networking", "Databases")
+LATENCY_PERCENTILES = (50, 95, 99)
+QUIZ_TIMEOUT = 120.0
+# Below this share of analyzed frames with a face, landmark inference was barely measured
+MIN_FACE_FRAME_RATIO = 0.5
+NO_FACE_WARNING = ("few analyzed frames had a face, so FaceMesh landmark inference was mostly "
+                   "skipped: capacity and latencies are optimistic (pass --video with a recording of a candidate)")
+
+
+def _default_analyzer(mode):
+    return FrameAnalyzer(mode=mode)
+
+
+class SyntheticVideo:
+    """Endless frames with a moving bright patch (no face), precomputed and cycled
+
+    ``read`` follows ``cv2.VideoCapture.read`` and fills ``image`` in place
+    when it is given with the right shape.
+    """
+
+    def __init__(self, width=1280, height=720, frames=30, seed=0):
+        rng = np.random.default_rng(seed)
+        base = rng.integers(40, 90, (height, width, 3), dtype=np.uint8)
+        size = min(width, height) // 4
+        self.frames = []
+        for i in range(frames):
+            frame = base.copy()
+            x = (width - size) * i // max(1, frames - 1)
+            frame[height // 3:height // 3 + size, x:x + size] = 220
+            self.frames.append(frame)
+        self.index = 0
+
+    def read(self, image=None):
+        frame = self.frames[self.index]
+        self.index = (self.index + 1) % len(self.frames)
+        if image is not None and image.shape == frame.shape:
+            np.copyto(image, frame)
+            return True, image
+        return True, frame.copy()
+
+    def share(self, offset):
+        """A reader over the same frames, starting ``offset`` frames in"""
+        reader = object.__new__(type(self))
+        reader.frames = self.frames
+        reader.index = offset % len(self.frames)
+        return reader
+
+
+class RecordedVideo(SyntheticVideo):
+    """Up to ``max_frames`` frames of a recording, looped"""
+
+    def __init__(self, path, max_frames=300):
+        if not CV_AVAILABLE:
+            raise RuntimeError("OpenCV is required to read recorded video")
+        cap = cv2.VideoCapture(path)
+        self.frames = []
+        try:
+            while len(self.frames) < max_frames:
+                ret, frame = cap.read()
+                if not ret:
+                    break
+                self.frames.append(frame)
+        finally:
+            cap.release()
+        if not self.frames:
+            raise IOError(f"Could not read frames from {path}")
+        self.index = 0
+
+
+class Candidate:
+    """One simulated exam session"""
+
+    def __init__(self, index, analyzer, source, quiz_client, quiz_url, store, target_fps=15,
+                 topic="Python", num_questions=5, answer_interval=5.0, tab_switch_rate=1.0,
+                 log_dir=None, seed=None):
+        self.index = index
+        self.analyzer = analyzer
+        self.source = source
+        self.quiz_client = quiz_client
+        self.quiz_url = quiz_url
+        self.store = store
+        self.target_fps = target_fps
+        self.topic = topic
+        self.num_questions = num_questions
+        self.answer_interval = answer_interval
+        self.tab_switch_rate = tab_switch_rate
+        self.random = random.Random(seed)
+        self.frames = FrameStore()
+        self.stats = SessionStats()
+        self.risk = RiskEngine()
+        self.tabs = TabActivityTracker()
+        self.event_log = EventLog(log_path(log_dir, f"loadtest-{index}")) if log_dir else None
+        self.latencies = []
+        self.answers_sent = 0
+        self.quiz_seconds = None
+        self.errors = []
+        self.token = None
+        self.tab_token = None
+        self.tab_inbox = None
+        self.started = None
+        self.elapsed = None
+        self.pipeline = None
+        self.report = None
+        self._tab_seq = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def on_result(self, result):
+        self.latencies.append(time.time() - result.timestamp)
+        if self.event_log is not None:
+            self.event_log.frame(result.timestamp, result.face_count, result.blink_count)
+        self.frames.append(timestamps=result.timestamp, face_counts=result.face_count,
+                           blink_counts=result.blink_count)
+        self.stats.update(result.timestamp, result.face_count, result.blink_count)
+        self.risk.observe_frame(result.timestamp, result.face_count, result.blink_count)
+
+    def start(self):
+        self.started = time.time()
+        if self.event_log is not None:
+            self.event_log.start(self.started)
+        self.tab_token, self.tab_inbox = self.store.open_inbox()
+        self.analyzer.subscribe(self.on_result)
+        self.pipeline = ProctoringPipeline(self.source, self.analyzer, target_fps=self.target_fps,
+                                           metrics_labels={'session': f"load-{self.index}"}).start()
+        self._thread = threading.Thread(target=self._run, name=f"proctoring-load-{self.index}", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.pipeline.stop()
+        self.store.close_inbox(self.tab_token)
+        self.elapsed = time.time() - self.started
+        if self.pipeline.error:
+            self.errors.append(self.pipeline.error)
+        self.report = build_report(self.stats.snapshot(), self.elapsed, self.tabs.switches,
+                                   self.risk.snapshot(), self.tabs.snapshot(time.time()))
+        if self.event_log is not None:
+            self.event_log.close()
+
+    def _tab_switch(self):
+        """Leave the page for a few seconds, posted to the tab inbox as the in-page listener would"""
+        now_ms = time.time() * 1000
+        away_ms = self.random.uniform(1000, 5000)
+        events = []
+        for code, t_ms in ((BLUR, now_ms), (HIDDEN, now_ms), (VISIBLE, now_ms + away_ms), (FOCUS, now_ms + away_ms)):
+            self._tab_seq += 1
+            events.append([self._tab_seq, code, t_ms])
+        reply = self._post('tabs', {'events': events, 'now': now_ms}, token=self.tab_token)
+        if reply.get('ack') != self._tab_seq:
+            raise RuntimeError(f"Tab inbox acknowledged {reply.get('ack')} of {self._tab_seq} events")
+        # Then apply what the app would drain from the inbox on its next rerun
+        events = self.tab_inbox.drain()
+        if self.event_log is not None:
+            self.event_log.tab_events(events)
+        for switch_time in self.tabs.ingest(events):
+            self.risk.record_event('tab_switch', switch_time)
+
+    def _post(self, path, payload=None, token=None):
+        data = json.dumps(payload).encode('utf-8') if payload is not None else b''
+        url = f"{self.quiz_url}/api/{token or self.token}/{path}"
+        request = urllib.request.Request(url, data=data, method='POST')
+        with urllib.request.urlopen(request, timeout=10) as response:
+            return json.loads(response.read())
+
+    def _quiz_ready(self, quiz, requested):
+        self.quiz_seconds = time.time() - requested
+        if self.event_log is not None:
+            self.event_log.quiz(time.time(), quiz)
+        self.token, _ = self.store.register(quiz)
+        return list(quiz['questions'])
+
+    def _run(self):
+        try:
+            requested = time.time()
+            pending_quiz = self.quiz_client.submit(self.topic, "Medium", self.num_questions, 10)
+            questions = []
+            next_answer = float('inf')
+            rate = self.tab_switch_rate / 60.0
+            next_switch = time.time() + self.random.expovariate(rate) if rate > 0 else float('inf')
+            while not self._stop.is_set():
+                now = time.time()
+                if pending_quiz is not None and pending_quiz.done():
+                    questions = self._quiz_ready(pending_quiz.result(), requested)
+                    pending_quiz = None
+                    next_answer = now + self.random.uniform(0, self.answer_interval)
+                elif pending_quiz is not None and now - requested > QUIZ_TIMEOUT:
+                    raise TimeoutError("Quiz generation timed out")
+                if questions and now >= next_answer:
+                    question = questions.pop(0)
+                    self._post('answers', {'answers': [
+                        {'id': question['id'], 'answer': self.random.choice(question['options'])}]})
+                    self.answers_sent += 1
+                    if not questions:
+                        self._post('submit')
+                    next_answer = now + self.answer_interval
+                if now >= next_switch:
+                    self._tab_switch()
+                    next_switch = now + self.random.expovariate(rate)
+                # Poll often enough to notice the quiz arriving
+                wake = min(next_answer, next_switch, now + 0.1)
+                self._stop.wait(max(0.01, wake - time.time()))
+        except Exception as e:
+            self.errors.append(str(e))
+
+    def summary(self):
+        latencies = np.array(self.latencies) * 1000
+        processed = self.pipeline.frames_processed
+        return {
+            'session': self.index,
+            'fps': round(processed / self.elapsed, 2) if self.elapsed else 0.0,
+            'frames': processed,
+            'face_frames': self.stats.frames - self.stats.no_face_frames,
+            # Captured but never analyzed: replaced in the capture slot or dropped by the server
+            'dropped_frames': self.pipeline.frames_captured - processed,
+            'latency_ms': _percentiles(latencies),
+            'quiz_seconds': round(self.quiz_seconds, 3) if self.quiz_seconds is not None else None,
+            'answers': self.answers_sent,
+            'tab_switches': self.tabs.switches,
+            'risk_level': self.report['peak_risk_level'] if self.report else None,
+            'errors': self.errors,
+        }
+
+
+def _percentiles(values):
+    if not len(values):
+        return {f"p{p}": None for p in LATENCY_PERCENTILES}
+    return {f"p{p}": round(float(v), 2) for p, v in zip(LATENCY_PERCENTILES, np.percentile(values, LATENCY_PERCENTILES))}
+
+
+def _process_usage(pid):
+    """(cpu_seconds, rss_bytes) of a process, or None if it can't be read"""
+    if PSUTIL_AVAILABLE:
+        try:
+            process = psutil.Process(pid)
+            times = process.cpu_times()
+            return times.user + times.system, process.memory_info().rss
+        except psutil.Error:
+            return None
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+    except OSError:
+        if pid != os.getpid():
+            return None
+        # No procfs: only this process can be measured
+        import resource
+
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        # ru_maxrss is the peak, in KiB on Linux
+        return usage.ru_utime + usage.ru_stime, usage.ru_maxrss * 1024
+    ticks = os.sysconf('SC_CLK_TCK')
+    # utime, stime and rss (pages) are fields 14, 15 and 24 of /proc/<pid>/stat
+    return (int(fields[11]) + int(fields[12])) / ticks, int(fields[21]) * os.sysconf('SC_PAGE_SIZE')
+
+
+class ResourceSampler:
+    """Samples CPU time and RSS of this process and its worker processes"""
+
+    def __init__(self, interval=0.5):
+        self.interval = interval
+        self.peak_rss = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def usage(self):
+        pids = [os.getpid()] + [child.pid for child in multiprocessing.active_children()]
+        cpu = rss = 0
+        for pid in pids:
+            usage = _process_usage(pid)
+            if usage is not None:
+                cpu += usage[0]
+                rss += usage[1]
+        return cpu, rss
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.start_cpu, self.start_rss = self.usage()
+        self.peak_rss = self.start_rss
+        self._thread = threading.Thread(target=self._run, name="proctoring-load-sampler", daemon=True)
+        self._thread.start()
+        return self
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak_rss = max(self.peak_rss, self.usage()[1])
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        cpu, rss = self.usage()
+        self.peak_rss = max(self.peak_rss, rss)
+        elapsed = time.perf_counter() - self.start_time
+        return {
+            'cpu_cores': round((cpu - self.start_cpu) / elapsed, 3) if elapsed else None,
+            'rss_growth_mb': round((self.peak_rss - self.start_rss) / 1e6, 1),
+            'peak_rss_mb': round(self.peak_rss / 1e6, 1),
+        }
+
+
+def run_level(sessions, duration, make_analyzer, make_source, quiz_client, quiz_url, store,
+              target_fps=15, topics=DEFAULT_TOPICS, num_questions=5, answer_interval=5.0,
+              tab_switch_rate=1.0, log_dir=None, seed=0):
+    """Run ``sessions`` candidates for ``duration`` seconds and summarize the level"""
+    candidates = [
+        Candidate(i, make_analyzer(i), make_source(i), quiz_client, quiz_url, store, target_fps,
+                  topics[i % len(topics)], num_questions, answer_interval, tab_switch_rate, log_dir,
+                  seed=seed * 100003 + i)
+        for i in range(sessions)
+    ]
+    sampler = ResourceSampler().start()
+    # Spread session starts over the first second so they don't all hit the models at once
+    for candidate in candidates:
+        candidate.start()
+        time.sleep(min(1.0, duration / 10) / sessions)
+    time.sleep(duration)
+    for candidate in candidates:
+        candidate.stop()
+    resources = sampler.stop()
+    for candidate in candidates:
+        if hasattr(candidate.analyzer, 'close'):
+            candidate.analyzer.close()
+
+    per_session = [candidate.summary() for candidate in candidates]
+    fps = np.array([s['fps'] for s in per_session])
+    latencies = np.concatenate([np.array(c.latencies) * 1000 for c in candidates])
+    quiz_seconds = np.array([s['quiz_seconds'] for s in per_session if s['quiz_seconds'] is not None])
+    analyzed = sum(candidate.stats.frames for candidate in candidates)
+    return {
+        'sessions': sessions,
+        'duration_seconds': duration,
+        'target_fps': target_fps,
+        'fps_mean': round(float(fps.mean()), 2),
+        'fps_min': round(float(fps.min()), 2),
+        'latency_ms': _percentiles(latencies),
+        'dropped_frames': int(sum(s['dropped_frames'] for s in per_session)),
+        'face_frame_ratio': round(sum(s['face_frames'] for s in per_session) / analyzed, 3) if analyzed else 0.0,
+        'quiz_seconds': _percentiles(quiz_seconds),
+        'answers': int(sum(s['answers'] for s in per_session)),
+        'cpu_cores': resources['cpu_cores'],
+        'cpu_cores_per_session': round(resources['cpu_cores'] / sessions, 3) if resources['cpu_cores'] else None,
+        'rss_growth_mb': resources['rss_growth_mb'],
+        'rss_mb_per_session': round(resources['rss_growth_mb'] / sessions, 1),
+        'peak_rss_mb': resources['peak_rss_mb'],
+        'errors': sum(len(s['errors']) for s in per_session),
+        'per_session': per_session,
+    }
+
+
+def warm_up(server, frame):
+    """Run one frame on every inference worker so process start-up isn't measured"""
+    clients = [server.open_session(f"warmup-{i}") for i in range(server.num_workers)]
+    try:
+        for client in clients:
+            client.timeout = 60.0
+            client.process(frame, time.time())
+    finally:
+        for client in clients:
+            client.close()
+
+
+def is_saturated(level, fps_ratio=0.9, max_latency_ms=500.0):
+    p95 = level['latency_ms']['p95']
+    return level['fps_mean'] < fps_ratio * level['target_fps'] or (p95 is not None and p95 > max_latency_ms)
+
+
+def run_load_test(levels=DEFAULT_SESSIONS, duration=30.0, target_fps=15, workers=0, mode='mesh',
+                  shared_memory=True, video=None, width=1280, height=720, llm_latency=0.5,
+                  llm_tokens_per_second=200.0, topics=DEFAULT_TOPICS, num_questions=5, answer_interval=5.0,
+                  tab_switch_rate=1.0, event_logs=False, fps_ratio=0.9, max_latency_ms=500.0,
+                  stop_at_saturation=True, analyzer_factory=None, progress=None):
+    """Run increasing session counts until one saturates; returns levels, capacity and saturation point
+
+    ``workers`` > 0 sends inference to an InferenceServer with that many
+    processes, otherwise every candidate gets its own in-process analyzer.
+    ``analyzer_factory(mode)`` replaces the FrameAnalyzer (it must be a
+    module-level function when ``workers`` > 0). ``event_logs`` writes each
+    session's event log to a temporary directory, removed afterwards.
+    """
+    if analyzer_factory is None and not CV_AVAILABLE:
+        raise RuntimeError("OpenCV and MediaPipe are required for the load test")
+    analyzer_factory = analyzer_factory or _default_analyzer
+    base_video = RecordedVideo(video) if video else SyntheticVideo(width, height)
+
+    server = None
+    if workers > 0:
+        server = InferenceServer(num_workers=workers, mode=mode, analyzer_factory=analyzer_factory,
+                                 shared_memory=shared_memory).start()
+        warm_up(server, base_video.frames[0])
+
+    def make_analyzer(i):
+        if server is not None:
+            return server.open_session(f"load-{i}-{time.monotonic_ns()}")
+        return analyzer_factory(mode)
+
+    quiz_client = AsyncQuizClient(FakeBackend(llm_latency, llm_tokens_per_second)).start()
+    quiz_server, store = start_quiz_server(port=0)
+    quiz_url = f"http://127.0.0.1:{quiz_server.server_address[1]}"
+    log_dir = tempfile.mkdtemp(prefix="proctoring-load-") if event_logs else None
+
+    results = []
+    saturated_at = None
+    try:
+        for sessions in levels:
+            level = run_level(sessions, duration, make_analyzer, lambda i: base_video.share(i * 7), quiz_client, quiz_url, store,
+                              target_fps, topics, num_questions, answer_interval, tab_switch_rate, log_dir,
+                              seed=len(results))
+            level['saturated'] = is_saturated(level, fps_ratio, max_latency_ms)
+            results.append(level)
+            if progress:
+                progress(level)
+            if level['saturated']:
+                saturated_at = sessions
+                if stop_at_saturation:
+                    break
+    finally:
+        quiz_client.stop()
+        quiz_server.shutdown()
+        if server is not None:
+            server.stop()
+        if log_dir:
+            shutil.rmtree(log_dir, ignore_errors=True)
+
+    healthy = [level['sessions'] for level in results if not level['saturated']]
+    face_frame_ratio = min((level['face_frame_ratio'] for level in results), default=0.0)
+    return {
+        'config': {
+            'duration_seconds': duration,
+            'target_fps': target_fps,
+            'workers': workers,
+            'mode': mode,
+            'shared_memory': shared_memory,
+            'video': video or f"synthetic {width}x{height}",
+            'cpu_count': os.cpu_count(),
+            'resource_scope': 'psutil' if PSUTIL_AVAILABLE else 'procfs',
+        },
+        'levels': results,
+        'capacity': max(healthy) if healthy else 0,
+        'saturated_at': saturated_at,
+        'face_frame_ratio': face_frame_ratio,
+        'warning': NO_FACE_WARNING if face_frame_ratio < MIN_FACE_FRAME_RATIO else None,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Simulate concurrent proctored candidates to find node capacity")
+    parser.add_argument('--sessions', type=int, nargs='+', default=list(DEFAULT_SESSIONS),
+                        help="Session counts to run, in order")
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds per level")
+    parser.add_argument('--fps', type=int, default=15, help="Target frame rate per session")
+    parser.add_argument('--workers', type=int, default=0,
+                        help="Inference worker processes (0 runs an analyzer per session in-process)")
+    parser.add_argument('--mode', choices=INFERENCE_MODES, default='mesh', help="Inference mode")
+    parser.add_argument('--no-shared-memory', action='store_true', help="Pickle frames to workers instead")
+    parser.add_argument('--video', default=None, help="Loop this recording instead of synthetic frames")
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=720)
+    parser.add_argument('--llm-latency', type=float, default=0.5, help="Fake LLM time to first token")
+    parser.add_argument('--tab-switch-rate', type=float, default=1.0, help="Tab switches per candidate-minute")
+    parser.add_argument('--answer-interval', type=float, default=5.0, help="Seconds between answers")
+    parser.add_argument('--event-logs', action='store_true', help="Also write per-session event logs")
+    parser.add_argument('--fps-ratio', type=float, default=0.9,
+                        help="Saturated when mean FPS drops below this fraction of the target")
+    parser.add_argument('--max-latency-ms', type=float, default=500.0,
+                        help="Saturated when p95 latency exceeds this")
+    parser.add_argument('--all-levels', action='store_true', help="Keep going after the first saturated level")
+    parser.add_argument('--output', '-o', default=None, help="Write full results as JSON to this file")
+    args = parser.parse_args(argv)
+
+    print(f"{'sessions':>8}{'fps':>8}{'min fps':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'cpu/s':>8}{'MB/s':>8}{'faces':>7}", file=sys.stderr)
+
+    def progress(level):
+        latency = level['latency_ms']
+        print(f"{level['sessions']:>8}{level['fps_mean']:>8}{level['fps_min']:>9}{latency['p50']!s:>9}"
+              f"{latency['p95']!s:>9}{latency['p99']!s:>9}{level['cpu_cores_per_session']!s:>8}"
+              f"{level['rss_mb_per_session']!s:>8}{level['face_frame_ratio']:>7.0%}"
+              f"{'  saturated' if level['saturated'] else ''}", file=sys.stderr)
+
+    results = run_load_test(
+        args.sessions, args.duration, args.fps, args.workers, args.mode, not args.no_shared_memory,
+        args.video, args.width, args.height, args.llm_latency, tab_switch_rate=args.tab_switch_rate,
+        answer_interval=args.answer_interval, event_logs=args.event_logs,
+        fps_ratio=args.fps_ratio, max_latency_ms=args.max_latency_ms,
+        stop_at_saturation=not args.all_levels, progress=progress)
+    print(f"capacity: {results['capacity']} sessions"
+          + (f", saturated at {results['saturated_at']}" if results['saturated_at'] else ""), file=sys.stderr)
+    if results['warning']:
+        print(f"WARNING: {results['warning']}", file=sys.stderr)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
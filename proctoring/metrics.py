@@ -0,0 +1,222 @@
+"""Stage timers and counters for the proctoring loop
+
+Everything is recorded in a thread-safe in-process ``MetricsRegistry``.
+The registry can be exported as Prometheus text (optionally served on a
+local HTTP port) or dumped as JSON; other sinks can subscribe to every
+observation with ``add_sink``.
+"""
+import bisect
+import json
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, from sub-millisecond bookkeeping up to LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+STAGE_SECONDS = 'proctoring_stage_seconds'
+
+
+def _label_key(labels):
+    return tuple(sorted(labels.items()))
+
+
+def _format_labels(key, extra=None):
+    items = list(key) + (list(extra.items()) if extra else [])
+    if not items:
+        return ''
+    return '{' + ','.join(f'{name}="{value}"' for name, value in items) + '}'
+
+
+class _Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bucket bound containing the q-th observation"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        running = 0
+        for bound, count in zip(self.buckets, self.counts):
+            running += count
+            if running >= target:
+                return bound
+        return self.max
+
+
+class MetricsRegistry:
+    """Counters, gauges and histograms keyed by name and labels"""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counters = {}
+        self._gauges = {}
+        self._histograms = {}
+        self._sinks = []
+        self._lock = threading.Lock()
+
+    def add_sink(self, sink):
+        """Register a callable ``sink(kind, name, value, labels)`` for every observation"""
+        self._sinks.append(sink)
+        return sink
+
+    def _emit(self, kind, name, value, labels):
+        for sink in self._sinks:
+            sink(kind, name, value, labels)
+
+    def increment(self, name, value=1, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + value
+        if self._sinks:
+            self._emit('counter', name, value, labels)
+
+    def set_gauge(self, name, value, **labels):
+        with self._lock:
+            self._gauges[(name, _label_key(labels))] = value
+        if self._sinks:
+            self._emit('gauge', name, value, labels)
+
+    def observe(self, name, value, **labels):
+        key = (name, _label_key(labels))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = _Histogram(self.buckets)
+            histogram.observe(value)
+        if self._sinks:
+            self._emit('histogram', name, value, labels)
+
+    @contextmanager
+    def timer(self, name=STAGE_SECONDS, **labels):
+        """Time the enclosed block into a histogram"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def stage(self, stage, **labels):
+        """Shorthand for timing a named proctoring stage"""
+        return self.timer(STAGE_SECONDS, stage=stage, **labels)
+
+    def remove(self, **labels):
+        """Drop every series carrying these label values, e.g. a closed session's"""
+        wanted = set(labels.items())
+        with self._lock:
+            for series in (self._counters, self._gauges, self._histograms):
+                for key in [key for key in series if wanted <= set(key[1])]:
+                    del series[key]
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._histograms.clear()
+
+    def to_dict(self):
+        """Plain-dict snapshot suitable for JSON"""
+        with self._lock:
+            return {
+                'counters': [
+                    {'name': name, 'labels': dict(key), 'value': value}
+                    for (name, key), value in self._counters.items()
+                ],
+                'gauges': [
+                    {'name': name, 'labels': dict(key), 'value': value}
+                    for (name, key), value in self._gauges.items()
+                ],
+                'histograms': [
+                    {
+                        'name': name,
+                        'labels': dict(key),
+                        'count': histogram.count,
+                        'sum': histogram.sum,
+                        'max': histogram.max,
+                        'p50': histogram.quantile(0.5),
+                        'p99': histogram.quantile(0.99),
+                    }
+                    for (name, key), histogram in self._histograms.items()
+                ],
+            }
+
+    def dump_json(self, path=None):
+        """Return the snapshot as JSON, also writing it to ``path`` if given"""
+        output = json.dumps(self.to_dict(), indent=2)
+        if path:
+            with open(path, 'w') as f:
+                f.write(output)
+        return output
+
+    def render_prometheus(self):
+        """Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for kind, series in (('counter', self._counters), ('gauge', self._gauges)):
+                seen = set()
+                for (name, key), value in sorted(series.items()):
+                    if name not in seen:
+                        lines.append(f"# TYPE {name} {kind}")
+                        seen.add(name)
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            seen = set()
+            for (name, key), histogram in sorted(self._histograms.items()):
+                if name not in seen:
+                    lines.append(f"# TYPE {name} histogram")
+                    seen.add(name)
+                running = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    running += count
+                    lines.append(f"{name}_bucket{_format_labels(key, {'le': bound})} {running}")
+                lines.append(f"{name}_bucket{_format_labels(key, {'le': '+Inf'})} {histogram.count}")
+                lines.append(f"{name}_sum{_format_labels(key)} {histogram.sum}")
+                lines.append(f"{name}_count{_format_labels(key)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    registry = None
+
+    def do_GET(self):
+        if self.path.startswith('/metrics.json'):
+            body, content_type = self.registry.dump_json(), 'application/json'
+        elif self.path.startswith('/metrics'):
+            body, content_type = self.registry.render_prometheus(), 'text/plain; version=0.0.4'
+        else:
+            self.send_error(404)
+            return
+        payload = body.encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_http_server(port=9108, host='127.0.0.1', registry=None):
+    """Serve /metrics (Prometheus text) and /metrics.json on a background thread"""
+    handler = type('MetricsHandler', (_MetricsHandler,), {'registry': registry or REGISTRY})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name='proctoring-metrics', daemon=True)
+    thread.start()
+    return server
+
+
+# Process-wide default registry used by the engine, pipeline and app
+REGISTRY = MetricsRegistry()
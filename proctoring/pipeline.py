@@ -0,0 +1,205 @@
+"""Capture -> inference -> render pipeline connected by newest-frame slots"""
+import threading
+import time
+
+from proctoring.metrics import REGISTRY
+
+
+class LatestFrameQueue:
+    """Single-slot queue that always holds the newest item
+
+    Putting into a full slot replaces the old item and counts it as dropped,
+    so slow consumers never see stale frames.
+    """
+
+    def __init__(self):
+        self._item = None
+        self._has_item = False
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.closed = False
+
+    def put(self, item):
+        """Store ``item``; returns True if an unread item was dropped"""
+        with self._cond:
+            replaced = self._has_item
+            if replaced:
+                self.dropped += 1
+            self._item = item
+            self._has_item = True
+            self._cond.notify()
+            return replaced
+
+    def get(self, timeout=None):
+        """Return the newest item, or None on timeout or after close"""
+        with self._cond:
+            if not self._has_item and not self.closed:
+                self._cond.wait(timeout)
+            if not self._has_item:
+                return None
+            item = self._item
+            self._item = None
+            self._has_item = False
+            return item
+
+    def qsize(self):
+        with self._cond:
+            return 1 if self._has_item else 0
+
+    def close(self):
+        with self._cond:
+            self.closed = True
+            self._cond.notify_all()
+
+
+class FrameRateLimiter:
+    """Sleeps just enough to keep a loop at or below a target rate"""
+
+    def __init__(self, target_fps=None):
+        self.interval = 1.0 / target_fps if target_fps else 0.0
+        self._next = time.monotonic()
+
+    def wait(self, stop_event=None):
+        if not self.interval:
+            return
+        now = time.monotonic()
+        delay = self._next - now
+        if delay > 0:
+            if stop_event is not None:
+                stop_event.wait(delay)
+            else:
+                time.sleep(delay)
+            now = time.monotonic()
+        # Don't try to catch up after a stall, just resume at the target rate
+        self._next = max(self._next + self.interval, now)
+
+
+class ProctoringPipeline:
+    """Runs capture and inference on their own threads
+
+    ``source`` is anything with a ``read()`` method returning ``(ret, frame)``
+    such as ``cv2.VideoCapture``. ``analyzer`` is a FrameAnalyzer; if it has a
+    ``read_frame(source)`` method (a SessionClient with a shared memory ring)
+    capture goes through it so frames land directly in shared memory. Results are
+    published as ``(frame, result)`` tuples to the render slot, which the
+    caller drains with ``get_rendered`` or hands to ``render_callback`` on a
+    dedicated render thread. ``render_due`` (e.g. ``PreviewEncoder.due``), when
+    given, is asked before each result is published; results it turns down
+    skip the render slot, and the frame copy a shared memory ring needs.
+
+    When the source runs out, capture closes its slot and inference still
+    analyzes the frame left in it; the pipeline stops running after that.
+    """
+
+    def __init__(self, source, analyzer, target_fps=15, render_callback=None, render_fps=None,
+                 metrics=None, metrics_labels=None, render_due=None):
+        self.source = source
+        self.analyzer = analyzer
+        self.target_fps = target_fps
+        self.render_callback = render_callback
+        self.render_fps = render_fps or target_fps
+        self.render_due = render_due
+        self.capture_queue = LatestFrameQueue()
+        self.render_queue = LatestFrameQueue()
+        self.frames_captured = 0
+        self.frames_processed = 0
+        self.error = None
+        self.metrics = metrics or REGISTRY
+        self.metrics_labels = metrics_labels or {}
+        self._stop = threading.Event()
+        self._threads = []
+
+    @property
+    def running(self):
+        return not self._stop.is_set()
+
+    @property
+    def dropped_frames(self):
+        return self.capture_queue.dropped + self.render_queue.dropped
+
+    def start(self):
+        stages = [('capture', self._capture_loop), ('inference', self._inference_loop)]
+        if self.render_callback is not None:
+            stages.append(('render', self._render_loop))
+        for name, target in stages:
+            thread = threading.Thread(target=target, name=f"proctoring-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        self.capture_queue.close()
+        self.render_queue.close()
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join(timeout)
+        self._threads = []
+
+    def get_rendered(self, timeout=None):
+        """Return the newest ``(frame, result)`` pair from the inference stage"""
+        return self.render_queue.get(timeout)
+
+    def _put(self, slot, name, item):
+        if slot.put(item):
+            self.metrics.increment('proctoring_dropped_frames_total', queue=name, **self.metrics_labels)
+        self.metrics.set_gauge('proctoring_queue_depth', slot.qsize(), queue=name, **self.metrics_labels)
+
+    def _capture_loop(self):
+        limiter = FrameRateLimiter(self.target_fps)
+        read = getattr(self.analyzer, 'read_frame', None)
+        try:
+            while not self._stop.is_set():
+                with self.metrics.stage('capture', **self.metrics_labels):
+                    ret, frame = read(self.source) if read else self.source.read()
+                if not ret:
+                    self.error = "Failed to get frame from webcam."
+                    break
+                self.frames_captured += 1
+                self._put(self.capture_queue, 'capture', (time.time(), frame))
+                limiter.wait(self._stop)
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            # End of stream: inference finishes the last frame, then stops the pipeline
+            self.capture_queue.close()
+
+    def _inference_loop(self):
+        render_frame = getattr(self.analyzer, 'render_frame', None)
+        try:
+            while True:
+                item = self.capture_queue.get(timeout=0.5)
+                if item is None:
+                    if self.capture_queue.closed or self._stop.is_set():
+                        break
+                    continue
+                timestamp, frame = item
+                result = self.analyzer.process(frame, timestamp)
+                if result is None:
+                    # Remote analyzers drop frames under backpressure
+                    continue
+                self.frames_processed += 1
+                if self.render_due is not None and not self.render_due():
+                    continue
+                if render_frame is not None:
+                    # Analyzers reading into shared buffers hand out a frame the preview can keep
+                    frame = render_frame(frame)
+                    if frame is None:
+                        continue
+                self._put(self.render_queue, 'render', (frame, result))
+        except Exception as e:
+            self.error = str(e)
+        finally:
+            self._stop.set()
+            self.render_queue.close()
+
+    def _render_loop(self):
+        limiter = FrameRateLimiter(self.render_fps)
+        while True:
+            item = self.render_queue.get(timeout=0.5)
+            if item is None:
+                if self.render_queue.closed or self._stop.is_set():
+                    break
+                continue
+            self.render_callback(*item)
+            limiter.wait(self._stop)
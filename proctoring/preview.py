@@ -0,0 +1,78 @@
+"""Compressed, rate-limited preview frames for the proctor's view
+
+Instead of pushing full uncompressed RGB arrays to Streamlit (which then
+re-encodes them on every call), frames are downscaled, optionally
+annotated, and encoded once to JPEG or WebP. The preview has its own rate,
+independent of the analysis rate.
+"""
+import time
+
+from proctoring.engine import cv2, draw_overlays
+from proctoring.metrics import REGISTRY
+
+PREVIEW_FORMATS = {
+    'jpeg': ('.jpg', 'IMWRITE_JPEG_QUALITY'),
+    'webp': ('.webp', 'IMWRITE_WEBP_QUALITY'),
+}
+
+
+class PreviewEncoder:
+    """Encodes at most ``fps`` preview frames per second
+
+    ``max_width`` caps the preview size (0 keeps the camera resolution) and
+    ``overlays=False`` skips all drawing.
+    """
+
+    def __init__(self, format='jpeg', quality=70, max_width=640, fps=5.0, overlays=True, metrics=None):
+        if format not in PREVIEW_FORMATS:
+            raise ValueError(f"Unknown preview format {format!r}, expected one of {tuple(PREVIEW_FORMATS)}")
+        self.format = format
+        self.quality = quality
+        self.max_width = max_width
+        self.fps = fps
+        self.overlays = overlays
+        self.metrics = metrics or REGISTRY
+        self._next_due = 0.0
+        self.frames_encoded = 0
+        self.bytes_encoded = 0
+
+    @property
+    def mimetype(self):
+        return f"image/{self.format}"
+
+    def due(self, now=None):
+        """True when the next preview frame should be produced"""
+        if not self.fps:
+            return True
+        now = time.monotonic() if now is None else now
+        if now < self._next_due:
+            return False
+        interval = 1.0 / self.fps
+        # Keep the schedule's phase, but after a stall restart it rather than catch up
+        self._next_due = self._next_due + interval if now - self._next_due < interval else now + interval
+        return True
+
+    def resize(self, frame):
+        height, width = frame.shape[:2]
+        if not self.max_width or width <= self.max_width:
+            return frame
+        target_height = max(1, int(round(height * self.max_width / width)))
+        return cv2.resize(frame, (self.max_width, target_height), interpolation=cv2.INTER_AREA)
+
+    def encode(self, frame, result=None, tab_switches=0):
+        """Downscale, annotate and encode a BGR frame; returns the image bytes"""
+        small = self.resize(frame)
+        if self.overlays and result is not None:
+            if small is frame:
+                small = frame.copy()
+            draw_overlays(small, result, tab_switches)
+        extension, quality_flag = PREVIEW_FORMATS[self.format]
+        with self.metrics.stage('encoding'):
+            ok, buffer = cv2.imencode(extension, small, [getattr(cv2, quality_flag), int(self.quality)])
+        if not ok:
+            raise RuntimeError(f"Could not encode preview frame as {self.format}")
+        data = buffer.tobytes()
+        self.frames_encoded += 1
+        self.bytes_encoded += len(data)
+        self.metrics.increment('proctoring_preview_bytes_total', len(data))
+        return data
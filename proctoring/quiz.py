@@ -0,0 +1,446 @@
+"""Quiz generation, caching and the pre-generated question bank (no Streamlit)
+
+Generated quizzes are cached under a content address derived from the
+prompt parameters, in memory (LRU with TTL) and optionally on disk, so the
+same topic/difficulty/count never costs a second LLM call. Questions are
+also collected into a per topic/difficulty bank that a background filler
+keeps topped up, letting quizzes be assembled without waiting on the LLM.
+"""
+import collections
+import hashlib
+import json
+import os
+import queue
+import random
+import re
+import string
+import tempfile
+import threading
+import time
+
+QUIZ_SYSTEM_PROMPT = "You are a helpful quiz generator assistant."
+QUIZ_MAX_TOKENS = 4000
+QUIZ_TEMPERATURE = 0.5
+# Bump when the prompt changes so cached quizzes from the old prompt are not reused
+PROMPT_VERSION = 1
+
+CACHE_TTL = 7 * 24 * 3600
+CACHE_MAX_ENTRIES = 256
+BANK_TARGET_SIZE = 50
+BANK_BATCH_SIZE = 10
+
+
+def build_prompt(topic, difficulty, num_questions, time_limit, exclude=()):
+    prompt = f"""
+        Create a quiz on the topic of {topic} with {num_questions} questions.
+        Difficulty level: {difficulty}
+        Time limit: {time_limit} minutes
+
+        Format the questions as a JSON array with the following structure:
+        {{
+            "title": "Quiz title",
+            "description": "Brief description of the quiz",
+            "time_limit_minutes": {time_limit},
+            "questions": [
+                {{
+                    "id": 1,
+                    "question": "Question text",
+                    "options": ["Option A", "Option B", "Option C", "Option D"],
+                    "correct_answer": "Correct option letter"
+                }},
+                ...
+            ]
+        }}
+
+        Ensure that all questions are well-structured and appropriate for the given difficulty level.
+        Return only the JSON structure without any additional text.
+        """
+    if exclude:
+        avoided = "\n".join(f"        - {question}" for question in exclude)
+        prompt += f"""
+        Do not repeat any of these questions:
+{avoided}
+        """
+    return prompt
+
+
+class QuizValidationError(ValueError):
+    """An LLM response contained no usable questions"""
+
+
+def _answer_letter(answer, options):
+    """Normalize an answer given as a letter, "Option B", "C)" or the option text"""
+    letters = string.ascii_uppercase[:len(options)]
+    text = str(answer).strip()
+    for letter, option in zip(letters, options):
+        if text.casefold() == option.strip().casefold():
+            return letter
+    match = re.match(r'^(?:option\s+)?([A-Za-z])(?:[).:]|\s|$)', text, re.IGNORECASE)
+    if match and match.group(1).upper() in letters:
+        return match.group(1).upper()
+    return None
+
+
+def validate_question(question):
+    """Normalized copy of a question dict, or None if it does not fit the quiz schema"""
+    if not isinstance(question, dict):
+        return None
+    text = question.get('question')
+    options = question.get('options')
+    if not isinstance(text, str) or not text.strip():
+        return None
+    if not isinstance(options, list) or not 2 <= len(options) <= len(string.ascii_uppercase):
+        return None
+    if not all(isinstance(option, str) and option.strip() for option in options):
+        return None
+    if len({option.strip().casefold() for option in options}) != len(options):
+        return None
+    answer = question.get('correct_answer')
+    if answer is None:
+        return None
+    letter = _answer_letter(answer, options)
+    if letter is None:
+        return None
+    return {'id': question.get('id'), 'question': text.strip(), 'options': options, 'correct_answer': letter}
+
+
+def assemble_quiz(questions, topic, difficulty, time_limit, header=None):
+    """Quiz dict in the same shape the LLM returns, with questions renumbered"""
+    header = header or {}
+    return {
+        "title": header.get("title") or f"{topic} Quiz",
+        "description": header.get("description") or f"A {difficulty.lower()} quiz on {topic}.",
+        "time_limit_minutes": time_limit,
+        "questions": [dict(question, id=i + 1) for i, question in enumerate(questions)],
+    }
+
+
+def parse_quiz_response(response_text, topic=None, difficulty="", time_limit=None):
+    """Build a quiz from a complete LLM response, keeping every valid question
+
+    Raises QuizValidationError if no question survives validation.
+    """
+    parser = QuestionStreamParser()
+    questions = parser.feed(response_text)
+    if not questions:
+        raise QuizValidationError(f"No valid questions in response ({parser.invalid} rejected)")
+    header = parser.header()
+    if time_limit is None:
+        time_limit = header.get('time_limit_minutes')
+    return assemble_quiz(questions, topic or header.get('title', 'Quiz'), difficulty, time_limit, header)
+
+
+class QuestionStreamParser:
+    """Incrementally pulls complete question objects out of a streamed quiz response
+
+    ``feed`` takes the next chunk of text and returns the questions whose
+    closing brace arrived in it and that pass ``validate_question``; the
+    rest are counted in ``invalid``. Anything outside the ``"questions"``
+    array is skipped, except the header fields returned by ``header``.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._last_string = None
+        self._questions_depth = None
+        self._object_start = None
+        self.invalid = 0
+
+    def header(self):
+        """Title, description and time limit, if they have streamed in yet"""
+        header = {}
+        for name in ('title', 'description'):
+            match = re.search(r'"%s"\s*:\s*("(?:[^"\\]|\\.)*")' % name, self.buffer)
+            if match:
+                try:
+                    header[name] = json.loads(match.group(1))
+                except ValueError:
+                    pass
+        match = re.search(r'"time_limit_minutes"\s*:\s*(\d+)', self.buffer)
+        if match:
+            header['time_limit_minutes'] = int(match.group(1))
+        return header
+
+    def feed(self, chunk):
+        self.buffer += chunk
+        completed = []
+        buffer = self.buffer
+        for i in range(self._pos, len(buffer)):
+            char = buffer[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+                    self._last_string = buffer[self._string_start + 1:i]
+                continue
+            if char == '"':
+                self._in_string = True
+                self._string_start = i
+            elif char in '{[':
+                if char == '[' and self._questions_depth is None and self._last_string == 'questions':
+                    self._questions_depth = self._depth + 1
+                elif char == '{' and self._depth == self._questions_depth:
+                    self._object_start = i
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if char == ']' and self._questions_depth is not None and self._depth < self._questions_depth:
+                    self._questions_depth = None
+                    self._last_string = None
+                elif char == '}' and self._depth == self._questions_depth and self._object_start is not None:
+                    try:
+                        question = validate_question(json.loads(buffer[self._object_start:i + 1]))
+                    except ValueError:
+                        question = None
+                    if question is None:
+                        self.invalid += 1
+                    else:
+                        completed.append(question)
+                    self._object_start = None
+        self._pos = len(buffer)
+        return completed
+
+
+def request_quiz(client, model, topic, difficulty, num_questions, time_limit):
+    """Call the chat completion API and return the raw response text"""
+    chat_completion = client.chat.completions.create(
+        model=model,
+        messages=[
+            {"role": "system", "content": QUIZ_SYSTEM_PROMPT},
+            {"role": "user", "content": build_prompt(topic, difficulty, num_questions, time_limit)}
+        ],
+        max_tokens=QUIZ_MAX_TOKENS,
+        temperature=QUIZ_TEMPERATURE
+    )
+    return chat_completion.choices[0].message.content
+
+
+def generate_quiz_data(client, model, topic, difficulty, num_questions, time_limit):
+    """Generate and parse a quiz; raises on API errors or if no question is valid"""
+    response_text = request_quiz(client, model, topic, difficulty, num_questions, time_limit)
+    return parse_quiz_response(response_text, topic, difficulty, time_limit)
+
+
+def _normalize_topic(topic):
+    return ' '.join(topic.split()).casefold()
+
+
+def cache_key(model, topic, difficulty, num_questions, time_limit):
+    """Content address for a quiz request"""
+    payload = json.dumps({
+        'model': model,
+        'topic': _normalize_topic(topic),
+        'difficulty': difficulty.casefold(),
+        'num_questions': int(num_questions),
+        'time_limit': int(time_limit),
+        'temperature': QUIZ_TEMPERATURE,
+        'max_tokens': QUIZ_MAX_TOKENS,
+        'prompt_version': PROMPT_VERSION,
+    }, sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def _atomic_write_json(path, data):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+
+class QuizCache:
+    """LRU + TTL cache of generated quizzes, persisted to ``cache_dir`` if given"""
+
+    def __init__(self, cache_dir=None, max_entries=CACHE_MAX_ENTRIES, ttl=CACHE_TTL):
+        self.cache_dir = os.path.join(cache_dir, 'quizzes') if cache_dir else None
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _expired(self, created):
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                created, quiz = entry
+                if not self._expired(created):
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return quiz
+                del self._entries[key]
+        entry = self._load(key)
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._put_memory(key, *entry)
+            return entry[1]
+
+    def put(self, key, quiz):
+        created = time.time()
+        with self._lock:
+            self._put_memory(key, created, quiz)
+        if self.cache_dir:
+            _atomic_write_json(self._path(key), {'created': created, 'quiz': quiz})
+
+    def _put_memory(self, key, created, quiz):
+        self._entries[key] = (created, quiz)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def _load(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._path(key)) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if self._expired(data.get('created', 0)):
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            return None
+        return data['created'], data['quiz']
+
+
+def question_fingerprint(question):
+    return hashlib.sha256(' '.join(question['question'].split()).casefold().encode('utf-8')).hexdigest()
+
+
+class QuestionBank:
+    """Deduplicated questions per (topic, difficulty), persisted to ``cache_dir`` if given"""
+
+    def __init__(self, cache_dir=None):
+        self.bank_dir = os.path.join(cache_dir, 'bank') if cache_dir else None
+        self._banks = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _bank_key(topic, difficulty):
+        return _normalize_topic(topic), difficulty.casefold()
+
+    def _path(self, bank_key):
+        digest = hashlib.sha256(json.dumps(bank_key).encode('utf-8')).hexdigest()
+        return os.path.join(self.bank_dir, f"{digest}.json")
+
+    def _bank(self, bank_key):
+        """Questions dict for a bank, loading it from disk on first use (lock held)"""
+        bank = self._banks.get(bank_key)
+        if bank is None:
+            bank = {}
+            if self.bank_dir:
+                try:
+                    with open(self._path(bank_key)) as f:
+                        bank = {question_fingerprint(q): q for q in json.load(f)['questions']}
+                except (OSError, ValueError, KeyError):
+                    bank = {}
+            self._banks[bank_key] = bank
+        return bank
+
+    def size(self, topic, difficulty):
+        with self._lock:
+            return len(self._bank(self._bank_key(topic, difficulty)))
+
+    def add(self, topic, difficulty, questions):
+        """Add questions, skipping duplicates; returns how many were new"""
+        bank_key = self._bank_key(topic, difficulty)
+        with self._lock:
+            bank = self._bank(bank_key)
+            added = 0
+            for question in questions:
+                fingerprint = question_fingerprint(question)
+                if fingerprint not in bank:
+                    bank[fingerprint] = {k: v for k, v in question.items() if k != 'id'}
+                    added += 1
+            snapshot = list(bank.values()) if added and self.bank_dir else None
+        if snapshot is not None:
+            _atomic_write_json(self._path(bank_key), {
+                'topic': bank_key[0], 'difficulty': bank_key[1], 'questions': snapshot
+            })
+        return added
+
+    def sample(self, topic, difficulty, num_questions, rng=None):
+        """Random questions from the bank, or None if it holds too few"""
+        with self._lock:
+            questions = list(self._bank(self._bank_key(topic, difficulty)).values())
+        if len(questions) < num_questions:
+            return None
+        chosen = (rng or random).sample(questions, num_questions)
+        return [dict(question, id=i + 1) for i, question in enumerate(chosen)]
+
+
+class BankFiller:
+    """Background thread that tops up question banks to ``target_size``
+
+    ``generate`` is called as ``generate(topic, difficulty, num_questions)``
+    and must return a quiz dict; its questions are added to the bank.
+    """
+
+    def __init__(self, bank, generate, target_size=BANK_TARGET_SIZE, batch_size=BANK_BATCH_SIZE,
+                 max_attempts=5):
+        self.bank = bank
+        self.generate = generate
+        self.target_size = target_size
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.errors = 0
+        self._queue = queue.Queue()
+        self._queued = set()
+        self._lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name='quiz-bank-filler', daemon=True)
+        self._thread.start()
+
+    def request(self, topic, difficulty):
+        """Schedule filling a bank; duplicate requests are coalesced"""
+        bank_key = QuestionBank._bank_key(topic, difficulty)
+        with self._lock:
+            if bank_key in self._queued:
+                return
+            self._queued.add(bank_key)
+        self._queue.put((topic, difficulty))
+
+    def _run(self):
+        while True:
+            topic, difficulty = self._queue.get()
+            attempts = 0
+            try:
+                while self.bank.size(topic, difficulty) < self.target_size and attempts < self.max_attempts:
+                    attempts += 1
+                    try:
+                        quiz = self.generate(topic, difficulty, self.batch_size)
+                        if not self.bank.add(topic, difficulty, quiz.get('questions', [])):
+                            # The model keeps repeating itself; stop rather than loop
+                            break
+                    except Exception:
+                        self.errors += 1
+            finally:
+                with self._lock:
+                    self._queued.discard(QuestionBank._bank_key(topic, difficulty))
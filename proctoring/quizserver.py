@@ -0,0 +1,388 @@
+"""Lightweight quiz serving and tab events outside the Streamlit script
+
+Taking a quiz through Streamlit widgets re-runs the whole app script on
+every click. Instead the app registers the quiz here and embeds a small
+static page that navigates between questions in the browser and posts each
+answer to a local HTTP API. Answers land in a thread-safe ``QuizStore``
+the app reads from on its next rerun; no proctoring or setup code runs per
+question. The page counts down to the session's deadline itself, submits
+when it passes, and on submission messages the exam page, where the
+component from ``submit_watch_js`` hands the app exactly one rerun.
+
+Endpoints, all under a per-session secret token:
+
+    GET  /quiz/<token>                  the quiz page
+    GET  /api/<token>/quiz              questions (without answers) and saved answers
+    POST /api/<token>/answers           {"answers": [{"id": 1, "answer": "..."}]}
+    POST /api/<token>/submit
+    POST /api/<token>/tabs              {"events": [[seq, code, t_ms], ...], "now": t_ms} from the tab listener
+
+The exam page itself (a different origin) posts tab events, so every
+response, errors included, allows cross-origin reads; the listener sends
+them as plain text, which needs no preflight. Event times come from the candidate's
+clock; each post carries that clock's current time, and the events are
+shifted onto the server clock that frame times use before they are queued.
+"""
+import json
+import secrets
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .tabs import TabInbox, clock_offset, parse_events
+
+MAX_BODY = 64 * 1024
+# Inboxes whose listener has been silent this long (seconds) belong to closed pages
+INBOX_MAX_IDLE = 3600.0
+
+
+class QuizSession:
+    """Quiz, answers and submission state for one candidate"""
+
+    def __init__(self, quiz_data, on_answer=None, on_submit=None, deadline=None):
+        self.quiz_data = quiz_data
+        # Epoch seconds on the server clock, or None for no time limit
+        self.deadline = deadline
+        self.options = {question['id']: question['options'] for question in quiz_data['questions']}
+        self.answers = {}
+        self.submitted = False
+        self.on_answer = on_answer
+        self.on_submit = on_submit
+        self._lock = threading.Lock()
+
+    def public_quiz(self):
+        """The quiz as sent to the browser: no correct answers"""
+        with self._lock:
+            deadline = self.deadline
+            return {
+                'title': self.quiz_data.get('title', ''),
+                'description': self.quiz_data.get('description', ''),
+                'time_limit_minutes': self.quiz_data.get('time_limit_minutes'),
+                'questions': [
+                    {'id': q['id'], 'question': q['question'], 'options': q['options']}
+                    for q in self.quiz_data['questions']
+                ],
+                'answers': [{'id': qid, 'answer': answer} for qid, answer in self.answers.items()],
+                'submitted': self.submitted,
+                # Relative, so the page's countdown does not depend on the candidate's clock
+                'remaining_seconds': None if deadline is None else max(0.0, deadline - time.time()),
+            }
+
+    def record(self, answers, timestamp=None):
+        """Store valid answers; returns how many were accepted"""
+        timestamp = time.time() if timestamp is None else timestamp
+        accepted = []
+        with self._lock:
+            if self.submitted:
+                return 0
+            for item in answers:
+                qid, answer = item.get('id'), item.get('answer')
+                if answer in self.options.get(qid, ()) and self.answers.get(qid) != answer:
+                    self.answers[qid] = answer
+                    accepted.append((qid, answer))
+        if self.on_answer:
+            for qid, answer in accepted:
+                self.on_answer(timestamp, qid, answer)
+        return len(accepted)
+
+    def submit(self, timestamp=None):
+        with self._lock:
+            if self.submitted:
+                return False
+            self.submitted = True
+        if self.on_submit:
+            self.on_submit(time.time() if timestamp is None else timestamp)
+        return True
+
+
+class QuizStore:
+    """Quiz sessions and tab-event inboxes by secret token"""
+
+    def __init__(self, inbox_max_idle=INBOX_MAX_IDLE):
+        self.inbox_max_idle = inbox_max_idle
+        self._sessions = {}
+        self._inboxes = {}
+        self._lock = threading.Lock()
+
+    def register(self, quiz_data, on_answer=None, on_submit=None, answers=None, deadline=None):
+        """Serve a quiz; returns ``(token, session)``"""
+        session = QuizSession(quiz_data, on_answer, on_submit, deadline)
+        if answers:
+            session.answers.update(answers)
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._sessions[token] = session
+        return token, session
+
+    def get(self, token):
+        with self._lock:
+            return self._sessions.get(token)
+
+    def open_inbox(self):
+        """Accept tab events for one page; returns ``(token, inbox)``
+
+        Inboxes of pages that went away without closing theirs are dropped
+        here once they have been silent for ``inbox_max_idle`` seconds.
+        """
+        inbox = TabInbox()
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            idle = [key for key, old in self._inboxes.items() if old.silent_for(inbox.opened) > self.inbox_max_idle]
+            for key in idle:
+                del self._inboxes[key]
+            self._inboxes[token] = inbox
+        return token, inbox
+
+    def inbox(self, token):
+        with self._lock:
+            return self._inboxes.get(token)
+
+    def close_inbox(self, token):
+        with self._lock:
+            self._inboxes.pop(token, None)
+
+    def remove(self, token):
+        with self._lock:
+            self._sessions.pop(token, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+QUIZ_PAGE = """<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>Quiz</title>
+<style>
+body { font-family: sans-serif; margin: 1.5em; color: #2C3E50; }
+label { display: block; margin: .4em 0; }
+button { background: #4CAF50; color: white; border: 0; padding: .5em 1.2em; margin-right: .5em; border-radius: 4px; }
+button[disabled] { background: #aaa; }
+</style></head>
+<body><p id="clock"></p><div id="quiz">Loading...</div><p id="progress"></p>
+<script>
+var token = "%(token)s", api = "/api/" + token;
+var quiz, current = 0, answers = {}, pending = [], timer = null, deadline = null, submitting = null;
+function flush() {
+    timer = null;
+    if (!pending.length) return Promise.resolve();
+    var batch = pending; pending = [];
+    return fetch(api + "/answers", {method: "POST", body: JSON.stringify({answers: batch})});
+}
+function answer(id, value) {
+    answers[id] = value;
+    setText("progress", Object.keys(answers).length + " of " + quiz.questions.length + " questions answered");
+    pending.push({id: id, answer: value});
+    if (!timer) timer = setTimeout(flush, 300);
+}
+function setText(id, text) {
+    var element = document.getElementById(id);
+    if (element.textContent !== text) { element.textContent = text; }
+}
+function submit() {
+    if (!submitting) {
+        submitting = flush().then(function() { return fetch(api + "/submit", {method: "POST"}); })
+            .then(function() {
+                quiz.submitted = true;
+                render();
+                // The exam page reruns the app once it hears this
+                window.top.postMessage({proctoringQuiz: token, submitted: true}, "*");
+            });
+    }
+    return submitting;
+}
+function tick() {
+    if (deadline === null || quiz.submitted) { return; }
+    var left = Math.max(0, Math.ceil((deadline - Date.now()) / 1000));
+    var seconds = left %% 60, minutes = (left - seconds) / 60;
+    setText("clock", "Time Remaining: " + (minutes < 10 ? "0" : "") + minutes + ":" + (seconds < 10 ? "0" : "") + seconds);
+    if (!left) { submit(); }
+}
+function render() {
+    var root = document.getElementById("quiz");
+    if (quiz.submitted) {
+        root.innerHTML = "<h3>Quiz submitted.</h3>";
+        setText("clock", "");
+        setText("progress", "");
+        return;
+    }
+    var q = quiz.questions[current];
+    root.innerHTML = "";
+    var title = document.createElement("p");
+    title.innerHTML = "<b></b>";
+    title.firstChild.textContent = "Question " + (current + 1) + " of " + quiz.questions.length + ": " + q.question;
+    root.appendChild(title);
+    q.options.forEach(function(option) {
+        var label = document.createElement("label");
+        var input = document.createElement("input");
+        input.type = "radio"; input.name = "q" + q.id; input.checked = answers[q.id] === option;
+        input.onchange = function() { answer(q.id, option); };
+        label.appendChild(input);
+        label.appendChild(document.createTextNode(" " + option));
+        root.appendChild(label);
+    });
+    var nav = document.createElement("p");
+    function button(text, enabled, onclick) {
+        var b = document.createElement("button");
+        b.textContent = text; b.disabled = !enabled; b.onclick = onclick;
+        nav.appendChild(b);
+    }
+    button("Previous", current > 0, function() { current -= 1; render(); });
+    if (current < quiz.questions.length - 1) {
+        button("Next", true, function() { current += 1; render(); });
+    } else {
+        button("Submit Quiz", true, submit);
+    }
+    root.appendChild(nav);
+    setText("progress", Object.keys(answers).length + " of " + quiz.questions.length + " questions answered");
+}
+fetch(api + "/quiz").then(function(r) { return r.json(); }).then(function(data) {
+    quiz = data;
+    data.answers.forEach(function(a) { answers[a.id] = a.answer; });
+    if (data.remaining_seconds !== null) {
+        deadline = Date.now() + data.remaining_seconds * 1000;
+        tick();
+        setInterval(tick, 250);
+    }
+    render();
+});
+window.addEventListener("pagehide", flush);
+</script></body></html>
+"""
+
+
+# Embeds the quiz page; without a configured URL the server is taken to be on
+# the host the candidate reached the app on
+QUIZ_FRAME_HTML = """<iframe id="quiz" title="Quiz" style="width: 100%%; height: %(height)dpx; border: 0"></iframe>
+<script>
+var root = window.parent || window;
+var base = %(base_url)s || (root.location.protocol + "//" + root.location.hostname + ":" + %(port)d);
+document.getElementById("quiz").src = base + %(path)s;
+</script>
+"""
+
+
+def quiz_frame_html(token, base_url=None, port=8502, height=450):
+    """HTML embedding the quiz page for ``token`` as the candidate's browser reaches the server"""
+    return QUIZ_FRAME_HTML % {'height': height, 'base_url': json.dumps(base_url or ''), 'port': port,
+                              'path': json.dumps(f"/quiz/{token}")}
+
+
+# Runs in a streamlit_javascript component; it resolves, and so reruns the
+# app, once the quiz page for the token reports its submission
+SUBMIT_WATCH_JS = """
+new Promise(function(resolve) {
+    (window.parent || window).addEventListener("message", function(event) {
+        var data = event.data;
+        if (data && data.proctoringQuiz === %(token)s && data.submitted) { resolve("submitted"); }
+    });
+})
+"""
+
+
+def submit_watch_js(token):
+    """JS resolving to ``"submitted"`` when the quiz page for ``token`` has been submitted"""
+    return SUBMIT_WATCH_JS % {'token': json.dumps(token)}
+
+
+class _QuizHandler(BaseHTTPRequestHandler):
+    store = None
+
+    def _route(self):
+        parts = self.path.split('?', 1)[0].strip('/').split('/')
+        if len(parts) == 2 and parts[0] == 'quiz':
+            return parts[1], 'page'
+        if len(parts) == 3 and parts[0] == 'api':
+            return parts[1], parts[2]
+        return None, None
+
+    def _send(self, status, body, content_type='application/json'):
+        payload = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(payload)))
+        self.send_header('Cache-Control', 'no-store')
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def end_headers(self):
+        # Also on send_error replies, so the tab listener can read why a post failed
+        self.send_header('Access-Control-Allow-Origin', '*')
+        super().end_headers()
+
+    def do_GET(self):
+        token, action = self._route()
+        session = self.store.get(token) if token else None
+        if session is None:
+            self.send_error(404)
+        elif action == 'page':
+            self._send(200, QUIZ_PAGE % {'token': token}, 'text/html; charset=utf-8')
+        elif action == 'quiz':
+            self._send(200, json.dumps(session.public_quiz()))
+        else:
+            self.send_error(404)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY:
+            self.send_error(413)
+            return None
+        return self.rfile.read(length) if length else b''
+
+    def _post_tabs(self, token):
+        inbox = self.store.inbox(token)
+        if inbox is None:
+            self.send_error(404)
+            return
+        received = time.time()
+        body = self._read_body()
+        if body is None:
+            return
+        try:
+            posted = json.loads(body)
+            events = parse_events(posted['events'], clock_offset(posted.get('now'), posted['events'], received))
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self.send_error(400)
+            return
+        self._send(200, json.dumps({'ack': inbox.post(events)}))
+
+    def do_POST(self):
+        token, action = self._route()
+        if token and action == 'tabs':
+            self._post_tabs(token)
+            return
+        session = self.store.get(token) if token else None
+        if session is None:
+            self.send_error(404)
+            return
+        body = self._read_body()
+        if body is None:
+            return
+        if action == 'answers':
+            try:
+                answers = json.loads(body)['answers']
+                accepted = session.record(answers)
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self.send_error(400)
+                return
+            self._send(200, json.dumps({'accepted': accepted}))
+        elif action == 'submit':
+            session.submit()
+            self._send(200, json.dumps({'submitted': True}))
+        else:
+            self.send_error(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start_quiz_server(port=8502, host='0.0.0.0', store=None):
+    """Serve quizzes and tab inboxes from ``store`` on a background thread; returns ``(server, store)``
+
+    Candidates' browsers post to it, so it listens on every interface by
+    default; every endpoint sits behind an unguessable per-session token.
+    """
+    store = store or QuizStore()
+    handler = type('QuizHandler', (_QuizHandler,), {'store': store})
+    server = ThreadingHTTPServer((host, port), handler)
+    thread = threading.Thread(target=server.serve_forever, name='proctoring-quiz', daemon=True)
+    thread.start()
+    return server, store
@@ -0,0 +1,114 @@
+"""Proctoring report and cheating risk scoring (no Streamlit)"""
+import numpy as np
+
+# Points per second with more than one face in view. The score used to add
+# 20 per multi-face frame when frames were analyzed at about 2 FPS; scoring
+# the time instead keeps that weight at any analysis rate.
+MULTI_FACE_POINTS_PER_SECOND = 40
+
+# Width of one report timeline bucket (seconds)
+TIMELINE_BUCKET = 60.0
+
+
+def calculate_cheating_risk(face_visibility, multiple_face_seconds, tab_switches, total_time):
+    """Calculate a simple cheating risk score"""
+    total_time_minutes = total_time / 60
+    risk_score = 0
+
+    if face_visibility < 90:
+        risk_score += (90 - face_visibility) * 0.5
+    risk_score += multiple_face_seconds * MULTI_FACE_POINTS_PER_SECOND
+    risk_score += tab_switches * 10
+    risk_score = risk_score / max(total_time_minutes, 1)
+    risk_score = min(risk_score, 100)
+
+    if risk_score < 20:
+        return "Low"
+    elif risk_score < 50:
+        return "Medium"
+    else:
+        return "High"
+
+
+def frame_timeline(store, bucket_seconds=TIMELINE_BUCKET):
+    """Per-bucket frame counts from a FrameStore, computed on its columns without copying them
+
+    Returns one dict per bucket since the first frame: its start (seconds
+    from the first frame), frames analyzed, frames without a face, frames
+    with several faces and blinks counted in it.
+    """
+    timestamps = store.timestamps
+    if not len(timestamps):
+        return []
+    buckets = np.maximum((timestamps - timestamps[0]) // bucket_seconds, 0).astype(np.int64)
+    size = int(buckets.max()) + 1
+    face_counts = store.face_counts
+    blink_counts = store.blink_counts
+    frames = np.bincount(buckets, minlength=size)
+    no_face = np.bincount(buckets, weights=face_counts == 0, minlength=size)
+    multi_face = np.bincount(buckets, weights=face_counts > 1, minlength=size)
+    # Blink counts are cumulative; a drop means a new analyzer started counting from its own offset
+    new_blinks = np.maximum(np.diff(blink_counts, prepend=blink_counts[:1]), 0)
+    blinks = np.bincount(buckets, weights=new_blinks, minlength=size)
+    return [
+        {
+            'start_seconds': i * bucket_seconds,
+            'frames': int(frames[i]),
+            'no_face_frames': int(no_face[i]),
+            'multi_face_frames': int(multi_face[i]),
+            'blinks': int(blinks[i]),
+        }
+        for i in range(size)
+    ]
+
+
+def build_report(stats, total_time, tab_switches, risk=None, tabs=None, timeline=None):
+    """Build the report dict from a SessionStats snapshot in constant time
+
+    ``risk`` is an optional RiskEngine snapshot whose live scores are added,
+    ``tabs`` an optional TabActivityTracker snapshot adding time spent away
+    and ``timeline`` an optional ``frame_timeline`` to include as is.
+    """
+    no_face_count = stats['no_face_frames']
+    multiple_face_instances = stats['multi_face_frames']
+    time_without_face = stats['no_face_time']
+
+    face_visibility_percentage = (1 - (time_without_face / total_time)) * 100 if total_time > 0 else 0
+    face_visibility_percentage = max(face_visibility_percentage, 0)
+
+    # Adjust blink rate to exclude no-face periods
+    valid_time = stats['single_face_time']
+    blink_rate = stats['blink_count'] / (valid_time / 60) if valid_time > 0 else 0
+
+    report = {
+        'total_exam_time_minutes': round(total_time / 60, 2),
+        'face_visibility_percentage': round(face_visibility_percentage, 2),
+        'no_face_detected_instances': no_face_count,
+        'no_face_duration_seconds': round(time_without_face, 2),
+        'multiple_faces_detected_instances': multiple_face_instances,
+        'multiple_faces_duration_seconds': round(stats['multi_face_time'], 2),
+        'total_blinks': stats['blink_count'],
+        'blink_rate_per_minute': round(blink_rate, 2),
+        'tab_switches': tab_switches,
+        'potential_cheating_risk': calculate_cheating_risk(
+            face_visibility_percentage,
+            stats['multi_face_time'],
+            tab_switches,
+            total_time
+        )
+    }
+
+    if risk is not None:
+        report['live_risk_score'] = risk['score']
+        report['peak_risk_score'] = risk['peak_score']
+        report['peak_risk_level'] = risk['peak_level']
+        report['risk_alerts'] = risk['alert_count']
+
+    if tabs is not None:
+        report['tab_away_seconds'] = round(tabs['away_seconds'], 2)
+        report['longest_tab_away_seconds'] = round(tabs['longest_away_seconds'], 2)
+
+    if timeline is not None:
+        report['timeline'] = timeline
+
+    return report
@@ -0,0 +1,275 @@
+"""Streaming, windowed cheating risk scoring
+
+Frames and browser events are turned into timestamped events (no face,
+multiple faces, tab switch, blink) and accumulated in fixed-size bucketed
+sliding windows, so every update is O(1) and memory does not grow with the
+length of the exam. A pluggable list of rules turns the windowed totals into
+scores, the overall score is sampled into a bounded time series, and an
+alert is raised whenever a rule crosses its threshold.
+"""
+import collections
+import math
+import threading
+
+import numpy as np
+
+RISK_LEVELS = ((20, "Low"), (50, "Medium"), (math.inf, "High"))
+
+
+def risk_level(score):
+    """Bucket a 0-100 score into Low/Medium/High like calculate_cheating_risk"""
+    for limit, level in RISK_LEVELS:
+        if score < limit:
+            return level
+    return RISK_LEVELS[-1][1]
+
+
+class SlidingWindowCounter:
+    """Sum of event values over the last ``window`` seconds in fixed buckets"""
+
+    def __init__(self, window, resolution=1.0):
+        self.window = window
+        self.resolution = resolution
+        self._buckets = np.zeros(max(1, int(math.ceil(window / resolution))), dtype=np.float64)
+        self._head = None
+        self.total = 0.0
+
+    def _advance(self, timestamp):
+        bucket = int(timestamp // self.resolution)
+        if self._head is None:
+            self._head = bucket
+        elif bucket > self._head:
+            size = len(self._buckets)
+            if bucket - self._head >= size:
+                self._buckets[:] = 0
+                self.total = 0.0
+            else:
+                for b in range(self._head + 1, bucket + 1):
+                    index = b % size
+                    self.total -= self._buckets[index]
+                    self._buckets[index] = 0
+            self._head = bucket
+        return bucket
+
+    def add(self, timestamp, value=1.0):
+        bucket = self._advance(timestamp)
+        if bucket <= self._head - len(self._buckets):
+            return  # too old for the window
+        self._buckets[bucket % len(self._buckets)] += value
+        self.total += value
+
+    def value(self, timestamp):
+        self._advance(timestamp)
+        return max(float(self.total), 0.0)
+
+
+class RiskRule:
+    """Maps windowed event totals to a 0-100 score
+
+    ``events`` lists the event kinds the rule reads; ``score`` receives their
+    totals over the last ``window`` seconds and may return None when there is
+    not enough evidence yet. An alert fires when the score reaches
+    ``threshold`` and re-arms once it drops below ``rearm_ratio`` of it.
+    """
+
+    events = ()
+
+    def __init__(self, name, window=60.0, weight=1.0, threshold=None, rearm_ratio=0.8):
+        self.name = name
+        self.window = window
+        self.weight = weight
+        self.threshold = threshold
+        self.rearm_ratio = rearm_ratio
+
+    def score(self, totals):
+        raise NotImplementedError
+
+
+class DurationRule(RiskRule):
+    """Score grows with the fraction of the window spent in a state"""
+
+    def __init__(self, name, event, **kwargs):
+        super().__init__(name, **kwargs)
+        self.events = (event,)
+
+    def score(self, totals):
+        return min(100.0, self.weight * 100.0 * totals[self.events[0]] / self.window)
+
+
+class CountRule(RiskRule):
+    """Score grows by ``weight`` per event in the window"""
+
+    def __init__(self, name, event, **kwargs):
+        super().__init__(name, **kwargs)
+        self.events = (event,)
+
+    def score(self, totals):
+        return min(100.0, self.weight * totals[self.events[0]])
+
+
+class BlinkRateRule(RiskRule):
+    """Scores blink rates outside a normal range, measured over face-visible time"""
+
+    events = ('blink', 'face_visible')
+
+    def __init__(self, name, low=5.0, high=40.0, min_visible=20.0, **kwargs):
+        super().__init__(name, **kwargs)
+        self.low = low
+        self.high = high
+        self.min_visible = min_visible
+
+    def score(self, totals):
+        visible = totals['face_visible']
+        if visible < self.min_visible:
+            return None
+        rate = totals['blink'] * 60.0 / visible
+        if rate < self.low:
+            deviation = (self.low - rate) / self.low
+        elif rate > self.high:
+            deviation = (rate - self.high) / self.high
+        else:
+            return 0.0
+        return min(100.0, self.weight * 100.0 * deviation)
+
+
+def default_rules():
+    return [
+        DurationRule('no_face', 'no_face', window=60.0, weight=1.0, threshold=50.0),
+        DurationRule('multiple_faces', 'multiple_faces', window=60.0, weight=2.0, threshold=30.0),
+        CountRule('tab_switches', 'tab_switch', window=300.0, weight=20.0, threshold=40.0),
+        BlinkRateRule('abnormal_blink_rate', window=120.0, weight=0.5, threshold=40.0),
+    ]
+
+
+class RiskEngine:
+    """Consumes per-frame observations and events, keeps live windowed risk scores"""
+
+    def __init__(self, rules=None, resolution=1.0, sample_interval=1.0, history_size=4 * 3600,
+                 max_alerts=256, max_frame_gap=2.0):
+        self.rules = list(rules) if rules is not None else default_rules()
+        self.resolution = resolution
+        self.sample_interval = sample_interval
+        self.max_frame_gap = max_frame_gap
+        self._counters = {}
+        for rule in self.rules:
+            for event in rule.events:
+                key = (event, rule.window)
+                if key not in self._counters:
+                    self._counters[key] = SlidingWindowCounter(rule.window, resolution)
+        self._armed = {rule.name: True for rule in self.rules}
+        self._rule_scores = {rule.name: 0.0 for rule in self.rules}
+        self.score = 0.0
+        self.peak_score = 0.0
+        self._history_t = np.zeros(history_size, dtype=np.float64)
+        self._history_score = np.zeros(history_size, dtype=np.float32)
+        self._history_len = 0
+        self._history_pos = 0
+        self._next_sample = None
+        self.alerts = collections.deque(maxlen=max_alerts)
+        self.alert_count = 0
+        self._subscribers = []
+        self._last_frame = None
+        self._last_blink_count = 0
+        self._lock = threading.Lock()
+
+    def subscribe(self, callback):
+        """Register a callable receiving alert dicts"""
+        self._subscribers.append(callback)
+        return callback
+
+    def observe_frame(self, timestamp, face_count, blink_count):
+        """Derive events from a frame result: face state durations and new blinks"""
+        alerts = []
+        with self._lock:
+            if self._last_frame is not None:
+                last_timestamp, last_face_count = self._last_frame
+                dt = timestamp - last_timestamp
+                if 0 < dt <= self.max_frame_gap:
+                    if last_face_count == 0:
+                        self._add('no_face', last_timestamp, dt)
+                    else:
+                        self._add('face_visible', last_timestamp, dt)
+                        if last_face_count > 1:
+                            self._add('multiple_faces', last_timestamp, dt)
+            new_blinks = blink_count - self._last_blink_count
+            if new_blinks > 0:
+                self._add('blink', timestamp, new_blinks)
+            self._last_blink_count = blink_count
+            self._last_frame = (timestamp, face_count)
+            alerts = self._evaluate(timestamp)
+        self._notify(alerts)
+
+    def record_event(self, kind, timestamp, value=1.0):
+        """Record a discrete event such as 'tab_switch'"""
+        with self._lock:
+            self._add(kind, timestamp, value)
+            alerts = self._evaluate(timestamp)
+        self._notify(alerts)
+
+    def _add(self, kind, timestamp, value):
+        for (event, _), counter in self._counters.items():
+            if event == kind:
+                counter.add(timestamp, value)
+
+    def _evaluate(self, timestamp):
+        alerts = []
+        total = 0.0
+        for rule in self.rules:
+            totals = {event: self._counters[(event, rule.window)].value(timestamp) for event in rule.events}
+            score = rule.score(totals)
+            if score is None:
+                self._rule_scores[rule.name] = 0.0
+                continue
+            self._rule_scores[rule.name] = score
+            total += score
+            if rule.threshold is None:
+                continue
+            if self._armed[rule.name] and score >= rule.threshold:
+                self._armed[rule.name] = False
+                alerts.append({'rule': rule.name, 'score': round(score, 2), 'timestamp': timestamp})
+            elif not self._armed[rule.name] and score < rule.threshold * rule.rearm_ratio:
+                self._armed[rule.name] = True
+        self.score = min(total, 100.0)
+        self.peak_score = max(self.peak_score, self.score)
+        if self._next_sample is None or timestamp >= self._next_sample:
+            self._history_t[self._history_pos] = timestamp
+            self._history_score[self._history_pos] = self.score
+            self._history_pos = (self._history_pos + 1) % len(self._history_t)
+            self._history_len = min(self._history_len + 1, len(self._history_t))
+            self._next_sample = timestamp + self.sample_interval
+        for alert in alerts:
+            self.alerts.append(alert)
+        self.alert_count += len(alerts)
+        return alerts
+
+    def _notify(self, alerts):
+        for alert in alerts:
+            for callback in list(self._subscribers):
+                callback(alert)
+
+    @property
+    def level(self):
+        return risk_level(self.score)
+
+    def rule_scores(self):
+        with self._lock:
+            return dict(self._rule_scores)
+
+    def history(self):
+        """Risk time series as (timestamps, scores) arrays in chronological order"""
+        with self._lock:
+            if self._history_len < len(self._history_t):
+                return self._history_t[:self._history_len].copy(), self._history_score[:self._history_len].copy()
+            order = np.roll(np.arange(len(self._history_t)), -self._history_pos)
+            return self._history_t[order], self._history_score[order]
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'score': round(self.score, 2),
+                'level': risk_level(self.score),
+                'peak_score': round(self.peak_score, 2),
+                'peak_level': risk_level(self.peak_score),
+                'alert_count': self.alert_count,
+                'rules': {name: round(score, 2) for name, score in self._rule_scores.items()},
+            }
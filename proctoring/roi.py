@@ -0,0 +1,99 @@
+"""Face box tracking for the adaptive (downscaled detection + ROI mesh) mode
+
+FaceDetection runs on a downscaled copy of the frame, but only every few
+frames, when tracking is lost or while several faces are in view. The face
+box it finds, refined each frame from the mesh landmarks, selects a crop of
+the full-resolution frame, and FaceMesh runs only on that crop. Blink EAR only needs the eye region, so
+the crop keeps full detail where it matters and skips everything else.
+"""
+import numpy as np
+
+try:
+    import cv2
+except ImportError:
+    cv2 = None
+
+DETECT_WIDTH = 320
+DETECT_INTERVAL = 5
+ROI_MARGIN = 0.25
+BOX_SMOOTHING = 0.5
+
+
+def downscale(frame, target_width=DETECT_WIDTH):
+    """Resize a frame to ``target_width`` keeping aspect ratio (never upscales)"""
+    height, width = frame.shape[:2]
+    if width <= target_width:
+        return frame
+    target_height = max(1, int(round(height * target_width / width)))
+    return cv2.resize(frame, (target_width, target_height), interpolation=cv2.INTER_AREA)
+
+
+def detection_box(detection):
+    """Relative (xmin, ymin, xmax, ymax) of a MediaPipe detection"""
+    box = detection.location_data.relative_bounding_box
+    return np.array([box.xmin, box.ymin, box.xmin + box.width, box.ymin + box.height], dtype=np.float32)
+
+
+class FaceTracker:
+    """Keeps the primary face box in relative coordinates between detections"""
+
+    def __init__(self, detect_interval=DETECT_INTERVAL, margin=ROI_MARGIN, smoothing=BOX_SMOOTHING):
+        self.detect_interval = detect_interval
+        self.margin = margin
+        self.smoothing = smoothing
+        self.box = None
+        self.face_count = 0
+        self.frames_since_detection = 0
+
+    @property
+    def tracking(self):
+        return self.box is not None
+
+    def needs_detection(self):
+        # While several faces are in view their count matters more than the saved detector passes
+        return self.box is None or self.face_count > 1 or self.frames_since_detection >= self.detect_interval
+
+    def update_from_detections(self, detections):
+        """Reset the tracked box from a full-frame detection pass"""
+        self.frames_since_detection = 0
+        self.face_count = len(detections)
+        if not detections:
+            self.box = None
+            return
+        boxes = np.stack([detection_box(d) for d in detections])
+        areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+        self.box = np.clip(boxes[int(np.argmax(areas))], 0.0, 1.0)
+
+    def update_from_landmarks(self, points, width, height):
+        """Follow the face using the bounding box of full-frame pixel landmarks"""
+        box = np.concatenate([points.min(axis=0), points.max(axis=0)]) / np.array(
+            [width, height, width, height], dtype=np.float32)
+        box = np.clip(box, 0.0, 1.0)
+        if self.box is None:
+            self.box = box
+        else:
+            self.box = self.smoothing * self.box + (1 - self.smoothing) * box
+
+    def saw_faces(self, count):
+        """FaceMesh found ``count`` faces in the crop; more than counted means someone joined"""
+        self.face_count = max(self.face_count, count)
+
+    def advance(self):
+        self.frames_since_detection += 1
+
+    def lose(self):
+        """The tracked face is gone; a count from an earlier detector pass no longer holds"""
+        self.box = None
+        if self.frames_since_detection:
+            self.face_count = 0
+
+    def crop_rect(self, width, height):
+        """Pixel (x0, y0, x1, y1) of the tracked box grown by ``margin`` on each side"""
+        x0, y0, x1, y1 = self.box
+        pad_x = (x1 - x0) * self.margin
+        pad_y = (y1 - y0) * self.margin
+        x0 = int(max(0.0, x0 - pad_x) * width)
+        y0 = int(max(0.0, y0 - pad_y) * height)
+        x1 = int(np.ceil(min(1.0, x1 + pad_x) * width))
+        y1 = int(np.ceil(min(1.0, y1 + pad_y) * height))
+        return x0, y0, x1, y1
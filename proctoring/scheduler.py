@@ -0,0 +1,93 @@
+"""Keyframe scheduling: skip heavy inference while the scene is static
+
+A cheap change detector compares a heavily downsampled grayscale copy of
+each frame with the last analyzed keyframe. While nothing changes, full
+inference runs only every ``static_interval`` seconds; motion above the
+threshold or a change in face count escalates to analyzing every frame
+until the scene has been quiet for ``hold`` seconds.
+"""
+import numpy as np
+
+MOTION_SIZE = 64
+MOTION_THRESHOLD = 0.02
+STATIC_INTERVAL = 1.0
+ESCALATION_HOLD = 3.0
+
+
+class MotionDetector:
+    """Mean absolute difference between downsampled grayscale frames, in [0, 1]"""
+
+    def __init__(self, size=MOTION_SIZE):
+        self.size = size
+        self.reference = None
+
+    def thumbnail(self, frame):
+        height, width = frame.shape[:2]
+        step = max(1, max(height, width) // self.size)
+        small = frame[::step, ::step]
+        if small.ndim == 3:
+            small = small.mean(axis=2, dtype=np.float32)
+        return small.astype(np.float32, copy=False)
+
+    def energy(self, frame):
+        """Change since the reference frame (None when there is no comparable reference)"""
+        thumbnail = self.thumbnail(frame)
+        if self.reference is None or self.reference.shape != thumbnail.shape:
+            return None, thumbnail
+        return float(np.abs(thumbnail - self.reference).mean()) / 255.0, thumbnail
+
+    def set_reference(self, thumbnail):
+        self.reference = thumbnail
+
+
+class InferenceScheduler:
+    """Decides per frame whether to run full inference or reuse the last result"""
+
+    def __init__(self, static_interval=STATIC_INTERVAL, motion_threshold=MOTION_THRESHOLD,
+                 hold=ESCALATION_HOLD, detector=None):
+        self.static_interval = static_interval
+        self.motion_threshold = motion_threshold
+        self.hold = hold
+        self.detector = detector or MotionDetector()
+        self.escalated_until = 0.0
+        self.last_analyzed = None
+        self.last_face_count = None
+        self.last_energy = 0.0
+        self.frames_seen = 0
+        self.frames_analyzed = 0
+        self._pending_thumbnail = None
+
+    @property
+    def escalated(self):
+        return self.last_analyzed is not None and self.last_analyzed < self.escalated_until
+
+    def should_analyze(self, frame, timestamp):
+        self.frames_seen += 1
+        energy, thumbnail = self.detector.energy(frame)
+        self.last_energy = energy
+        if energy is not None and energy >= self.motion_threshold:
+            self.escalated_until = timestamp + self.hold
+        analyze = (
+            energy is None
+            or self.last_analyzed is None
+            or timestamp < self.escalated_until
+            or timestamp - self.last_analyzed >= self.static_interval
+        )
+        if analyze:
+            self._pending_thumbnail = thumbnail
+        return analyze
+
+    def observe(self, result):
+        """Feed back an analyzed result; face count changes keep the rate escalated"""
+        self.frames_analyzed += 1
+        self.last_analyzed = result.timestamp
+        if self._pending_thumbnail is not None:
+            self.detector.set_reference(self._pending_thumbnail)
+            self._pending_thumbnail = None
+        if self.last_face_count is not None and result.face_count != self.last_face_count:
+            self.escalated_until = result.timestamp + self.hold
+        self.last_face_count = result.face_count
+
+    @property
+    def analyzed_ratio(self):
+        return self.frames_analyzed / self.frames_seen if self.frames_seen else 0.0
@@ -0,0 +1,480 @@
+"""Multi-session inference service backed by a pool of worker processes
+
+MediaPipe graphs are not safe to call from several threads, so every graph
+lives in exactly one worker process. Sessions are pinned to a worker when
+they are opened and each gets its own FrameAnalyzer there, which keeps
+FaceMesh tracking and blink state from bleeding between candidates. The
+parent process schedules frames round-robin across sessions so one busy
+candidate can't starve the others, and bounds the number of queued frames
+per session so callers see backpressure instead of unbounded latency.
+
+Frames normally travel through a per-session shared memory ``FrameRing``
+(see ``proctoring.shm``): the queue only carries a ``(slot, seq)``
+reference and the worker analyzes a view of the slot, so no frame is
+pickled.
+"""
+import collections
+import itertools
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+import numpy as np
+
+from proctoring.blinks import SeriesBlinkDetector
+from proctoring.engine import FrameAnalyzer
+from proctoring.shm import FrameRing
+
+
+class FrameDropped(Exception):
+    """Raised on a frame future when a newer frame replaced it in the queue"""
+
+
+class ServerOverloaded(Exception):
+    """Raised when a session is opened on a server that is already full"""
+
+
+def _default_analyzer_factory(mode):
+    return FrameAnalyzer(mode=mode)
+
+
+def series_analyzer_factory(mode):
+    """Analyzer factory that counts blinks over the smoothed EAR series"""
+    return FrameAnalyzer(mode=mode, blink_detector=SeriesBlinkDetector())
+
+
+def _worker_main(worker_id, mode, analyzer_factory, requests, results):
+    """Worker process loop: one FrameAnalyzer per session pinned to this worker"""
+    analyzers = {}
+    rings = {}
+    try:
+        while True:
+            message = requests.get()
+            if message is None:
+                break
+            kind, session_id = message[0], message[1]
+            if kind == 'open':
+                analyzers[session_id] = analyzer_factory(mode)
+            elif kind == 'ring':
+                # Attached on unpickling; replaces the session's previous ring
+                old = rings.pop(session_id, None)
+                if old is not None:
+                    old.close()
+                if session_id in analyzers:
+                    rings[session_id] = message[2]
+                else:
+                    message[2].close()
+            elif kind == 'flush':
+                analyzer = analyzers.get(session_id)
+                flush = getattr(analyzer, 'flush', None)
+                if flush is None:
+                    results.put((worker_id, session_id, message[2], None, FrameDropped("session closed")))
+                else:
+                    results.put((worker_id, session_id, message[2], flush(), None))
+            elif kind == 'close':
+                analyzer = analyzers.pop(session_id, None)
+                if analyzer is not None and hasattr(analyzer, 'close'):
+                    analyzer.close()
+                ring = rings.pop(session_id, None)
+                if ring is not None:
+                    ring.close()
+            elif kind == 'frame':
+                _, _, seq, timestamp, frame = message
+                try:
+                    analyzer = analyzers.get(session_id)
+                    if analyzer is None:
+                        # Queued before the session closed; a new analyzer would never be closed
+                        raise FrameDropped("session closed")
+                    if isinstance(frame, tuple):
+                        result = _process_slot(analyzer, rings.get(session_id), frame, timestamp)
+                    else:
+                        result = analyzer.process(frame, timestamp)
+                    # MediaPipe protobufs are only needed for drawing and are
+                    # expensive to pickle; the landmark arrays carry the data
+                    result.face_landmarks = []
+                    result.detections = []
+                    results.put((worker_id, session_id, seq, result, None))
+                except FrameDropped as e:
+                    results.put((worker_id, session_id, seq, None, e))
+                except Exception as e:
+                    results.put((worker_id, session_id, seq, None, str(e)))
+    finally:
+        for analyzer in analyzers.values():
+            if hasattr(analyzer, 'close'):
+                analyzer.close()
+        for ring in rings.values():
+            ring.close()
+
+
+def _process_slot(analyzer, ring, ref, timestamp):
+    """Analyze a frame in place in the session's ring; FrameDropped if it was overwritten"""
+    slot, slot_seq = ref
+    frame = ring.read(slot, slot_seq) if ring is not None else None
+    if frame is None:
+        raise FrameDropped("frame overwritten before analysis")
+    result = analyzer.process(frame[0], timestamp)
+    del frame
+    if not ring.valid(slot, slot_seq):
+        raise FrameDropped("frame overwritten during analysis")
+    return result
+
+
+class _Session:
+    def __init__(self, session_id, worker_id, max_pending):
+        self.session_id = session_id
+        self.worker_id = worker_id
+        self.pending = collections.deque()
+        self.max_pending = max_pending
+        self.inflight = {}
+        # Inflight seqs that are flush requests, answered with a blink count instead of a FrameResult
+        self.flushes = set()
+        self.callbacks = []
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+
+
+class InferenceServer:
+    """Spreads frames from many sessions across a pool of inference processes
+
+    ``submit`` returns a Future resolving to a FrameResult. Each session may
+    have at most ``max_pending`` frames waiting; submitting beyond that drops
+    the oldest waiting frame (its future fails with FrameDropped) and
+    ``submit`` reports the pressure through ``session_pressure``.
+
+    ``analyzer_factory`` is called with ``mode`` inside each worker to build a
+    session's analyzer; it must be picklable (a module-level function).
+
+    With ``shared_memory`` each session's client passes frames through a
+    ``FrameRing`` of ``ring_slots`` slots (by default enough for every
+    pending and in-flight frame plus the one being captured).
+    """
+
+    def __init__(self, num_workers=None, mode='mesh', max_pending=2, max_inflight_per_worker=2,
+                 max_sessions_per_worker=None, analyzer_factory=_default_analyzer_factory,
+                 shared_memory=True, ring_slots=None):
+        self.num_workers = num_workers or os.cpu_count() or 1
+        self.mode = mode
+        self.max_pending = max_pending
+        self.max_inflight_per_worker = max_inflight_per_worker
+        self.max_sessions_per_worker = max_sessions_per_worker
+        self.analyzer_factory = analyzer_factory
+        self.shared_memory = shared_memory
+        self.ring_slots = ring_slots or max_pending + max_inflight_per_worker + 2
+        self._ctx = multiprocessing.get_context('spawn')
+        self._requests = []
+        self._results = self._ctx.Queue()
+        self._processes = []
+        self._sessions = {}
+        self._worker_sessions = [[] for _ in range(self.num_workers)]
+        self._worker_inflight = [0] * self.num_workers
+        self._rr_cursor = [0] * self.num_workers
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._running = False
+        self._threads = []
+
+    def start(self):
+        for worker_id in range(self.num_workers):
+            requests = self._ctx.Queue()
+            process = self._ctx.Process(
+                target=_worker_main, args=(worker_id, self.mode, self.analyzer_factory, requests, self._results),
+                name=f"proctoring-inference-{worker_id}", daemon=True)
+            process.start()
+            self._requests.append(requests)
+            self._processes.append(process)
+        self._running = True
+        for name, target in (('dispatch', self._dispatch_loop), ('collect', self._collect_loop)):
+            thread = threading.Thread(target=target, name=f"proctoring-server-{name}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def stop(self, timeout=5.0):
+        with self._cond:
+            self._running = False
+            for session in self._sessions.values():
+                self._fail_pending(session, FrameDropped("server stopped"))
+            self._cond.notify_all()
+        for requests in self._requests:
+            requests.put(None)
+        for process in self._processes:
+            process.join(timeout)
+            if process.is_alive():
+                process.terminate()
+        self._results.put(None)
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    @property
+    def session_count(self):
+        return len(self._sessions)
+
+    def open_session(self, session_id, callback=None):
+        """Pin a session to the least loaded worker"""
+        with self._cond:
+            if session_id in self._sessions:
+                session = self._sessions[session_id]
+            else:
+                worker_id = min(range(self.num_workers), key=lambda w: len(self._worker_sessions[w]))
+                if (self.max_sessions_per_worker is not None
+                        and len(self._worker_sessions[worker_id]) >= self.max_sessions_per_worker):
+                    raise ServerOverloaded(f"All {self.num_workers} workers are at capacity")
+                session = _Session(session_id, worker_id, self.max_pending)
+                self._sessions[session_id] = session
+                self._worker_sessions[worker_id].append(session_id)
+                self._requests[worker_id].put(('open', session_id))
+            if callback is not None:
+                session.callbacks.append(callback)
+        return SessionClient(self, session_id, ring_slots=self.ring_slots if self.shared_memory else None)
+
+    def attach_ring(self, session_id, ring):
+        """Send a session's frame ring to its worker; frames may then be submitted as ``(slot, seq)``"""
+        with self._cond:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise KeyError(f"Unknown session {session_id!r}")
+            self._requests[session.worker_id].put(('ring', session_id, ring))
+
+    def close_session(self, session_id):
+        with self._cond:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return
+            self._worker_sessions[session.worker_id].remove(session_id)
+            self._fail_pending(session, FrameDropped("session closed"))
+            for future in session.inflight.values():
+                future.set_exception(FrameDropped("session closed"))
+            self._requests[session.worker_id].put(('close', session_id))
+
+    def flush_session(self, session_id):
+        """Finalize the blinks a session's analyzer still buffers; returns a Future for its blink count
+
+        Sent after the frames already dispatched, so it counts all of them.
+        """
+        future = Future()
+        with self._cond:
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise KeyError(f"Unknown session {session_id!r}")
+            seq = next(self._seq)
+            session.inflight[seq] = future
+            session.flushes.add(seq)
+            self._worker_inflight[session.worker_id] += 1
+            self._requests[session.worker_id].put(('flush', session_id, seq))
+        return future
+
+    def submit(self, session_id, frame, timestamp=None):
+        """Queue a frame (an array, or a ``(slot, seq)`` ring reference) and return a Future for its FrameResult"""
+        if timestamp is None:
+            timestamp = time.time()
+        future = Future()
+        with self._cond:
+            if not self._running:
+                raise RuntimeError("Inference server is not running")
+            session = self._sessions.get(session_id)
+            if session is None:
+                raise KeyError(f"Unknown session {session_id!r}")
+            if len(session.pending) >= session.max_pending:
+                _, _, _, dropped = session.pending.popleft()
+                session.dropped += 1
+                dropped.set_exception(FrameDropped(session_id))
+            session.pending.append((next(self._seq), timestamp, frame, future))
+            session.submitted += 1
+            self._cond.notify_all()
+        return future
+
+    def session_pressure(self, session_id):
+        """Fraction of the session's pending queue in use (1.0 means frames are being dropped)"""
+        with self._cond:
+            session = self._sessions[session_id]
+            return len(session.pending) / session.max_pending
+
+    def stats(self):
+        with self._cond:
+            return {
+                'workers': self.num_workers,
+                'sessions': len(self._sessions),
+                'inflight': list(self._worker_inflight),
+                'pending': sum(len(s.pending) for s in self._sessions.values()),
+                'dropped': sum(s.dropped for s in self._sessions.values()),
+                'completed': sum(s.completed for s in self._sessions.values()),
+            }
+
+    def _fail_pending(self, session, error):
+        while session.pending:
+            _, _, _, future = session.pending.popleft()
+            future.set_exception(error)
+
+    def _next_for_worker(self, worker_id):
+        """Round-robin over this worker's sessions, picking the next one with work"""
+        session_ids = self._worker_sessions[worker_id]
+        for offset in range(len(session_ids)):
+            index = (self._rr_cursor[worker_id] + offset) % len(session_ids)
+            session = self._sessions[session_ids[index]]
+            if session.pending:
+                self._rr_cursor[worker_id] = index + 1
+                return session
+        return None
+
+    def _dispatch_loop(self):
+        while True:
+            with self._cond:
+                sent = False
+                for worker_id in range(self.num_workers):
+                    if self._worker_inflight[worker_id] >= self.max_inflight_per_worker:
+                        continue
+                    session = self._next_for_worker(worker_id)
+                    if session is None:
+                        continue
+                    seq, timestamp, frame, future = session.pending.popleft()
+                    sent = True
+                    if not future.set_running_or_notify_cancel():
+                        continue
+                    session.inflight[seq] = future
+                    self._worker_inflight[worker_id] += 1
+                    self._requests[worker_id].put(('frame', session.session_id, seq, timestamp, frame))
+                if not sent:
+                    if not self._running:
+                        return
+                    self._cond.wait(0.5)
+
+    def _collect_loop(self):
+        while True:
+            message = self._results.get()
+            if message is None:
+                return
+            worker_id, session_id, seq, result, error = message
+            with self._cond:
+                self._worker_inflight[worker_id] -= 1
+                session = self._sessions.get(session_id)
+                future = session.inflight.pop(seq, None) if session else None
+                callbacks = list(session.callbacks) if session else []
+                if session is not None and seq in session.flushes:
+                    session.flushes.discard(seq)
+                    callbacks = []
+                elif session is not None:
+                    session.completed += 1
+                self._cond.notify_all()
+            if future is None:
+                continue
+            if error is not None:
+                future.set_exception(error if isinstance(error, Exception) else RuntimeError(error))
+                continue
+            future.set_result(result)
+            for callback in callbacks:
+                callback(result)
+
+
+class SessionClient:
+    """FrameAnalyzer-compatible handle for one session on an InferenceServer
+
+    ``process`` blocks until the worker returns the result, so it can be used
+    as the analyzer of a ProctoringPipeline. It returns None when the frame
+    was dropped under backpressure.
+
+    With ``ring_slots`` frames are copied into a shared memory ring instead
+    of being pickled, and ``read_frame`` lets the capture stage decode
+    straight into the next slot so the frame is never copied at all.
+    """
+
+    def __init__(self, server, session_id, timeout=5.0, ring_slots=None):
+        self.server = server
+        self.session_id = session_id
+        self.timeout = timeout
+        self.ring_slots = ring_slots
+        self.ring = None
+        self.blink_count = 0
+        self._frame_shape = None
+        # (slot, seq) of the frame process() last shared through the ring
+        self._last_ref = None
+        self._subscribers = []
+
+    def subscribe(self, callback):
+        self._subscribers.append(callback)
+        return callback
+
+    def unsubscribe(self, callback):
+        if callback in self._subscribers:
+            self._subscribers.remove(callback)
+
+    def read_frame(self, source):
+        """``source.read()``, into a reserved ring slot once the frame size is known"""
+        if self.ring is None:
+            return source.read()
+        view = self.ring.reserve(self._frame_shape)
+        try:
+            return source.read(view)
+        except TypeError:
+            # Sources that can't fill a given array
+            return source.read()
+
+    def _share(self, frame, timestamp):
+        """Put ``frame`` in the ring and return its ``(slot, seq)``
+
+        Returns the frame itself if it can't be shared, and None if it was
+        read into a slot that has since been reused.
+        """
+        ring = self.ring
+        if ring is not None and ring.owns(frame):
+            return ring.commit(frame, timestamp)
+        if not isinstance(frame, np.ndarray) or frame.dtype != np.uint8 or frame.ndim not in (2, 3):
+            return frame
+        if ring is None or not ring.fits(frame):
+            # First frame or a bigger resolution: size a new ring for it
+            self.ring = FrameRing(self.ring_slots, frame.nbytes, first_seq=ring.next_seq if ring else 1)
+            self.server.attach_ring(self.session_id, self.ring)
+            if ring is not None:
+                ring.close()
+            ring = self.ring
+        self._frame_shape = frame.shape
+        return ring.write(frame, timestamp)
+
+    def process(self, frame, timestamp=None):
+        if timestamp is None:
+            timestamp = time.time()
+        payload = self._share(frame, timestamp) if self.ring_slots else frame
+        self._last_ref = payload if isinstance(payload, tuple) else None
+        if payload is None:
+            return None
+        future = self.server.submit(self.session_id, payload, timestamp)
+        try:
+            result = future.result(self.timeout)
+        except (FrameDropped, FutureTimeoutError):
+            return None
+        self.blink_count = result.blink_count
+        for callback in list(self._subscribers):
+            callback(result)
+        return result
+
+    def flush(self):
+        """Count the blinks the worker's detector still buffers; returns the blink count"""
+        self.blink_count = self.server.flush_session(self.session_id).result(self.timeout)
+        return self.blink_count
+
+    def render_frame(self, frame):
+        """Frame just passed to ``process``, safe to keep for the preview
+
+        A frame read into a ring slot is copied, since capture reuses the
+        slot; None if it was overwritten before the copy finished.
+        """
+        ring, ref = self.ring, self._last_ref
+        if ring is None or ref is None or not ring.owns(frame):
+            return frame
+        copy = frame.copy()
+        return copy if ring.valid(*ref) else None
+
+    def close(self):
+        self.server.close_session(self.session_id)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
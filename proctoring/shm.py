@@ -0,0 +1,145 @@
+"""Shared-memory frame ring for handing frames to inference workers
+
+Sending a 720p BGR frame through a multiprocessing queue pickles it, pipes
+the bytes to the worker and unpickles them into a new array. A
+``FrameRing`` is one ``multiprocessing.shared_memory`` block split into
+fixed-size slots. The capture side writes each frame into the next slot
+(or has the camera decode straight into it) and only ``(slot, seq)`` goes
+through the queue; the worker runs the models on a numpy view of the slot.
+
+Every slot has a small header::
+
+    seq (uint64) | timestamp (float64) | height, width, channels (uint32)
+
+``seq`` is 0 while the slot is being written and a new, increasing number
+once it is committed. A reader checks it before and after using the view,
+so a frame overwritten while a worker still held it is detected and
+reported as dropped instead of being analyzed half-written.
+"""
+import struct
+import threading
+from multiprocessing import shared_memory
+
+import numpy as np
+
+SLOT_HEADER = struct.Struct("<QdIII")
+# Slot headers and data start on cache-line boundaries
+ALIGNMENT = 64
+HEADER_SIZE = -(-SLOT_HEADER.size // ALIGNMENT) * ALIGNMENT
+
+
+def _aligned(size):
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+class FrameRing:
+    """Fixed-size slots of uint8 frames in one shared memory block
+
+    Create it on the capture side with ``FrameRing(slots, slot_bytes)``
+    (``first_seq`` lets a replacement ring continue the old one's numbering);
+    pickling it (e.g. onto a worker's request queue) sends only its name and
+    layout, and unpickling attaches to the same block. Only the creating
+    process writes; its capture and inference threads may share the ring.
+    """
+
+    def __init__(self, slots, slot_bytes, name=None, first_seq=1):
+        self.slots = slots
+        self.slot_bytes = _aligned(slot_bytes)
+        self.stride = HEADER_SIZE + self.slot_bytes
+        self.owner = name is None
+        if self.owner:
+            # New blocks are zero-filled, so every slot starts out empty (seq 0)
+            self._shm = shared_memory.SharedMemory(create=True, size=slots * self.stride)
+        else:
+            self._shm = shared_memory.SharedMemory(name=name)
+        self.name = self._shm.name
+        self._address = np.frombuffer(self._shm.buf, dtype=np.uint8, count=1).ctypes.data
+        self._next_slot = 0
+        self.next_seq = first_seq
+        # Slot -> view handed out by reserve() and not committed yet
+        self._reserved = {}
+        self._lock = threading.Lock()
+
+    def fits(self, frame):
+        return frame.dtype == np.uint8 and frame.ndim in (2, 3) and frame.nbytes <= self.slot_bytes
+
+    def _header(self, slot):
+        return SLOT_HEADER.unpack_from(self._shm.buf, slot * self.stride)
+
+    def _view(self, slot, shape):
+        return np.ndarray(shape, dtype=np.uint8, buffer=self._shm.buf, offset=slot * self.stride + HEADER_SIZE)
+
+    def reserve(self, shape):
+        """Claim the next slot and return a writable view of ``shape`` for the frame"""
+        if int(np.prod(shape)) > self.slot_bytes:
+            raise ValueError(f"Frame of shape {shape} does not fit in {self.slot_bytes}-byte slots")
+        with self._lock:
+            slot = self._next_slot
+            self._next_slot = (slot + 1) % self.slots
+            # Invalidate whatever the slot held before its memory changes
+            SLOT_HEADER.pack_into(self._shm.buf, slot * self.stride, 0, 0.0, 0, 0, 0)
+            view = self._reserved[slot] = self._view(slot, shape)
+        return view
+
+    def commit(self, view, timestamp):
+        """Publish the frame written into ``view`` (from ``reserve``)
+
+        Returns ``(slot, seq)``, or None when the ring wrapped around and
+        reserved the slot again before this frame was committed.
+        """
+        with self._lock:
+            for slot, reserved in self._reserved.items():
+                if reserved is view:
+                    break
+            else:
+                return None
+            del self._reserved[slot]
+            seq = self.next_seq
+            self.next_seq += 1
+            height, width = view.shape[:2]
+            channels = view.shape[2] if view.ndim == 3 else 0
+            SLOT_HEADER.pack_into(self._shm.buf, slot * self.stride, seq, timestamp, height, width, channels)
+        return slot, seq
+
+    def owns(self, frame):
+        """True if ``frame`` is a view of one of this ring's slots"""
+        if not isinstance(frame, np.ndarray):
+            return False
+        return 0 <= frame.ctypes.data - self._address < self.slots * self.stride
+
+    def write(self, frame, timestamp):
+        """Copy ``frame`` into the next slot; returns ``(slot, seq)`` (None as for ``commit``)"""
+        view = self.reserve(frame.shape)
+        np.copyto(view, frame)
+        return self.commit(view, timestamp)
+
+    def read(self, slot, seq):
+        """View of a committed frame as ``(frame, timestamp)``, or None if the slot moved on"""
+        current, timestamp, height, width, channels = self._header(slot)
+        if current != seq:
+            return None
+        shape = (height, width, channels) if channels else (height, width)
+        return self._view(slot, shape), timestamp
+
+    def valid(self, slot, seq):
+        """True while the slot still holds frame ``seq``"""
+        return self._header(slot)[0] == seq
+
+    def close(self):
+        self._reserved = {}
+        try:
+            self._shm.close()
+        except BufferError:
+            # Frames handed out as views are still alive; the mapping goes with them
+            pass
+        if self.owner:
+            try:
+                self._shm.unlink()
+            except FileNotFoundError:
+                pass
+
+    def __getstate__(self):
+        return {'slots': self.slots, 'slot_bytes': self.slot_bytes, 'name': self.name}
+
+    def __setstate__(self, state):
+        self.__init__(state['slots'], state['slot_bytes'], state['name'])
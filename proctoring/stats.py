@@ -0,0 +1,119 @@
+"""Running aggregates over per-frame proctoring results"""
+import threading
+
+# Gaps longer than this (camera stall, paused monitoring) are not attributed to any face state
+MAX_FRAME_GAP = 2.0
+
+
+class SessionStats:
+    """Constant-time aggregates updated as frames are recorded
+
+    Each interval between two frames is credited to the face state of the
+    earlier frame, so durations follow the real frame timestamps rather than
+    assuming a fixed frame rate.
+    """
+
+    def __init__(self, max_frame_gap=MAX_FRAME_GAP):
+        self.max_frame_gap = max_frame_gap
+        self.frames = 0
+        self.no_face_frames = 0
+        self.single_face_frames = 0
+        self.multi_face_frames = 0
+        self.no_face_time = 0.0
+        self.single_face_time = 0.0
+        self.multi_face_time = 0.0
+        self.blink_count = 0
+        self.first_timestamp = None
+        self.last_timestamp = None
+        self.last_face_count = 0
+        self._lock = threading.Lock()
+
+    def update(self, timestamp, face_count, blink_count):
+        with self._lock:
+            if self.last_timestamp is not None:
+                dt = timestamp - self.last_timestamp
+                if 0 < dt <= self.max_frame_gap:
+                    if self.last_face_count == 0:
+                        self.no_face_time += dt
+                    elif self.last_face_count == 1:
+                        self.single_face_time += dt
+                    else:
+                        self.multi_face_time += dt
+            else:
+                self.first_timestamp = timestamp
+
+            self.frames += 1
+            if face_count == 0:
+                self.no_face_frames += 1
+            elif face_count == 1:
+                self.single_face_frames += 1
+            else:
+                self.multi_face_frames += 1
+            self.blink_count = blink_count
+            self.last_timestamp = timestamp
+            self.last_face_count = face_count
+
+    def set_blink_count(self, blink_count):
+        """Final blink count once the detector was flushed at the end of monitoring"""
+        with self._lock:
+            self.blink_count = blink_count
+
+    def merge(self, other):
+        """Fold in stats for frames that directly follow this one (e.g. the next video chunk)"""
+        if other.frames == 0:
+            return self
+        if self.frames == 0:
+            self.__setstate__(other.__getstate__())
+            return self
+        with self._lock:
+            # Credit the gap between the two chunks like any other frame interval
+            dt = other.first_timestamp - self.last_timestamp
+            if 0 < dt <= self.max_frame_gap:
+                if self.last_face_count == 0:
+                    self.no_face_time += dt
+                elif self.last_face_count == 1:
+                    self.single_face_time += dt
+                else:
+                    self.multi_face_time += dt
+            self.frames += other.frames
+            self.no_face_frames += other.no_face_frames
+            self.single_face_frames += other.single_face_frames
+            self.multi_face_frames += other.multi_face_frames
+            self.no_face_time += other.no_face_time
+            self.single_face_time += other.single_face_time
+            self.multi_face_time += other.multi_face_time
+            self.blink_count += other.blink_count
+            self.last_timestamp = other.last_timestamp
+            self.last_face_count = other.last_face_count
+        return self
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    @property
+    def tracked_time(self):
+        return self.no_face_time + self.single_face_time + self.multi_face_time
+
+    def snapshot(self):
+        """Consistent copy of the aggregates as a dict"""
+        with self._lock:
+            return {
+                'frames': self.frames,
+                'no_face_frames': self.no_face_frames,
+                'single_face_frames': self.single_face_frames,
+                'multi_face_frames': self.multi_face_frames,
+                'no_face_time': self.no_face_time,
+                'single_face_time': self.single_face_time,
+                'multi_face_time': self.multi_face_time,
+                'tracked_time': self.tracked_time,
+                'blink_count': self.blink_count,
+                'last_face_count': self.last_face_count,
+                'first_timestamp': self.first_timestamp,
+                'last_timestamp': self.last_timestamp,
+            }
@@ -0,0 +1,128 @@
+"""Columnar per-frame storage for proctoring data"""
+import os
+import tempfile
+import threading
+
+import numpy as np
+
+# Column name -> dtype; timestamps are epoch seconds
+FRAME_COLUMNS = {
+    'timestamps': np.float64,
+    'face_counts': np.int8,
+    'blink_counts': np.int32,
+}
+
+
+class FrameStore:
+    """Preallocated typed columns for per-frame proctoring values
+
+    Columns grow by doubling, so appends are amortized O(1) and readers get
+    zero-copy numpy views of the filled prefix. When ``spill_dir`` is set and
+    the store outgrows ``max_memory_frames`` the columns move to memory-mapped
+    files in that directory, leaving residency to the OS page cache.
+    """
+
+    def __init__(self, initial_capacity=4096, spill_dir=None, max_memory_frames=1 << 18,
+                 columns=FRAME_COLUMNS):
+        self.dtypes = dict(columns)
+        self.spill_dir = spill_dir
+        self.max_memory_frames = max_memory_frames
+        self._capacity = initial_capacity
+        self._size = 0
+        self._spill_files = {}
+        self._columns = {name: np.zeros(initial_capacity, dtype=dtype) for name, dtype in self.dtypes.items()}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return self._size
+
+    @property
+    def capacity(self):
+        return self._capacity
+
+    @property
+    def spilled(self):
+        return bool(self._spill_files)
+
+    @property
+    def nbytes(self):
+        """Bytes held in memory by the columns (zero once spilled to disk)"""
+        if self.spilled:
+            return 0
+        return sum(column.nbytes for column in self._columns.values())
+
+    def append(self, **values):
+        """Append one frame; every column must be given"""
+        with self._lock:
+            if self._size == self._capacity:
+                self._grow()
+            index = self._size
+            for name, column in self._columns.items():
+                column[index] = values[name]
+            self._size = index + 1
+
+    def column(self, name):
+        """Zero-copy view of the filled part of a column"""
+        return self._columns[name][:self._size]
+
+    def last(self, name, default=0):
+        size = self._size
+        return self._columns[name][size - 1].item() if size else default
+
+    @property
+    def timestamps(self):
+        return self.column('timestamps')
+
+    @property
+    def face_counts(self):
+        return self.column('face_counts')
+
+    @property
+    def blink_counts(self):
+        return self.column('blink_counts')
+
+    def _grow(self):
+        capacity = max(self._capacity * 2, 1)
+        if self.spill_dir is not None and (self.spilled or capacity > self.max_memory_frames):
+            self._grow_on_disk(capacity)
+        else:
+            for name, column in self._columns.items():
+                grown = np.zeros(capacity, dtype=column.dtype)
+                grown[:self._size] = column[:self._size]
+                self._columns[name] = grown
+        self._capacity = capacity
+
+    def _grow_on_disk(self, capacity):
+        if not self._spill_files:
+            os.makedirs(self.spill_dir, exist_ok=True)
+        for name, column in self._columns.items():
+            path = self._spill_files.get(name)
+            if path is None:
+                fd, path = tempfile.mkstemp(prefix=f"{name}-", suffix='.col', dir=self.spill_dir)
+                os.close(fd)
+                self._spill_files[name] = path
+            else:
+                column.flush()
+            with open(path, 'r+b') as f:
+                f.truncate(capacity * column.dtype.itemsize)
+            grown = np.memmap(path, dtype=column.dtype, mode='r+', shape=(capacity,))
+            if not isinstance(column, np.memmap):
+                grown[:self._size] = column[:self._size]
+            self._columns[name] = grown
+
+    def close(self):
+        """Release the columns and spill files, leaving the store empty
+
+        Frames appended afterwards (e.g. by a feed that has not stopped yet)
+        start new columns.
+        """
+        with self._lock:
+            self._columns = {name: np.zeros(0, dtype=dtype) for name, dtype in self.dtypes.items()}
+            self._capacity = 0
+            self._size = 0
+            for path in self._spill_files.values():
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            self._spill_files = {}
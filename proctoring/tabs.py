@@ -0,0 +1,292 @@
+"""Event-driven tab-switch tracking
+
+A listener installed once in the exam page records every
+``visibilitychange`` and every loss or return of focus (focus moving into
+an embedded frame such as the quiz does not count) with its timestamp and
+a sequence number, and posts them in compact batches
+(``[[seq, code, t_ms], ...]``) to the quiz server (see
+``proctoring.quizserver``). The reply acknowledges the last sequence
+received, so the page only resends what was lost.
+
+Posted events wait in a ``TabInbox`` until the app drains them on its next
+rerun. Switches between reruns are never missed, and no event is counted
+twice. The Streamlit component only installs the listener; its code and
+key stay the same across reruns, so it is never remounted.
+"""
+import json
+import math
+import threading
+import time
+
+# Event codes in a batch
+HIDDEN = 'h'
+VISIBLE = 'v'
+BLUR = 'b'
+FOCUS = 'f'
+
+MAX_BATCH = 256
+# Events kept by the page while the API cannot be reached, and by an inbox between drains
+MAX_BUFFER = 16 * MAX_BATCH
+RETRY_MS = 1000
+# The page posts at least this often, even with no events, so a silent listener can be noticed
+HEARTBEAT_MS = 10000
+
+# Runs in the exam page itself (not the component's frame), so the listener
+# outlives the component when the app switches pages
+LISTENER_SOURCE = """
+(function() {
+    var state = window.__proctoringTabs = {seq: 0, events: [], url: null, sending: false, focused: true,
+                                           lastSent: 0, error: null};
+    var fail = function(message) {
+        if (state.error !== message) { console.warn("Proctoring tab listener: " + message); }
+        state.error = message;
+    };
+    var send = function(force) {
+        if (state.sending || !state.url || (!state.events.length && !force)) { return; }
+        state.sending = true;
+        state.lastSent = Date.now();
+        var url = state.url;
+        var batch = state.events.slice(0, %(max_batch)d);
+        var body = JSON.stringify({events: batch, now: Date.now()});
+        fetch(url, {method: "POST", body: body, keepalive: true})
+            .then(function(response) {
+                if (response.ok) { return response.json(); }
+                if (response.status >= 400 && response.status < 500) {
+                    // Resending a rejected batch cannot succeed
+                    state.events = state.events.slice(batch.length);
+                }
+                if (response.status === 404 && state.url === url) {
+                    // The inbox was closed: stop posting until the app points the listener at a new one
+                    state.url = null;
+                }
+                throw new Error("HTTP " + response.status + " from " + url);
+            })
+            .then(function(reply) {
+                var ack = reply.ack || 0;
+                state.events = state.events.filter(function(e) { return e[0] > ack; });
+                state.error = null;
+            })
+            .catch(function(error) { fail(String(error)); })
+            .then(function() {
+                state.sending = false;
+                if (state.events.length) { setTimeout(send, %(retry_ms)d); }
+            });
+    };
+    var push = function(code) {
+        state.seq += 1;
+        state.events.push([state.seq, code, Date.now()]);
+        if (state.events.length > %(max_buffer)d) {
+            state.events.shift();
+        }
+        send();
+    };
+    state.send = send;
+    var hiddenKey = typeof document.hidden !== "undefined" ? "hidden"
+        : typeof document.msHidden !== "undefined" ? "msHidden" : "webkitHidden";
+    var changeEvent = hiddenKey === "hidden" ? "visibilitychange"
+        : hiddenKey === "msHidden" ? "msvisibilitychange" : "webkitvisibilitychange";
+    document.addEventListener(changeEvent, function() { push(document[hiddenKey] ? "h" : "v"); });
+    // hasFocus() stays true while focus is inside an embedded frame such as
+    // the quiz, so only leaving the page counts as a blur
+    var checkFocus = function() {
+        var focused = document.hasFocus();
+        if (focused !== state.focused) {
+            state.focused = focused;
+            push(focused ? "f" : "b");
+        }
+    };
+    window.addEventListener("blur", function() { setTimeout(checkFocus, 0); });
+    window.addEventListener("focus", checkFocus);
+    // Leaving the browser while focus is in a frame fires no blur on the page
+    setInterval(function() {
+        checkFocus();
+        if (Date.now() - state.lastSent >= %(heartbeat_ms)d) { send(true); }
+    }, %(retry_ms)d);
+    if (document[hiddenKey]) { push("h"); }
+    checkFocus();
+})();
+"""
+
+LISTENER_JS = """
+(function() {
+    var root = window.parent || window;
+    if (!root.__proctoringTabs) {
+        var script = root.document.createElement("script");
+        script.textContent = %(source)s;
+        root.document.head.appendChild(script);
+    }
+    var state = root.__proctoringTabs;
+    var base = %(base_url)s || (root.location.protocol + "//" + root.location.hostname + ":" + %(port)d);
+    var url = base + %(path)s;
+    if (state.url !== url) {
+        state.url = url;
+        state.send(true);
+    }
+    return true;
+})()
+"""
+
+
+def listener_js(path, base_url=None, port=8502, max_batch=MAX_BATCH):
+    """JS that installs the listener (once per page) and points it at ``path`` on the quiz server
+
+    ``base_url`` is the server's URL as the candidate's browser reaches it;
+    without one the server is taken to be on the exam page's host at ``port``.
+    """
+    source = LISTENER_SOURCE % {'max_batch': max_batch, 'max_buffer': MAX_BUFFER, 'retry_ms': RETRY_MS,
+                                'heartbeat_ms': HEARTBEAT_MS}
+    return LISTENER_JS % {'source': json.dumps(source), 'base_url': json.dumps(base_url or ''),
+                          'port': port, 'path': json.dumps(path)}
+
+
+def parse_events(events, offset=0.0):
+    """Decode posted ``[seq, code, t_ms]`` events into ``(seq, code, seconds)`` tuples
+
+    ``offset`` (seconds) is added to every time; malformed events are skipped.
+    """
+    if not isinstance(events, list):
+        return []
+    parsed = []
+    for event in events:
+        try:
+            seq, code, t_ms = event
+            parsed.append((int(seq), str(code), float(t_ms) / 1000.0 + offset))
+        except (TypeError, ValueError):
+            continue
+    return parsed
+
+
+def clock_offset(client_now_ms, events, received):
+    """Seconds to add to the page's ``Date.now()`` times to put them on the server clock
+
+    ``client_now_ms`` is the page's clock when it sent the post; without it
+    the newest event is taken as sent on receipt. Network delay makes the
+    corrected times at most that much early.
+    """
+    try:
+        sent = float(client_now_ms) / 1000.0
+    except (TypeError, ValueError):
+        times = [t_ms for _, _, t_ms in parse_events(events)]
+        if not times:
+            return 0.0
+        sent = max(times)
+    return received - sent if math.isfinite(sent) else 0.0
+
+
+class TabInbox:
+    """Events posted by one page's listener, waiting for the app to drain them"""
+
+    def __init__(self, max_events=MAX_BUFFER):
+        self.ack = 0
+        self.max_events = max_events
+        self.opened = time.time()
+        self.last_post = None
+        self._events = []
+        self._lock = threading.Lock()
+
+    def post(self, events):
+        """Queue events not seen before; returns the highest sequence number received"""
+        with self._lock:
+            self.last_post = time.time()
+            for event in events:
+                if event[0] > self.ack:
+                    self._events.append(event)
+                    self.ack = event[0]
+            del self._events[:-self.max_events]
+            return self.ack
+
+    def drain(self):
+        with self._lock:
+            events, self._events = self._events, []
+        return events
+
+    def silent_for(self, now=None):
+        """Seconds since the listener last posted (or since the inbox opened, if it never did)"""
+        now = time.time() if now is None else now
+        return now - (self.last_post if self.last_post is not None else self.opened)
+
+
+class TabActivityTracker:
+    """Counts switches away from the exam page and how long the candidate stayed away
+
+    The page counts as away while it is hidden or has lost focus; each
+    transition from present to away is one switch.
+    """
+
+    def __init__(self):
+        self.last_seq = 0
+        self.hidden = False
+        self.blurred = False
+        self.switches = 0
+        self.away_time = 0.0
+        self.longest_away = 0.0
+        self.away_since = None
+        self._lock = threading.Lock()
+
+    def reset_sequence(self):
+        """Accept sequence numbers from the start again (the page, and its listener, reloaded)"""
+        with self._lock:
+            self.last_seq = 0
+
+    @property
+    def away(self):
+        return self.hidden or self.blurred
+
+    def ingest(self, events):
+        """Apply new events in sequence order; returns the timestamps of new switches"""
+        switch_times = []
+        with self._lock:
+            for seq, code, timestamp in sorted(events):
+                if seq <= self.last_seq:
+                    continue
+                self.last_seq = seq
+                was_away = self.away
+                if code == HIDDEN:
+                    self.hidden = True
+                elif code == VISIBLE:
+                    self.hidden = False
+                elif code == BLUR:
+                    self.blurred = True
+                elif code == FOCUS:
+                    self.blurred = False
+                else:
+                    continue
+                if not was_away and self.away:
+                    self.switches += 1
+                    self.away_since = timestamp
+                    switch_times.append(timestamp)
+                elif was_away and not self.away:
+                    self._end_away(timestamp)
+        return switch_times
+
+    def _end_away(self, timestamp):
+        if self.away_since is not None:
+            duration = max(0.0, timestamp - self.away_since)
+            self.away_time += duration
+            self.longest_away = max(self.longest_away, duration)
+        self.away_since = None
+
+    def snapshot(self, now=None):
+        """Counts and durations, including a still-open away period up to ``now``"""
+        with self._lock:
+            away_time = self.away_time
+            longest_away = self.longest_away
+            if self.away_since is not None and now is not None:
+                current = max(0.0, now - self.away_since)
+                away_time += current
+                longest_away = max(longest_away, current)
+            return {
+                'switches': self.switches,
+                'away_seconds': away_time,
+                'longest_away_seconds': longest_away,
+                'away': self.away,
+            }
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -0,0 +1,102 @@
+import pytest
+
+from proctoring import batch
+from proctoring.batch import analyze_videos, find_videos, max_frame_gap, plan_chunks, report_from_stats, sample_step
+from proctoring.stats import SessionStats
+
+FPS = 10.0
+
+
+def face_count(index):
+    # Away from the camera for a few seconds every minute, someone else joins now and then
+    return 0 if index % 600 < 40 else 2 if index % 900 < 25 else 1
+
+
+def chunk_stats(start_frame, end_frame, fps=FPS, step=1):
+    """What analyze_chunk returns for a recording with face_count per frame and a blink every 4 s"""
+    stats = SessionStats(max_frame_gap(fps, step))
+    for index in range(start_frame, end_frame, step):
+        # Each chunk counts the blinks (at frames 40, 80, ...) from its own start
+        stats.update(index / fps, face_count(index), index // 40 - max(start_frame - 1, 0) // 40)
+    return stats
+
+
+@pytest.fixture
+def recordings(monkeypatch, tmp_path):
+    """Two fake recordings of 3000 and 450 frames; chunks are analyzed without a video decoder"""
+    lengths = {str(tmp_path / 'a.mp4'): 3000, str(tmp_path / 'b.webm'): 450}
+    for path in lengths:
+        open(path, 'w').close()
+    (tmp_path / 'notes.txt').write_text('')
+
+    def run_chunk(job, mode, sample_fps, blinks='threshold'):
+        path, chunk_index, start_frame, end_frame, fps = job
+        return path, chunk_index, chunk_stats(start_frame, end_frame, fps, sample_step(fps, sample_fps)), None
+
+    monkeypatch.setattr(batch, 'CV_AVAILABLE', True)
+    monkeypatch.setattr(batch, 'probe_video', lambda path: (FPS, lengths[path]))
+    monkeypatch.setattr(batch, '_run_chunk', run_chunk)
+    return tmp_path, lengths
+
+
+def test_find_videos_walks_directories(recordings):
+    directory, lengths = recordings
+    assert find_videos([str(directory)]) == sorted(lengths)
+
+
+def test_chunks_cover_the_video_without_overlap(recordings):
+    _, lengths = recordings
+    path = next(iter(lengths))
+    chunks = plan_chunks(path, chunk_seconds=70)
+    assert [(start, end) for _, _, start, end, _ in chunks] == [(0, 700), (700, 1400), (1400, 2100),
+                                                                (2100, 2800), (2800, 3000)]
+    assert [index for _, index, _, _, _ in chunks] == list(range(5))
+    assert plan_chunks(path, chunk_seconds=0) == [(path, 0, 0, 3000, FPS)]
+
+
+def test_unknown_length_is_one_chunk(monkeypatch):
+    monkeypatch.setattr(batch, 'probe_video', lambda path: (25.0, 0))
+    assert plan_chunks('stream.mkv') == [('stream.mkv', 0, 0, None, 25.0)]
+
+
+@pytest.mark.parametrize('chunk_seconds', [0, 30, 70, 299])
+def test_merged_chunks_match_one_pass(recordings, chunk_seconds):
+    directory, lengths = recordings
+    reports = analyze_videos([str(directory)], workers=1, chunk_seconds=chunk_seconds)
+    assert list(reports) == sorted(lengths)
+    for path, frames in lengths.items():
+        assert reports[path] == report_from_stats(chunk_stats(0, frames), frames / FPS)
+
+
+def test_slow_sampling_still_credits_face_time(recordings):
+    directory, lengths = recordings
+    # One frame every 4 s: longer than the live camera's gap limit
+    report = analyze_videos([str(directory)], workers=1, chunk_seconds=0, sample_fps=0.25)[
+        str(directory / 'a.mp4')]
+    # Frames 0, 600, ... 2400 have no face, each standing for the 4 s until the next sample
+    assert report['no_face_duration_seconds'] == pytest.approx(20.0)
+    assert report['face_visibility_percentage'] == round(100 * (1 - 20 / 300), 2)
+    assert sample_step(FPS, 0.25) == 40
+    assert max_frame_gap(FPS, 40) == pytest.approx(6.0)
+    assert max_frame_gap(FPS, 1) == pytest.approx(2.0)
+
+
+def test_non_positive_sample_rate_is_rejected(recordings):
+    directory, _ = recordings
+    with pytest.raises(ValueError):
+        analyze_videos([str(directory)], workers=1, sample_fps=0)
+
+
+def test_failed_chunk_fails_only_its_recording(recordings, monkeypatch):
+    directory, lengths = recordings
+    run_chunk = batch._run_chunk
+
+    def flaky(job, *args):
+        if job[0].endswith('a.mp4') and job[1] == 1:
+            raise IOError("corrupt frame")
+        return run_chunk(job, *args)
+
+    monkeypatch.setattr(batch, '_run_chunk', flaky)
+    reports = analyze_videos([str(directory)], workers=1, chunk_seconds=70)
+    assert reports[str(directory / 'a.mp4')] == {'error': "chunk 1: corrupt frame"}
+    assert 'error' not in reports[str(directory / 'b.webm')]
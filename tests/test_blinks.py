@@ -0,0 +1,104 @@
+import numpy as np
+import pytest
+
+from proctoring.blinks import SeriesBlinkDetector, count_blinks, detect_blink_series, smooth
+
+
+def ear_series(blink_times, duration=20.0, fps=30.0, open_ear=0.3, closed_ear=0.1, blink_length=0.15, seed=0):
+    """Timestamps and EARs with a dip to ``closed_ear`` at each blink time"""
+    rng = np.random.default_rng(seed)
+    timestamps = np.arange(0.0, duration, 1.0 / fps)
+    ears = open_ear + rng.normal(0, 0.005, len(timestamps))
+    for blink in blink_times:
+        closed = np.abs(timestamps - blink) <= blink_length / 2
+        ears[closed] = closed_ear
+    return timestamps, ears
+
+
+BLINKS = [2.0, 5.3, 9.1, 12.7, 17.4]
+
+
+def test_smooth_is_centered_moving_average():
+    timestamps = np.arange(5, dtype=np.float64)
+    values = np.array([0.0, 0.0, 3.0, 0.0, 0.0])
+    assert list(smooth(timestamps, values, 2.0)) == pytest.approx([0.0, 1.0, 1.0, 1.0, 0.0])
+
+
+def test_smooth_handles_uneven_spacing():
+    timestamps = np.array([0.0, 0.1, 1.0])
+    values = np.array([1.0, 3.0, 5.0])
+    assert list(smooth(timestamps, values, 0.4)) == pytest.approx([2.0, 2.0, 5.0])
+
+
+def test_smooth_without_window_is_identity():
+    values = [0.1, 0.2]
+    assert list(smooth(np.array([0.0, 1.0]), values, 0)) == values
+
+
+def test_detects_each_blink_near_its_time():
+    timestamps, ears = ear_series(BLINKS)
+    blink_times, end_times = detect_blink_series(timestamps, ears, ears)
+    assert blink_times == pytest.approx(BLINKS, abs=0.1)
+    assert (end_times > blink_times).all()
+
+
+def test_result_does_not_depend_on_frame_rate():
+    for fps in (10.0, 15.0, 60.0):
+        timestamps, ears = ear_series(BLINKS, fps=fps)
+        assert count_blinks(timestamps, ears, ears) == len(BLINKS)
+
+
+def test_long_closures_are_not_blinks():
+    timestamps, ears = ear_series([5.0], blink_length=1.5)
+    assert count_blinks(timestamps, ears, ears) == 0
+
+
+def test_shallow_dips_are_not_blinks():
+    timestamps, ears = ear_series(BLINKS, closed_ear=0.27)
+    assert count_blinks(timestamps, ears, ears) == 0
+
+
+def test_non_finite_ears_are_dropped():
+    timestamps, ears = ear_series(BLINKS)
+    left = ears.copy()
+    left[[10, 100, 400]] = np.nan
+    left[200] = np.inf
+    assert count_blinks(timestamps, left, ears) == len(BLINKS)
+
+
+def test_too_short_series_has_no_blinks():
+    assert count_blinks([0.0], [0.1], [0.1]) == 0
+    assert count_blinks([0.0, 0.1], [np.nan, 0.3], [0.3, 0.3]) == 0
+
+
+def test_live_detector_matches_batch_after_flush():
+    timestamps, ears = ear_series(BLINKS + [19.5], duration=20.0)
+    assert count_blinks(timestamps, ears, ears) == len(BLINKS) + 1
+    detector = SeriesBlinkDetector()
+    for timestamp, ear in zip(timestamps, ears):
+        detector.update(ear, ear, timestamp)
+    # The blink in the last, incomplete baseline bin is only final once the session is flushed
+    assert detector.blink_count == len(BLINKS)
+    assert detector.flush() == 1
+    assert detector.blink_count == len(BLINKS) + 1
+    assert detector.flush() == 0
+
+
+def test_live_detector_trims_long_sessions():
+    timestamps, ears = ear_series([t * 3.0 + 1.0 for t in range(40)], duration=120.0, fps=15.0)
+    detector = SeriesBlinkDetector(baseline_window=5.0)
+    for timestamp, ear in zip(timestamps, ears):
+        detector.update(ear, ear, timestamp)
+    detector.flush()
+    assert detector.blink_count == count_blinks(timestamps, ears, ears, baseline_window=5.0) == 40
+    assert len(detector._timestamps) < 15 * 20
+
+
+def test_reset_starts_over():
+    timestamps, ears = ear_series(BLINKS)
+    detector = SeriesBlinkDetector()
+    for timestamp, ear in zip(timestamps, ears):
+        detector.update(ear, ear, timestamp)
+    detector.reset()
+    assert detector.blink_count == 0
+    assert detector.flush() == 0
@@ -0,0 +1,208 @@
+import types
+
+import numpy as np
+import pytest
+
+from proctoring import engine
+from proctoring.engine import (LEFT_EYE, RIGHT_EYE, BlinkDetector, FrameAnalyzer, calculate_ear, detect_blinks,
+                               eye_aspect_ratios)
+
+# Square, so relative landmarks keep their aspect ratio in pixels
+FRAME = np.zeros((160, 160, 3), dtype=np.uint8)
+OPEN_EAR = 0.35
+CLOSED_EAR = 0.1
+
+
+def face_points(ear, center=(0.5, 0.5), size=0.2):
+    """(468, 2) relative landmarks of a face whose eyes both have aspect ratio ``ear``"""
+    points = np.tile(np.array(center, dtype=np.float32), (468, 1))
+    width = size / 4
+    for eye, x in ((LEFT_EYE, center[0] + size / 4), (RIGHT_EYE, center[0] - size / 4)):
+        # p1 and p4 are the corners, p2/p3 the top and p6/p5 the bottom lid
+        left, top_1, top_2, right, bottom_2, bottom_1 = eye
+        half_height = ear * width / 2
+        y = center[1] - size / 6
+        points[left] = (x - width / 2, y)
+        points[right] = (x + width / 2, y)
+        points[top_1] = points[top_2] = (x, y - half_height)
+        points[bottom_1] = points[bottom_2] = (x, y + half_height)
+    return points
+
+
+def mesh_face(points):
+    return types.SimpleNamespace(landmark=[types.SimpleNamespace(x=float(x), y=float(y)) for x, y in points])
+
+
+def detection(xmin=0.4, ymin=0.4, width=0.2, height=0.2):
+    box = types.SimpleNamespace(xmin=xmin, ymin=ymin, width=width, height=height)
+    return types.SimpleNamespace(location_data=types.SimpleNamespace(relative_bounding_box=box))
+
+
+class FakeModel:
+    """Stands in for a MediaPipe graph, replaying one scripted output per frame"""
+
+    def __init__(self, attribute, outputs):
+        self.attribute = attribute
+        self.outputs = list(outputs)
+        self.inputs = []
+
+    def process(self, rgb_frame):
+        self.inputs.append(rgb_frame.shape)
+        output = self.outputs.pop(0) if len(self.outputs) > 1 else self.outputs[0]
+        return types.SimpleNamespace(**{self.attribute: output})
+
+
+def fake_mesh(*frames):
+    """FaceMesh returning, per frame, one face per EAR given (None for no face)"""
+    return FakeModel('multi_face_landmarks', [
+        [mesh_face(face_points(ear)) for ear in ears] or None for ears in frames])
+
+
+def fake_detection(*frames):
+    """FaceDetection returning, per frame, that many detections"""
+    return FakeModel('detections', [[detection() for _ in range(count)] or None for count in frames])
+
+
+@pytest.fixture(autouse=True)
+def opencv(monkeypatch):
+    # The engine only imports OpenCV together with MediaPipe, which the fake models replace
+    if engine.cv2 is None:
+        monkeypatch.setattr(engine, 'cv2', pytest.importorskip('cv2'))
+
+
+def test_blink_detector_counts_short_closures():
+    detector = BlinkDetector()
+    assert not detector.update(CLOSED_EAR, CLOSED_EAR, 0.0)
+    assert detector.update(OPEN_EAR, OPEN_EAR, 0.2)
+    assert detector.blink_count == 1
+
+
+def test_blink_detector_ignores_long_closures_and_one_eye():
+    detector = BlinkDetector()
+    detector.update(CLOSED_EAR, CLOSED_EAR, 0.0)
+    assert not detector.update(OPEN_EAR, OPEN_EAR, 2.0)
+    # A wink keeps the detector open
+    detector.update(CLOSED_EAR, OPEN_EAR, 3.0)
+    assert not detector.update(OPEN_EAR, OPEN_EAR, 3.1)
+    assert detector.blink_count == 0
+    assert detector.state == 'OPEN'
+
+
+def test_blink_detector_waits_for_eyes_to_reopen_fully():
+    detector = BlinkDetector()
+    detector.update(CLOSED_EAR, CLOSED_EAR, 0.0)
+    # Between the two thresholds the eyes are neither closed nor open
+    assert not detector.update(0.25, 0.25, 0.1)
+    assert detector.update(OPEN_EAR, OPEN_EAR, 0.2)
+    detector.reset()
+    assert (detector.blink_count, detector.state) == (0, 'OPEN')
+
+
+def test_analyzer_counts_blinks_and_publishes_results():
+    mesh = fake_mesh([OPEN_EAR], [CLOSED_EAR], [OPEN_EAR])
+    analyzer = FrameAnalyzer(fake_detection(1), mesh, mode='dual')
+    published = []
+    analyzer.subscribe(published.append)
+    results = [analyzer.process(FRAME, t) for t in (0.0, 0.1, 0.2)]
+    assert published == results
+    assert [r.blink_detected for r in results] == [False, False, True]
+    assert results[-1].blink_count == analyzer.blink_count == 1
+    assert results[0].left_ear == pytest.approx(OPEN_EAR, rel=1e-3)
+    assert results[1].right_ear == pytest.approx(CLOSED_EAR, rel=1e-3)
+    analyzer.unsubscribe(published.append)
+    analyzer.process(FRAME, 0.3)
+    assert len(published) == 3
+
+
+def test_analyzer_without_face_has_no_ears():
+    analyzer = FrameAnalyzer(fake_detection(0), fake_mesh([]), mode='dual')
+    result = analyzer.process(FRAME, 0.0)
+    assert result.face_count == 0
+    assert result.left_ear is None and result.right_ear is None
+    assert result.landmarks.shape == (0, 0, 2)
+
+
+def test_mesh_mode_counts_faces_from_the_mesh():
+    mesh = fake_mesh([OPEN_EAR, OPEN_EAR], [OPEN_EAR], [])
+    analyzer = FrameAnalyzer(fake_detection(3), mesh, mode='mesh')
+    assert analyzer.face_detection is None
+    counts = [analyzer.process(FRAME, t).face_count for t in (0.0, 0.1, 0.2)]
+    assert counts == [2, 1, 0]
+
+
+def test_dual_mode_counts_faces_from_the_detector():
+    detector = fake_detection(2, 0)
+    analyzer = FrameAnalyzer(detector, fake_mesh([OPEN_EAR]), mode='dual')
+    first, second = analyzer.process(FRAME, 0.0), analyzer.process(FRAME, 0.1)
+    assert (first.face_count, second.face_count) == (2, 0)
+    assert len(detector.inputs) == 2
+    # Blinks still come from the mesh, for the primary face
+    assert second.left_ear == pytest.approx(OPEN_EAR, rel=1e-3)
+
+
+def test_mesh_mode_tracks_blinks_of_primary_face_only():
+    mesh = fake_mesh([OPEN_EAR, OPEN_EAR], [CLOSED_EAR, OPEN_EAR], [OPEN_EAR, CLOSED_EAR])
+    analyzer = FrameAnalyzer(face_mesh=mesh, mode='mesh')
+    results = [analyzer.process(FRAME, t) for t in (0.0, 0.1, 0.2)]
+    assert results[-1].blink_count == 1
+    assert results[-1].ears.shape == (2, 2)
+    assert results[-1].landmarks.shape == (2, 468, 2)
+
+
+def test_adaptive_mode_detects_only_every_few_frames():
+    detector = fake_detection(1)
+    analyzer = FrameAnalyzer(detector, fake_mesh([OPEN_EAR]), mode='adaptive', detect_interval=3)
+    counts = [analyzer.process(FRAME, t / 10).face_count for t in range(6)]
+    assert counts == [1] * 6
+    assert len(detector.inputs) == 2
+
+
+def test_adaptive_mode_counts_a_face_joining_between_detections():
+    detector = fake_detection(1, 2, 1)
+    mesh = fake_mesh([OPEN_EAR], [OPEN_EAR, OPEN_EAR], [OPEN_EAR, OPEN_EAR], [OPEN_EAR])
+    analyzer = FrameAnalyzer(detector, mesh, mode='adaptive', detect_interval=5)
+    counts = [analyzer.process(FRAME, t / 10).face_count for t in range(5)]
+    assert counts == [1, 2, 2, 1, 1]
+    # Re-detects as soon as the mesh sees more faces and while several are in view
+    assert len(detector.inputs) == 3
+
+
+def test_adaptive_mode_drops_the_count_when_the_face_is_lost():
+    detector = fake_detection(2, 1, 0)
+    mesh = fake_mesh([OPEN_EAR], [OPEN_EAR], [])
+    analyzer = FrameAnalyzer(detector, mesh, mode='adaptive', detect_interval=5)
+    counts = [analyzer.process(FRAME, t / 10).face_count for t in range(3)]
+    assert counts == [2, 1, 0]
+    assert analyzer.process(FRAME, 0.3).left_ear is None
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        FrameAnalyzer(face_mesh=fake_mesh([]), mode='triple')
+
+
+def test_eye_aspect_ratios_batch_over_leading_dimensions():
+    faces = np.stack([face_points(OPEN_EAR), face_points(CLOSED_EAR)])
+    ears = eye_aspect_ratios(faces)
+    assert ears.shape == (2, 2)
+    assert ears[:, 0] == pytest.approx([OPEN_EAR, CLOSED_EAR], rel=1e-3)
+    frames = np.stack([faces] * 3)
+    assert eye_aspect_ratios(frames).shape == (3, 2, 2)
+    np.testing.assert_allclose(eye_aspect_ratios(frames)[1], ears)
+
+
+def test_calculate_ear_matches_six_point_formula():
+    eye = np.array([[0, 0], [1, -1], [2, -2], [4, 0], [2, 2], [1, 1]], dtype=np.float32)
+    # (|p2 - p6| + |p3 - p5|) / (2 |p1 - p4|)
+    assert calculate_ear(eye) == pytest.approx((2 + 4) / 8)
+    with np.errstate(invalid='raise'):
+        assert np.isnan(calculate_ear(np.zeros((6, 2))))
+
+
+def test_detect_blinks_on_landmark_array():
+    detector = BlinkDetector()
+    assert detect_blinks(np.empty((0, 2)), detector) == (None, None, False)
+    detect_blinks(face_points(CLOSED_EAR), detector, 0.0)
+    left, right, blinked = detect_blinks(face_points(OPEN_EAR), detector, 0.1)
+    assert blinked and detector.blink_count == 1
+    assert (left, right) == pytest.approx((OPEN_EAR, OPEN_EAR), rel=1e-3)
@@ -0,0 +1,145 @@
+import os
+import struct
+
+import pytest
+
+from proctoring.eventlog import (FILE_HEADER, FRAME, RECORD_HEADER, START, EventLog, LogFlusher, log_path,
+                                 read_records, replay)
+
+
+@pytest.fixture
+def flusher():
+    flusher = LogFlusher(interval=3600)
+    yield flusher
+    flusher.stop()
+
+
+def write_session(path, flusher):
+    with EventLog(path, flusher=flusher) as log:
+        log.page_load(100.0)
+        log.start(100.0)
+        log.frame(100.0, 1, 0)
+        log.frame(100.5, 0, 1)
+        log.frame(101.0, 2, 2)
+        log.frame(101.5, 1, 2)
+        log.tab_events([(1, 'h', 102.0), (2, 'v', 104.0)])
+        log.quiz(102.0, {'title': 'Quiz', 'questions': [{'id': 1}]})
+        log.answer(103.0, 1, 'B')
+        log.answer(103.5, 1, 'C')
+        log.submit(105.0)
+
+
+def test_replay_rebuilds_session(tmp_path, flusher):
+    path = log_path(str(tmp_path), 'abc')
+    write_session(path, flusher)
+
+    session = replay(path)
+    data = session['proctoring_data']
+    assert session['start_time'] == 100.0
+    assert session['blink_count'] == 2
+    assert session['quiz_data']['title'] == 'Quiz'
+    assert session['user_answers'] == {1: 'C'}
+    assert session['submitted']
+    assert data['stats'].frames == 4
+    assert data['stats'].no_face_time == pytest.approx(0.5)
+    assert data['stats'].multi_face_time == pytest.approx(0.5)
+    assert data['time_on_camera'] == pytest.approx(1.5)
+    assert data['tab_switches'] == 1
+    assert data['tabs'].snapshot()['away_seconds'] == pytest.approx(2.0)
+    assert len(data['frames']) == 4
+
+
+def test_blinks_record_overrides_frame_count(tmp_path, flusher):
+    path = log_path(str(tmp_path), 'blinks')
+    with EventLog(path, flusher=flusher) as log:
+        log.frame(1.0, 1, 3)
+        log.blinks(2.0, 5)
+    session = replay(path)
+    assert session['blink_count'] == 5
+    assert session['proctoring_data']['stats'].blink_count == 5
+
+
+def test_reopened_log_appends(tmp_path, flusher):
+    path = log_path(str(tmp_path), 'resume')
+    with EventLog(path, flusher=flusher) as log:
+        log.start(1.0)
+    with EventLog(path, flusher=flusher) as log:
+        log.frame(2.0, 1, 4)
+    assert [kind for kind, _, _ in read_records(path)] == [START, FRAME]
+
+
+def test_torn_tail_is_dropped(tmp_path, flusher):
+    path = log_path(str(tmp_path), 'torn')
+    write_session(path, flusher)
+    complete = list(read_records(path))
+    size = os.path.getsize(path)
+    # Cut the last record in half, as a crash mid-write would
+    with open(path, 'r+b') as f:
+        f.truncate(size - 3)
+    records = list(read_records(path))
+    assert records == complete[:-1]
+    assert not replay(path)['submitted']
+
+
+def test_reopened_log_drops_torn_tail_before_appending(tmp_path, flusher):
+    path = log_path(str(tmp_path), 'resumed')
+    with EventLog(path, flusher=flusher) as log:
+        log.start(0.0)
+        for i in range(4):
+            log.frame(float(i), 1, 0)
+    with open(path, 'ab') as f:
+        # Half a record, as a crash mid-write leaves it
+        f.write(RECORD_HEADER.pack(FRAME, 9.0, 6, 0)[:7])
+    with EventLog(path, flusher=flusher) as log:
+        for i in range(4, 9):
+            log.frame(float(i), 1, 0)
+    session = replay(path)
+    assert session['proctoring_data']['stats'].frames == 9
+    assert session['proctoring_data']['time_on_camera'] == 8.0
+
+
+def test_reopened_log_drops_corrupt_record(tmp_path, flusher):
+    path = log_path(str(tmp_path), 'corrupt-resume')
+    with EventLog(path, flusher=flusher) as log:
+        log.frame(0.0, 1, 0)
+        log.frame(1.0, 1, 0)
+    with open(path, 'r+b') as f:
+        f.seek(-1, os.SEEK_END)
+        f.write(b'\xff')
+    with EventLog(path, flusher=flusher) as log:
+        log.frame(2.0, 2, 0)
+    assert [timestamp for _, timestamp, _ in read_records(path)] == [0.0, 2.0]
+
+
+def test_corrupt_record_stops_replay(tmp_path, flusher):
+    path = log_path(str(tmp_path), 'corrupt')
+    write_session(path, flusher)
+    # Flip a payload byte of the first frame record (after page load and start)
+    offset = FILE_HEADER.size + 2 * RECORD_HEADER.size + RECORD_HEADER.size
+    with open(path, 'r+b') as f:
+        f.seek(offset)
+        byte = f.read(1)
+        f.seek(offset)
+        f.write(bytes([byte[0] ^ 0xFF]))
+    assert len(list(read_records(path))) == 2
+
+
+def test_rejects_other_files(tmp_path):
+    path = tmp_path / 'other.plog'
+    path.write_bytes(FILE_HEADER.pack(b'NOPE', 1) + b'\0' * 32)
+    with pytest.raises(ValueError):
+        list(read_records(str(path)))
+
+
+def test_empty_file_has_no_records(tmp_path):
+    path = tmp_path / 'empty.plog'
+    path.write_bytes(b'')
+    assert list(read_records(str(path))) == []
+
+
+def test_closed_log_rejects_appends(tmp_path, flusher):
+    log = EventLog(log_path(str(tmp_path), 'closed'), flusher=flusher)
+    log.close()
+    with pytest.raises(ValueError):
+        log.start(1.0)
+    assert struct.calcsize("<BdII") == RECORD_HEADER.size
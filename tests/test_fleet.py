@@ -0,0 +1,110 @@
+import json
+import os
+
+import pytest
+
+from proctoring.fleet import FleetIndex, blink_rate_outliers, cohort_stats, to_frame
+
+
+def report(blink_rate=15.0, risk='Low', tab_switches=0, **overrides):
+    return dict({
+        'total_exam_time_minutes': 30.0,
+        'face_visibility_percentage': 98.0,
+        'no_face_detected_instances': 1,
+        'no_face_duration_seconds': 4.0,
+        'multiple_faces_detected_instances': 0,
+        'multiple_faces_duration_seconds': 0.0,
+        'total_blinks': 450,
+        'blink_rate_per_minute': blink_rate,
+        'tab_switches': tab_switches,
+        'tab_away_seconds': 2.0 * tab_switches,
+        'longest_tab_away_seconds': 2.0 if tab_switches else 0.0,
+        'potential_cheating_risk': risk,
+    }, **overrides)
+
+
+def write(path, data, mtime_ns=None):
+    path.write_text(json.dumps(data))
+    if mtime_ns is not None:
+        os.utime(path, ns=(mtime_ns, mtime_ns))
+    return str(path)
+
+
+def sessions(index):
+    return sorted(index.frame['session'])
+
+
+def test_refresh_reads_only_new_or_changed_files(tmp_path):
+    write(tmp_path / 'alice.json', report())
+    write(tmp_path / 'batch.json', {'rec/a.mp4': report(20.0), 'rec/b.mp4': {'error': "corrupt"}})
+    write(tmp_path / 'summary.json', {'sessions': 2})
+    index = FleetIndex()
+    assert index.refresh([str(tmp_path)]) == 3
+    assert sessions(index) == ['alice', 'rec/a.mp4']
+    assert index.refresh([str(tmp_path)]) == 0
+
+    write(tmp_path / 'alice.json', report(30.0, tab_switches=4), mtime_ns=10**18)
+    assert index.refresh([str(tmp_path)]) == 1
+    alice = index.frame.set_index('session').loc['alice']
+    assert (alice['blink_rate_per_minute'], alice['tab_switches']) == (30.0, 4.0)
+    assert len(index.frame) == 2
+
+    os.remove(tmp_path / 'batch.json')
+    assert index.refresh([str(tmp_path)]) == 0
+    assert sessions(index) == ['alice']
+    assert str(tmp_path / 'batch.json') not in index.signatures
+
+
+def test_unreadable_files_are_retried(tmp_path):
+    path = tmp_path / 'bob.json'
+    path.write_text('{"truncated": ')
+    index = FleetIndex()
+    assert index.refresh([str(tmp_path)]) == 1
+    assert index.frame.empty
+    assert index.refresh([str(tmp_path)]) == 1
+    write(path, report())
+    index.refresh([str(tmp_path)])
+    assert sessions(index) == ['bob']
+
+
+def test_cache_persists_rows_and_signatures(tmp_path):
+    reports = tmp_path / 'reports'
+    reports.mkdir()
+    write(reports / 'alice.json', report(risk='High'))
+    output = write(reports / 'stats.json', {})
+    cache = str(tmp_path / 'fleet.pkl')
+    FleetIndex(cache).refresh([str(reports)], exclude=(output,))
+    index = FleetIndex(cache)
+    assert list(index.signatures) == [str(reports / 'alice.json')]
+    assert index.refresh([str(reports)], exclude=(output,)) == 0
+    assert sessions(index) == ['alice']
+    assert index.frame['potential_cheating_risk'].tolist() == ['High']
+
+
+def test_blink_rate_outliers_use_the_median_absolute_deviation():
+    rates = [14.0, 15.0, 16.0, 15.5, 14.5, 15.0, 16.5, 13.5, 60.0, None]
+    frame = to_frame([dict(report(rate), session=f"s{i}") for i, rate in enumerate(rates)])
+    outliers = blink_rate_outliers(frame)
+    assert outliers['session'].tolist() == ['s8']
+    assert outliers['z_score'].iloc[0] > 3.5
+
+
+def test_blink_rate_outliers_when_most_rates_are_equal():
+    rates = [15.0] * 8 + [16.0, 45.0]
+    frame = to_frame([dict(report(rate), session=f"s{i}") for i, rate in enumerate(rates)])
+    assert blink_rate_outliers(frame)['session'].tolist() == ['s9']
+    assert blink_rate_outliers(to_frame([])).empty
+
+
+def test_cohort_stats():
+    rows = [dict(report(15.0, risk, switches), session=f"s{i}")
+            for i, (risk, switches) in enumerate([('Low', 0), ('Low', 1), ('Medium', 2), ('High', 9)])]
+    stats = cohort_stats(to_frame(rows))
+    assert stats['sessions'] == 4
+    assert stats['potential_cheating_risk_distribution'] == {'Low': 2, 'Medium': 1, 'High': 1}
+    assert stats['peak_risk_level_distribution'] == {'Low': 0, 'Medium': 0, 'High': 0}
+    assert stats['tab_switches_percentiles']['p50'] == pytest.approx(1.5)
+    assert stats['peak_risk_score_percentiles'] == {'p50': None, 'p90': None, 'p95': None, 'p99': None}
+    assert sum(stats['peak_risk_score_histogram']['counts']) == 0
+    assert stats['blink_rate_outliers'] == []
+    assert stats['blink_rate_per_minute_percentiles']['p99'] == 15.0
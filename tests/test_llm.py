@@ -0,0 +1,210 @@
+import asyncio
+import concurrent.futures
+import json
+import threading
+
+import pytest
+
+from proctoring.llm import AsyncQuizClient, FakeBackend
+from proctoring.metrics import MetricsRegistry
+from proctoring.quiz import QuizValidationError
+
+
+def counter(metrics, name):
+    return sum(c['value'] for c in metrics.to_dict()['counters'] if c['name'] == name)
+
+
+class ScriptedBackend:
+    """Streams canned responses in order, one per request; an exception instance is raised instead
+
+    With a ``gate``, streaming waits for it to be set once ``pause_at``
+    characters have been sent.
+    """
+
+    model = "scripted"
+
+    def __init__(self, responses, gate=None, pause_at=0):
+        self.responses = list(responses)
+        self.gate = gate
+        self.pause_at = pause_at
+        self.requests = []
+
+    async def _wait(self):
+        while self.gate is not None and not self.gate.is_set():
+            await asyncio.sleep(0.005)
+
+    async def stream(self, topic, difficulty, num_questions, time_limit, exclude=()):
+        self.requests.append((num_questions, list(exclude)))
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            await self._wait()
+            raise response
+        for start in range(0, len(response), 16):
+            if start >= self.pause_at:
+                await self._wait()
+            yield response[start:start + 16]
+
+
+def response(*texts, answer="A"):
+    return json.dumps({'title': "Scripted", 'questions': [
+        {'id': i + 1, 'question': text, 'options': ["x", "y"], 'correct_answer': answer}
+        for i, text in enumerate(texts)
+    ]})
+
+
+@pytest.fixture
+def metrics():
+    return MetricsRegistry()
+
+
+def make_client(backend, metrics, **kwargs):
+    return AsyncQuizClient(backend, backoff=0.0, metrics=metrics, **kwargs).start()
+
+
+def test_fake_backend_quiz_is_generated(metrics):
+    client = make_client(FakeBackend(latency=0.0, tokens_per_second=0.0, seed=1), metrics)
+    try:
+        quiz = client.generate_sync("Python", "Easy", 4, 10, timeout=5)
+    finally:
+        client.stop()
+    assert quiz['title'] == "Python Quiz"
+    assert [q['id'] for q in quiz['questions']] == [1, 2, 3, 4]
+    assert all(q['correct_answer'] in "ABCD" for q in quiz['questions'])
+
+
+def test_identical_requests_share_one_generation(metrics):
+    gate = threading.Event()
+    backend = ScriptedBackend([response("q1?", "q2?"), response("o1?", "o2?")], gate=gate)
+    client = make_client(backend, metrics)
+    try:
+        futures = [client.submit("Topic", "Easy", 2, 5) for _ in range(3)]
+        other = client.submit("Other", "Easy", 2, 5)
+        gate.set()
+        quizzes = [future.result(5) for future in futures]
+        assert other.result(5)['questions'][0]['question'] == "o1?"
+    finally:
+        client.stop()
+    assert len(backend.requests) == 2
+    assert quizzes[0] == quizzes[1] == quizzes[2]
+    assert counter(metrics, 'proctoring_quiz_requests_coalesced_total') == 2
+
+
+def test_late_joiner_gets_questions_already_streamed(metrics):
+    gate = threading.Event()
+    text = response("q1?", "q2?")
+    # Pause once the first question object has been sent
+    backend = ScriptedBackend([text], gate=gate, pause_at=text.index("}") + 1)
+    client = make_client(backend, metrics)
+    streamed = threading.Event()
+    seen = []
+    try:
+        first = client.submit("Topic", "Easy", 2, 5, on_question=lambda q: streamed.set())
+        assert streamed.wait(5)
+        second = client.submit("Topic", "Easy", 2, 5, on_question=lambda q: seen.append(q['question']))
+        gate.set()
+        assert first.result(5) == second.result(5)
+    finally:
+        client.stop()
+    assert seen == ["q1?", "q2?"]
+    assert len(backend.requests) == 1
+
+
+def test_finished_generations_are_not_reused(metrics):
+    backend = ScriptedBackend([response("q1?"), response("q2?")])
+    client = make_client(backend, metrics)
+    try:
+        first = client.generate_sync("Topic", "Easy", 1, 5, timeout=5)
+        second = client.generate_sync("Topic", "Easy", 1, 5, timeout=5)
+    finally:
+        client.stop()
+    assert first != second
+    assert counter(metrics, 'proctoring_quiz_requests_coalesced_total') == 0
+
+
+def test_questions_are_streamed_to_callback(metrics):
+    client = make_client(ScriptedBackend([response("q1?", "q2?", "q3?")]), metrics)
+    seen = []
+    try:
+        client.submit("Topic", "Easy", 3, 5, on_question=lambda q: seen.append(q['question'])).result(5)
+    finally:
+        client.stop()
+    assert seen == ["q1?", "q2?", "q3?"]
+
+
+def test_transient_failures_are_retried(metrics):
+    backend = ScriptedBackend([RuntimeError("down"), RuntimeError("down"), response("q1?", "q2?")])
+    client = make_client(backend, metrics, max_retries=3)
+    try:
+        quiz = client.generate_sync("Topic", "Easy", 2, 5, timeout=5)
+    finally:
+        client.stop()
+    assert len(quiz['questions']) == 2
+    assert counter(metrics, 'proctoring_quiz_request_errors_total') == 2
+
+
+def test_gives_up_after_max_retries(metrics):
+    backend = ScriptedBackend([RuntimeError("down")] * 3)
+    client = make_client(backend, metrics, max_retries=2)
+    try:
+        with pytest.raises(RuntimeError):
+            client.generate_sync("Topic", "Easy", 2, 5, timeout=5)
+    finally:
+        client.stop()
+    assert len(backend.requests) == 3
+
+
+def test_missing_questions_are_re_requested(metrics):
+    first = json.dumps({'questions': [
+        {'question': "q1?", 'options': ["x", "y"], 'correct_answer': "A"},
+        {'question': "bad?", 'options': ["x", "y"], 'correct_answer': "Q"},
+        {'question': "q3?", 'options': ["x", "y"], 'correct_answer': "B"},
+    ]})
+    # The repair response repeats a question, which is dropped as a duplicate
+    backend = ScriptedBackend([first, response("q1?", "q4?")])
+    client = make_client(backend, metrics)
+    try:
+        quiz = client.generate_sync("Topic", "Easy", 3, 5, timeout=5)
+    finally:
+        client.stop()
+    assert [q['question'] for q in quiz['questions']] == ["q1?", "q3?", "q4?"]
+    assert backend.requests[1] == (1, ["q1?", "q3?"])
+    assert counter(metrics, 'proctoring_quiz_invalid_questions_total') == 1
+    assert counter(metrics, 'proctoring_quiz_repair_requests_total') == 1
+
+
+def test_repairs_are_capped(metrics):
+    backend = ScriptedBackend([response("q1?"), response("q1?"), response("q1?")])
+    client = make_client(backend, metrics, max_repairs=1)
+    try:
+        quiz = client.generate_sync("Topic", "Easy", 3, 5, timeout=5)
+    finally:
+        client.stop()
+    assert len(quiz['questions']) == 1
+    assert len(backend.requests) == 2
+
+
+def test_no_valid_questions_raises(metrics):
+    backend = ScriptedBackend([response("q1?", answer="Q")] * 3)
+    client = make_client(backend, metrics, max_repairs=2)
+    try:
+        with pytest.raises(QuizValidationError):
+            client.generate_sync("Topic", "Easy", 1, 5, timeout=5)
+    finally:
+        client.stop()
+
+
+def test_cancelled_caller_does_not_abort_shared_generation(metrics):
+    gate = threading.Event()
+    backend = ScriptedBackend([response("q1?")], gate=gate)
+    client = make_client(backend, metrics)
+    try:
+        cancelled = client.submit("Topic", "Easy", 1, 5)
+        kept = client.submit("Topic", "Easy", 1, 5)
+        cancelled.cancel()
+        gate.set()
+        assert len(kept.result(5)['questions']) == 1
+        with pytest.raises(concurrent.futures.CancelledError):
+            cancelled.result(5)
+    finally:
+        client.stop()
+    assert len(backend.requests) == 1
@@ -0,0 +1,31 @@
+import urllib.error
+
+import pytest
+
+from proctoring.loadtest import Candidate
+from proctoring.quizserver import start_quiz_server
+
+
+@pytest.fixture
+def server():
+    server, store = start_quiz_server(port=0)
+    yield f"http://127.0.0.1:{server.server_address[1]}", store
+    server.shutdown()
+    server.server_close()
+
+
+def test_tab_switches_go_through_the_inbox(server):
+    url, store = server
+    candidate = Candidate(0, analyzer=None, source=None, quiz_client=None, quiz_url=url, store=store, seed=1)
+    candidate.tab_token, candidate.tab_inbox = store.open_inbox()
+    candidate._tab_switch()
+    candidate._tab_switch()
+    assert candidate.tab_inbox.ack == 8
+    assert candidate.tab_inbox.last_post is not None
+    assert candidate.tabs.switches == 2
+    assert not candidate.tabs.away
+    assert 2.0 <= candidate.tabs.snapshot()['away_seconds'] <= 10.0
+    assert candidate.risk.rule_scores()['tab_switches'] > 0
+    store.close_inbox(candidate.tab_token)
+    with pytest.raises(urllib.error.HTTPError):
+        candidate._tab_switch()
@@ -0,0 +1,113 @@
+import json
+import threading
+import urllib.request
+
+import pytest
+
+from proctoring.metrics import STAGE_SECONDS, MetricsRegistry, start_http_server
+
+
+def series(snapshot, kind, name, **labels):
+    return [item for item in snapshot[kind] if item['name'] == name and item['labels'] == labels]
+
+
+def test_counters_and_gauges_are_keyed_by_labels():
+    registry = MetricsRegistry()
+    registry.increment('frames', session='a')
+    registry.increment('frames', 2, session='a')
+    registry.increment('frames', session='b')
+    registry.set_gauge('depth', 1, queue='capture')
+    registry.set_gauge('depth', 0, queue='capture')
+    snapshot = registry.to_dict()
+    assert series(snapshot, 'counters', 'frames', session='a')[0]['value'] == 3
+    assert series(snapshot, 'counters', 'frames', session='b')[0]['value'] == 1
+    assert series(snapshot, 'gauges', 'depth', queue='capture')[0]['value'] == 0
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    registry = MetricsRegistry(buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 50 + [0.05] * 49 + [5.0]:
+        registry.observe('latency', value)
+    histogram = series(registry.to_dict(), 'histograms', 'latency')[0]
+    assert histogram['count'] == 100
+    assert histogram['sum'] == pytest.approx(0.25 + 2.45 + 5.0)
+    assert histogram['max'] == 5.0
+    assert histogram['p50'] == 0.01
+    assert histogram['p99'] == 0.1
+
+
+def test_stage_timer_records_even_when_the_block_raises():
+    registry = MetricsRegistry()
+    with registry.stage('mesh', session='a'):
+        pass
+    with pytest.raises(RuntimeError):
+        with registry.stage('mesh', session='a'):
+            raise RuntimeError
+    histogram = series(registry.to_dict(), 'histograms', STAGE_SECONDS, stage='mesh', session='a')[0]
+    assert histogram['count'] == 2
+
+
+def test_sinks_see_every_observation():
+    registry = MetricsRegistry()
+    seen = []
+    registry.add_sink(lambda *observation: seen.append(observation))
+    registry.increment('frames', session='a')
+    registry.set_gauge('depth', 3)
+    registry.observe('latency', 0.2)
+    assert seen == [('counter', 'frames', 1, {'session': 'a'}), ('gauge', 'depth', 3, {}),
+                    ('histogram', 'latency', 0.2, {})]
+
+
+def test_remove_drops_only_matching_series():
+    registry = MetricsRegistry()
+    registry.increment('frames', session='a', queue='capture')
+    registry.increment('frames', session='b', queue='capture')
+    registry.observe('latency', 0.1, session='a')
+    registry.remove(session='a')
+    snapshot = registry.to_dict()
+    assert [item['labels'] for item in snapshot['counters']] == [{'queue': 'capture', 'session': 'b'}]
+    assert snapshot['histograms'] == []
+
+
+def test_prometheus_text_has_cumulative_buckets():
+    registry = MetricsRegistry(buckets=(0.1, 1.0))
+    registry.increment('proctoring_frames_total', session='a')
+    registry.observe('latency', 0.05)
+    registry.observe('latency', 0.5)
+    lines = registry.render_prometheus().splitlines()
+    assert '# TYPE proctoring_frames_total counter' in lines
+    assert 'proctoring_frames_total{session="a"} 1' in lines
+    assert 'latency_bucket{le="0.1"} 1' in lines
+    assert 'latency_bucket{le="1.0"} 2' in lines
+    assert 'latency_bucket{le="+Inf"} 2' in lines
+    assert 'latency_count 2' in lines
+
+
+def test_concurrent_increments_are_not_lost():
+    registry = MetricsRegistry()
+
+    def work():
+        for _ in range(1000):
+            registry.increment('frames')
+
+    threads = [threading.Thread(target=work) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert series(registry.to_dict(), 'counters', 'frames')[0]['value'] == 8000
+
+
+def test_http_endpoint_serves_both_formats():
+    registry = MetricsRegistry()
+    registry.increment('frames')
+    server = start_http_server(port=0, registry=registry)
+    url = f"http://127.0.0.1:{server.server_address[1]}"
+    try:
+        with urllib.request.urlopen(f"{url}/metrics", timeout=5) as response:
+            assert 'frames 1' in response.read().decode('utf-8').splitlines()
+        with urllib.request.urlopen(f"{url}/metrics.json", timeout=5) as response:
+            assert json.loads(response.read())['counters'][0]['value'] == 1
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,133 @@
+import threading
+import time
+import types
+
+import pytest
+
+from proctoring.pipeline import FrameRateLimiter, LatestFrameQueue, ProctoringPipeline
+
+
+class CountingSource:
+    """Yields frames 0..count-1, then reports the end of the stream"""
+
+    def __init__(self, count):
+        self.count = count
+        self.next = 0
+
+    def read(self):
+        if self.next >= self.count:
+            return False, None
+        self.next += 1
+        return True, self.next - 1
+
+
+class RecordingAnalyzer:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frames = []
+
+    def process(self, frame, timestamp=None):
+        time.sleep(self.delay)
+        self.frames.append(frame)
+        return types.SimpleNamespace(frame=frame, timestamp=timestamp)
+
+
+def wait_until_stopped(pipeline, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while pipeline.running and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert not pipeline.running
+
+
+def test_latest_frame_queue_keeps_newest():
+    slot = LatestFrameQueue()
+    assert not slot.put(1)
+    assert slot.put(2)
+    assert slot.get(0) == 2
+    assert slot.dropped == 1
+    assert slot.get(0) is None
+
+
+def test_closed_queue_still_hands_out_pending_item():
+    slot = LatestFrameQueue()
+    slot.put(1)
+    slot.close()
+    assert slot.get(0) == 1
+    assert slot.get(1.0) is None
+
+
+def test_rate_limiter_spaces_calls():
+    limiter = FrameRateLimiter(50)
+    start = time.monotonic()
+    for _ in range(5):
+        limiter.wait()
+    assert time.monotonic() - start >= 0.07
+
+
+def test_last_frame_is_analyzed_when_source_ends():
+    analyzer = RecordingAnalyzer(delay=0.01)
+    pipeline = ProctoringPipeline(CountingSource(20), analyzer, target_fps=None).start()
+    wait_until_stopped(pipeline)
+    pipeline.stop()
+    assert pipeline.error == "Failed to get frame from webcam."
+    # Frames overwritten while inference was busy are dropped, but never the last one
+    assert analyzer.frames[-1] == 19
+    assert pipeline.frames_processed + pipeline.capture_queue.dropped == 20
+
+
+def test_last_frame_reaches_render_callback():
+    rendered = []
+    done = threading.Event()
+
+    def render(frame, result):
+        rendered.append(frame)
+        if frame == 4:
+            done.set()
+
+    pipeline = ProctoringPipeline(CountingSource(5), RecordingAnalyzer(delay=0.02), target_fps=None,
+                                  render_callback=render, render_fps=1000).start()
+    assert done.wait(5)
+    pipeline.stop()
+    assert rendered[-1] == 4
+
+
+def test_analyzer_error_stops_pipeline():
+    class Failing:
+        def process(self, frame, timestamp=None):
+            raise RuntimeError("model crashed")
+
+    pipeline = ProctoringPipeline(CountingSource(1000), Failing(), target_fps=None).start()
+    wait_until_stopped(pipeline)
+    pipeline.stop()
+    assert pipeline.error == "model crashed"
+
+
+@pytest.mark.parametrize('target_fps', [None, 200])
+def test_stop_ends_a_running_pipeline(target_fps):
+    pipeline = ProctoringPipeline(CountingSource(10 ** 9), RecordingAnalyzer(), target_fps=target_fps).start()
+    time.sleep(0.05)
+    pipeline.stop()
+    assert not pipeline.running
+    assert pipeline.frames_processed > 0
+
+
+def test_render_frame_is_only_called_for_due_results():
+    class CopyingAnalyzer(RecordingAnalyzer):
+        def __init__(self):
+            super().__init__(delay=0.005)
+            self.copied = []
+
+        def render_frame(self, frame):
+            self.copied.append(frame)
+            return frame
+
+    analyzer = CopyingAnalyzer()
+    due = iter([True, False, False] * 10)
+    rendered = []
+    pipeline = ProctoringPipeline(CountingSource(30), analyzer, target_fps=None,
+                                  render_callback=lambda frame, result: rendered.append(frame),
+                                  render_fps=1000, render_due=lambda: next(due)).start()
+    wait_until_stopped(pipeline)
+    pipeline.stop()
+    assert analyzer.copied == [frame for i, frame in enumerate(analyzer.frames) if i % 3 == 0]
+    assert set(rendered) <= set(analyzer.copied)
@@ -0,0 +1,55 @@
+import numpy as np
+import pytest
+
+from proctoring import preview
+from proctoring.metrics import MetricsRegistry
+from proctoring.preview import PreviewEncoder
+
+FRAME = np.zeros((480, 640, 3), dtype=np.uint8)
+
+
+@pytest.fixture(autouse=True)
+def opencv(monkeypatch):
+    # preview shares the engine's OpenCV import, which is None without MediaPipe
+    if preview.cv2 is None:
+        monkeypatch.setattr(preview, 'cv2', pytest.importorskip('cv2'))
+
+
+def test_due_limits_the_preview_rate():
+    encoder = PreviewEncoder(fps=4.0)
+    assert [t / 8 for t in range(16) if encoder.due(t / 8)] == [0.0, 0.25, 0.5, 0.75, 1.0, 1.25, 1.5, 1.75]
+
+
+def test_due_restarts_after_a_stall_instead_of_catching_up():
+    encoder = PreviewEncoder(fps=4.0)
+    assert [encoder.due(t) for t in (0.0, 5.0, 5.125, 5.25)] == [True, True, False, True]
+
+
+def test_zero_fps_is_unlimited():
+    encoder = PreviewEncoder(fps=0)
+    assert all(encoder.due(0.0) for _ in range(3))
+
+
+def test_resize_caps_the_width():
+    assert PreviewEncoder(max_width=320).resize(FRAME).shape == (240, 320, 3)
+    assert PreviewEncoder(max_width=0).resize(FRAME) is FRAME
+    assert PreviewEncoder(max_width=800).resize(FRAME) is FRAME
+
+
+@pytest.mark.parametrize('format, magic', [('jpeg', b'\xff\xd8'), ('webp', b'RIFF')])
+def test_encode_produces_the_format_and_counts_bytes(format, magic):
+    cv2 = preview.cv2
+    registry = MetricsRegistry()
+    encoder = PreviewEncoder(format=format, max_width=320, overlays=False, metrics=registry)
+    data = encoder.encode(FRAME)
+    assert data.startswith(magic)
+    assert encoder.mimetype == f"image/{format}"
+    assert cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR).shape == (240, 320, 3)
+    assert (encoder.frames_encoded, encoder.bytes_encoded) == (1, len(data))
+    counters = registry.to_dict()['counters']
+    assert [item['value'] for item in counters if item['name'] == 'proctoring_preview_bytes_total'] == [len(data)]
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        PreviewEncoder(format='png')
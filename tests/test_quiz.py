@@ -0,0 +1,202 @@
+import json
+import os
+import random
+import threading
+import time
+
+import pytest
+
+from proctoring import quiz as quiz_module
+from proctoring.quiz import (BankFiller, QuestionBank, QuestionStreamParser, QuizCache, QuizValidationError,
+                             cache_key, parse_quiz_response, validate_question)
+
+
+def question(qid=1, text="What is 2 + 2?", options=("3", "4", "5", "6"), answer="B"):
+    return {'id': qid, 'question': text, 'options': list(options), 'correct_answer': answer}
+
+
+def quiz_text(questions, title="Arithmetic", time_limit=10):
+    return json.dumps({
+        'title': title,
+        'description': "Sums",
+        'time_limit_minutes': time_limit,
+        'questions': questions,
+    }, indent=2)
+
+
+@pytest.mark.parametrize('answer', ["B", "b", "Option B", "B)", "B. four", "4", " 4 "])
+def test_answer_forms_normalize_to_letter(answer):
+    assert validate_question(question(answer=answer))['correct_answer'] == 'B'
+
+
+@pytest.mark.parametrize('bad', [
+    "not a dict",
+    question(text="  "),
+    question(options=("only one",)),
+    question(options=("A", "a", "B")),
+    question(options=("A", "", "B")),
+    question(answer="E"),
+    question(answer=None),
+    {'question': "No options", 'correct_answer': "A"},
+])
+def test_invalid_questions_are_rejected(bad):
+    assert validate_question(bad) is None
+
+
+def test_streamed_chunks_yield_each_question_once():
+    text = quiz_text([question(1), question(2, text='Say "hi" {braces} [ok]?'), question(3, answer="Z")])
+    parser = QuestionStreamParser()
+    found = []
+    for i in range(0, len(text), 7):
+        found.extend(parser.feed(text[i:i + 7]))
+    assert [q['id'] for q in found] == [1, 2]
+    assert found[1]['question'] == 'Say "hi" {braces} [ok]?'
+    assert parser.invalid == 1
+    assert parser.header() == {'title': "Arithmetic", 'description': "Sums", 'time_limit_minutes': 10}
+
+
+def test_objects_outside_questions_array_are_ignored():
+    text = json.dumps({
+        'meta': {'question': "x", 'options': ["a", "b"], 'correct_answer': "A"},
+        'questions': [question(1)],
+        'extra': [{'question': "y", 'options': ["a", "b"], 'correct_answer': "A"}],
+    })
+    parser = QuestionStreamParser()
+    assert len(parser.feed(text)) == 1
+    assert parser.invalid == 0
+
+
+def test_malformed_question_object_counts_as_invalid():
+    text = '{"questions": [{"question": "x", "options": [,]}, ' + json.dumps(question(2)) + ']}'
+    parser = QuestionStreamParser()
+    assert [q['id'] for q in parser.feed(text)] == [2]
+    assert parser.invalid == 1
+
+
+def test_header_waits_for_complete_strings():
+    parser = QuestionStreamParser()
+    parser.feed('{"title": "Half')
+    assert 'title' not in parser.header()
+    parser.feed(' done", ')
+    assert parser.header()['title'] == "Half done"
+
+
+def test_parse_response_renumbers_and_keeps_valid_questions():
+    text = "Here you go:\n" + quiz_text([question(5), question(6, answer="?"), question(7)])
+    quiz = parse_quiz_response(text, "Maths", "Easy", 15)
+    assert quiz['title'] == "Arithmetic"
+    assert quiz['time_limit_minutes'] == 15
+    assert [q['id'] for q in quiz['questions']] == [1, 2]
+
+
+def test_parse_response_falls_back_to_header_time_limit():
+    quiz = parse_quiz_response(quiz_text([question()], time_limit=25))
+    assert quiz['time_limit_minutes'] == 25
+
+
+def test_parse_response_without_valid_questions_raises():
+    with pytest.raises(QuizValidationError):
+        parse_quiz_response(quiz_text([question(answer="?")]))
+    with pytest.raises(ValueError):
+        parse_quiz_response("Sorry, I can't help with that.")
+
+
+def wait_until(condition, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_cache_key_normalizes_topic_and_difficulty():
+    key = cache_key("model", "World  History", "Easy", 5, 10)
+    assert cache_key("model", " world history ", "easy", "5", 10) == key
+    assert cache_key("model", "World History", "Easy", 6, 10) != key
+    assert cache_key("other", "World History", "Easy", 5, 10) != key
+
+
+def test_cache_evicts_least_recently_used():
+    cache = QuizCache(max_entries=2)
+    cache.put('a', {'title': "A"})
+    cache.put('b', {'title': "B"})
+    assert cache.get('a') == {'title': "A"}
+    cache.put('c', {'title': "C"})
+    assert cache.get('b') is None
+    assert cache.get('a') and cache.get('c')
+    assert (cache.hits, cache.misses) == (3, 1)
+
+
+def test_cache_entries_expire(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(quiz_module.time, 'time', lambda: now[0])
+    cache = QuizCache(ttl=60)
+    cache.put('a', {'title': "A"})
+    now[0] += 59
+    assert cache.get('a') is not None
+    now[0] += 2
+    assert cache.get('a') is None
+
+
+def test_cache_persists_to_disk(tmp_path, monkeypatch):
+    QuizCache(str(tmp_path)).put('a', {'title': "A"})
+    cache = QuizCache(str(tmp_path), ttl=60)
+    assert cache.get('a') == {'title': "A"}
+    assert cache.hits == 1
+    # Expired files are removed rather than served
+    QuizCache(str(tmp_path)).put('b', {'title': "B"})
+    later = time.time() + 120
+    monkeypatch.setattr(quiz_module.time, 'time', lambda: later)
+    assert QuizCache(str(tmp_path), ttl=60).get('b') is None
+    assert sorted(os.listdir(tmp_path / 'quizzes')) == ['a.json']
+
+
+def test_bank_deduplicates_questions_and_persists(tmp_path):
+    bank = QuestionBank(str(tmp_path))
+    assert bank.add("Maths", "Easy", [question(1), question(2, text="What is 3 + 3?")]) == 2
+    assert bank.add(" maths ", "easy", [question(3, text="what is  2 + 2?")]) == 0
+    assert QuestionBank(str(tmp_path)).size("Maths", "Easy") == 2
+    assert bank.size("Maths", "Hard") == 0
+
+
+def test_bank_samples_renumbered_questions():
+    bank = QuestionBank()
+    bank.add("Maths", "Easy", [question(i, text=f"What is {i} + {i}?") for i in range(5)])
+    assert bank.sample("Maths", "Easy", 6) is None
+    sample = bank.sample("Maths", "Easy", 3, rng=random.Random(1))
+    assert [q['id'] for q in sample] == [1, 2, 3]
+    assert len({q['question'] for q in sample}) == 3
+
+
+def test_filler_tops_up_banks_in_batches():
+    bank = QuestionBank()
+    calls = []
+
+    def generate(topic, difficulty, num_questions):
+        calls.append(num_questions)
+        start = len(calls) * 10
+        return {'questions': [question(text=f"What is {i} + 1?") for i in range(start, start + num_questions)]}
+
+    filler = BankFiller(bank, generate, target_size=25, batch_size=10)
+    filler.request("Maths", "Easy")
+    wait_until(lambda: bank.size("Maths", "Easy") >= 25)
+    assert calls == [10, 10, 10]
+
+
+def test_filler_stops_when_the_model_repeats_itself_or_fails():
+    bank = QuestionBank()
+    repeated = threading.Event()
+
+    def generate(topic, difficulty, num_questions):
+        if topic == "Broken":
+            raise RuntimeError("rate limited")
+        if bank.size(topic, difficulty):
+            repeated.set()
+        return {'questions': [question()]}
+
+    filler = BankFiller(bank, generate, target_size=10, max_attempts=3)
+    filler.request("Broken", "Easy")
+    filler.request("Maths", "Easy")
+    assert repeated.wait(5)
+    # Requests are handled in order, so every failed attempt is counted by now
+    assert filler.errors == 3
+    assert bank.size("Maths", "Easy") == 1
@@ -0,0 +1,100 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from proctoring.quizserver import start_quiz_server, submit_watch_js
+
+QUIZ = {
+    'title': "Python",
+    'description': "Basics",
+    'time_limit_minutes': 10,
+    'questions': [
+        {'id': 1, 'question': "2 + 2?", 'options': ["3", "4"], 'correct_answer': "4"},
+        {'id': 2, 'question': "len('ab')?", 'options': ["1", "2"], 'correct_answer': "2"},
+    ],
+}
+
+
+@pytest.fixture
+def server():
+    server, store = start_quiz_server(port=0)
+    yield f"http://127.0.0.1:{server.server_address[1]}", store
+    server.shutdown()
+    server.server_close()
+
+
+def request(url, body=None):
+    data = None if body is None else body.encode('utf-8')
+    method = 'GET' if body is None else 'POST'
+    with urllib.request.urlopen(urllib.request.Request(url, data=data, method=method), timeout=5) as response:
+        return json.loads(response.read())
+
+
+def test_quiz_hides_correct_answers_and_reports_time_left(server):
+    url, store = server
+    token, _ = store.register(QUIZ, answers={2: "1"}, deadline=time.time() + 60)
+    quiz = request(f"{url}/api/{token}/quiz")
+    assert [set(q) for q in quiz['questions']] == [{'id', 'question', 'options'}] * 2
+    assert quiz['answers'] == [{'id': 2, 'answer': "1"}]
+    assert 55 < quiz['remaining_seconds'] <= 60
+    assert not quiz['submitted']
+    token, _ = store.register(QUIZ)
+    assert request(f"{url}/api/{token}/quiz")['remaining_seconds'] is None
+
+
+def test_answers_endpoint_records_valid_changes(server):
+    url, store = server
+    recorded = []
+    token, session = store.register(QUIZ, on_answer=lambda t, qid, answer: recorded.append((qid, answer)))
+    body = {'answers': [{'id': 1, 'answer': "4"}, {'id': 2, 'answer': "7"}, {'id': 9, 'answer': "4"}]}
+    assert request(f"{url}/api/{token}/answers", json.dumps(body)) == {'accepted': 1}
+    # Resending an unchanged answer is not recorded again
+    assert request(f"{url}/api/{token}/answers", json.dumps(body)) == {'accepted': 0}
+    assert session.answers == {1: "4"}
+    assert recorded == [(1, "4")]
+
+
+def test_answers_endpoint_rejects_bad_body(server):
+    url, store = server
+    token, _ = store.register(QUIZ)
+    for body in ('not json', '{}', '{"answers": [1]}'):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            request(f"{url}/api/{token}/answers", body)
+        assert error.value.code == 400
+
+
+def test_submit_endpoint_submits_once_and_freezes_answers(server):
+    url, store = server
+    submitted = []
+    token, session = store.register(QUIZ, on_submit=submitted.append)
+    request(f"{url}/api/{token}/answers", json.dumps({'answers': [{'id': 1, 'answer': "3"}]}))
+    assert request(f"{url}/api/{token}/submit", '') == {'submitted': True}
+    assert request(f"{url}/api/{token}/submit", '') == {'submitted': True}
+    assert session.submitted
+    assert len(submitted) == 1
+    assert request(f"{url}/api/{token}/answers", json.dumps({'answers': [{'id': 1, 'answer': "4"}]})) == \
+        {'accepted': 0}
+    assert session.answers == {1: "3"}
+    assert request(f"{url}/api/{token}/quiz")['submitted']
+
+
+def test_removed_quiz_is_not_found(server):
+    url, store = server
+    token, _ = store.register(QUIZ)
+    store.remove(token)
+    for path, body in ((f"/api/{token}/quiz", None), (f"/api/{token}/submit", ''), (f"/quiz/{token}", None)):
+        with pytest.raises(urllib.error.HTTPError) as error:
+            request(url + path, body)
+        assert error.value.code == 404
+
+
+def test_page_and_submit_watch_share_the_token(server):
+    url, store = server
+    token, _ = store.register(QUIZ)
+    with urllib.request.urlopen(f"{url}/quiz/{token}", timeout=5) as response:
+        page = response.read().decode('utf-8')
+    assert f'var token = "{token}"' in page
+    assert json.dumps(token) in submit_watch_js(token)
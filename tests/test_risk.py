@@ -0,0 +1,120 @@
+import pytest
+
+from proctoring.risk import CountRule, DurationRule, RiskEngine, SlidingWindowCounter, risk_level
+
+
+@pytest.mark.parametrize('score, level', [(0, "Low"), (19.9, "Low"), (20, "Medium"), (49.9, "Medium"),
+                                          (50, "High"), (100, "High")])
+def test_risk_level(score, level):
+    assert risk_level(score) == level
+
+
+def test_counter_sums_within_window():
+    counter = SlidingWindowCounter(10.0)
+    counter.add(0.5)
+    counter.add(3.2, 2.0)
+    counter.add(9.9)
+    assert counter.value(9.9) == 4.0
+
+
+def test_counter_expires_old_buckets():
+    counter = SlidingWindowCounter(10.0)
+    counter.add(0.5)
+    counter.add(5.0, 2.0)
+    assert counter.value(10.0) == 2.0
+    assert counter.value(15.0) == 0.0
+
+
+def test_counter_resets_after_long_gap():
+    counter = SlidingWindowCounter(5.0)
+    counter.add(1.0, 3.0)
+    counter.add(100.0)
+    assert counter.value(100.0) == 1.0
+
+
+def test_counter_ignores_events_older_than_window():
+    counter = SlidingWindowCounter(5.0)
+    counter.add(20.0)
+    counter.add(2.0)
+    counter.add(18.0, 2.0)
+    assert counter.value(20.0) == 3.0
+
+
+def test_counter_with_fine_resolution():
+    counter = SlidingWindowCounter(1.0, resolution=0.25)
+    counter.add(0.1)
+    counter.add(0.9)
+    assert counter.value(1.1) == 1.0
+
+
+def engine_with(*rules):
+    return RiskEngine(rules=rules)
+
+
+def test_no_face_duration_scores_fraction_of_window():
+    engine = engine_with(DurationRule('no_face', 'no_face', window=10.0, threshold=None))
+    for i in range(6):
+        engine.observe_frame(float(i), 0, 0)
+    assert engine.rule_scores()['no_face'] == pytest.approx(50.0)
+
+
+def test_gaps_longer_than_max_frame_gap_are_not_counted():
+    engine = engine_with(DurationRule('no_face', 'no_face', window=60.0, threshold=None))
+    engine.observe_frame(0.0, 0, 0)
+    engine.observe_frame(30.0, 0, 0)
+    assert engine.score == 0.0
+
+
+def test_multiple_faces_count_as_visible_too():
+    engine = RiskEngine()
+    engine.observe_frame(0.0, 2, 0)
+    engine.observe_frame(1.0, 2, 0)
+    assert engine.rule_scores()['multiple_faces'] == pytest.approx(2 * 100 / 60)
+
+
+def test_alert_fires_once_and_rearms():
+    engine = engine_with(CountRule('tabs', 'tab_switch', window=10.0, weight=20.0, threshold=40.0))
+    alerts = []
+    engine.subscribe(alerts.append)
+    engine.record_event('tab_switch', 1.0)
+    engine.record_event('tab_switch', 2.0)
+    engine.record_event('tab_switch', 3.0)
+    assert [alert['rule'] for alert in alerts] == ['tabs']
+    assert alerts[0]['timestamp'] == 2.0
+    # Once the window has emptied the rule re-arms and can alert again
+    engine.record_event('tab_switch', 20.0)
+    engine.record_event('tab_switch', 21.0)
+    assert len(alerts) == 2
+    assert engine.alert_count == 2
+
+
+def test_score_is_capped_and_peak_kept():
+    engine = engine_with(CountRule('tabs', 'tab_switch', window=5.0, weight=60.0),
+                         CountRule('other', 'tab_switch', window=5.0, weight=60.0))
+    engine.record_event('tab_switch', 0.0)
+    assert engine.score == 100.0
+    engine.record_event('unrelated', 30.0)
+    snapshot = engine.snapshot()
+    assert snapshot['score'] == 0.0
+    assert snapshot['peak_score'] == 100.0
+    assert snapshot['peak_level'] == "High"
+
+
+def test_blink_rate_needs_enough_visible_time():
+    engine = RiskEngine()
+    engine.observe_frame(0.0, 1, 0)
+    engine.observe_frame(1.0, 1, 0)
+    assert engine.rule_scores()['abnormal_blink_rate'] == 0.0
+    for i in range(2, 40):
+        engine.observe_frame(float(i), 1, 0)
+    # No blinks over 39 visible seconds is well under the normal rate
+    assert engine.rule_scores()['abnormal_blink_rate'] == pytest.approx(50.0)
+
+
+def test_history_keeps_latest_samples_in_order():
+    engine = RiskEngine(rules=[], history_size=3)
+    for i in range(5):
+        engine.record_event('tab_switch', float(i))
+    timestamps, scores = engine.history()
+    assert list(timestamps) == [2.0, 3.0, 4.0]
+    assert list(scores) == [0.0, 0.0, 0.0]
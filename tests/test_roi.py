@@ -0,0 +1,81 @@
+import types
+
+import numpy as np
+import pytest
+
+from proctoring.roi import FaceTracker, detection_box, downscale
+
+
+def detection(xmin, ymin, width, height):
+    box = types.SimpleNamespace(xmin=xmin, ymin=ymin, width=width, height=height)
+    return types.SimpleNamespace(location_data=types.SimpleNamespace(relative_bounding_box=box))
+
+
+def test_downscale_keeps_aspect_ratio_and_never_upscales():
+    pytest.importorskip('cv2')
+    frame = np.zeros((480, 640, 3), dtype=np.uint8)
+    assert downscale(frame, 320).shape == (240, 320, 3)
+    assert downscale(frame, 800) is frame
+
+
+def test_detection_box_is_xmin_ymin_xmax_ymax():
+    assert detection_box(detection(0.1, 0.2, 0.3, 0.4)) == pytest.approx([0.1, 0.2, 0.4, 0.6])
+
+
+def test_tracker_follows_the_largest_detection():
+    tracker = FaceTracker()
+    assert tracker.needs_detection()
+    tracker.update_from_detections([detection(0.0, 0.0, 0.1, 0.1), detection(0.5, 0.5, 0.4, 0.4)])
+    assert tracker.face_count == 2
+    assert tracker.box == pytest.approx([0.5, 0.5, 0.9, 0.9])
+    tracker.update_from_detections([])
+    assert (tracker.face_count, tracker.tracking) == (0, False)
+
+
+def test_tracker_redetects_every_interval_while_one_face_is_in_view():
+    tracker = FaceTracker(detect_interval=3)
+    tracker.update_from_detections([detection(0.4, 0.4, 0.2, 0.2)])
+    due = []
+    for _ in range(4):
+        tracker.advance()
+        due.append(tracker.needs_detection())
+    assert due == [False, False, True, True]
+
+
+def test_tracker_redetects_every_frame_while_several_faces_are_in_view():
+    tracker = FaceTracker(detect_interval=5)
+    tracker.update_from_detections([detection(0.4, 0.4, 0.2, 0.2)])
+    tracker.advance()
+    tracker.saw_faces(1)
+    assert not tracker.needs_detection()
+    tracker.saw_faces(2)
+    assert tracker.face_count == 2
+    assert tracker.needs_detection()
+
+
+def test_losing_the_face_keeps_only_a_fresh_count():
+    tracker = FaceTracker()
+    tracker.update_from_detections([detection(0.4, 0.4, 0.2, 0.2)])
+    # Detected this frame but the mesh found nothing: the detector's count still holds
+    tracker.lose()
+    assert (tracker.face_count, tracker.tracking) == (1, False)
+    tracker.update_from_detections([detection(0.4, 0.4, 0.2, 0.2)])
+    tracker.advance()
+    tracker.lose()
+    assert tracker.face_count == 0
+
+
+def test_landmarks_smooth_the_box():
+    tracker = FaceTracker(smoothing=0.5)
+    tracker.update_from_detections([detection(0.4, 0.4, 0.2, 0.2)])
+    points = np.array([[50.0, 50.0], [70.0, 70.0]], dtype=np.float32)
+    tracker.update_from_landmarks(points, 100, 100)
+    assert tracker.box == pytest.approx([0.45, 0.45, 0.65, 0.65])
+
+
+def test_crop_rect_adds_the_margin_and_stays_in_frame():
+    tracker = FaceTracker(margin=0.25)
+    tracker.update_from_detections([detection(0.4, 0.4, 0.2, 0.2)])
+    assert tracker.crop_rect(100, 200) == (35, 70, 65, 130)
+    tracker.update_from_detections([detection(0.0, 0.9, 0.4, 0.1)])
+    assert tracker.crop_rect(100, 100) == (0, 87, 50, 100)
@@ -0,0 +1,83 @@
+import types
+
+import numpy as np
+import pytest
+
+from proctoring import engine
+from proctoring.engine import FrameAnalyzer
+from proctoring.scheduler import InferenceScheduler, MotionDetector
+
+STILL = np.full((120, 160, 3), 100, dtype=np.uint8)
+MOVED = np.full((120, 160, 3), 200, dtype=np.uint8)
+
+
+def result(timestamp, face_count=1):
+    return types.SimpleNamespace(timestamp=timestamp, face_count=face_count)
+
+
+def run(scheduler, frames, fps=10.0, face_counts=None):
+    """Timestamps of the frames the scheduler chose to analyze"""
+    analyzed = []
+    for index, frame in enumerate(frames):
+        timestamp = index / fps
+        if scheduler.should_analyze(frame, timestamp):
+            analyzed.append(timestamp)
+            scheduler.observe(result(timestamp, face_counts[index] if face_counts else 1))
+    return analyzed
+
+
+class FakeMesh:
+    """One face per frame; records how often it actually ran"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def process(self, rgb_frame):
+        self.calls += 1
+        face = types.SimpleNamespace(landmark=[types.SimpleNamespace(x=0.5, y=0.5)] * 468)
+        return types.SimpleNamespace(multi_face_landmarks=[face])
+
+
+def test_motion_energy_is_relative_to_the_reference():
+    detector = MotionDetector()
+    energy, thumbnail = detector.energy(STILL)
+    assert energy is None
+    assert thumbnail.shape == (60, 80)
+    detector.set_reference(thumbnail)
+    assert detector.energy(STILL)[0] == 0.0
+    assert detector.energy(MOVED)[0] == pytest.approx(100 / 255)
+    # A different resolution has no comparable reference
+    assert detector.energy(STILL[:60])[0] is None
+
+
+def test_static_scene_is_analyzed_once_per_interval():
+    scheduler = InferenceScheduler(static_interval=1.0)
+    assert run(scheduler, [STILL] * 30) == [0.0, 1.0, 2.0]
+    assert scheduler.analyzed_ratio == pytest.approx(0.1)
+    assert not scheduler.escalated
+
+
+def test_motion_escalates_until_the_scene_is_quiet_for_hold():
+    scheduler = InferenceScheduler(static_interval=1.0, hold=0.5)
+    frames = [STILL] * 5 + [MOVED] * 20
+    assert run(scheduler, frames) == [0.0, 0.5, 0.6, 0.7, 0.8, 0.9, 2.0]
+
+
+def test_face_count_change_escalates():
+    scheduler = InferenceScheduler(static_interval=1.0, hold=0.3)
+    counts = [1] * 10 + [2] * 10
+    assert run(scheduler, [STILL] * 20, face_counts=counts) == [0.0, 1.0, 1.1, 1.2]
+    assert run(InferenceScheduler(static_interval=1.0, hold=0.3), [STILL] * 20) == [0.0, 1.0]
+
+
+def test_analyzer_carries_the_last_result_forward(monkeypatch):
+    if engine.cv2 is None:
+        monkeypatch.setattr(engine, 'cv2', pytest.importorskip('cv2'))
+    mesh = FakeMesh()
+    analyzer = FrameAnalyzer(face_mesh=mesh, mode='mesh', scheduler=InferenceScheduler(static_interval=1.0))
+    results = [analyzer.process(STILL, index / 10) for index in range(15)]
+    assert mesh.calls == 2
+    assert [r.analyzed for r in results[:3]] == [True, False, False]
+    assert results[10].analyzed
+    skipped = results[5]
+    assert (skipped.timestamp, skipped.face_count, skipped.blink_detected) == (0.5, 1, False)
@@ -0,0 +1,117 @@
+import time
+from concurrent.futures import wait
+
+import numpy as np
+import pytest
+
+from proctoring.engine import FrameResult
+from proctoring.server import FrameDropped, InferenceServer, ServerOverloaded
+
+# Seconds the fake analyzer spends on each frame
+FRAME_DELAY = 0.1
+# Blinks the fake analyzer still buffers until it is flushed
+BUFFERED_BLINKS = 10
+
+
+class SlowAnalyzer:
+    """Counts frames as blinks and reports each frame's mean; built inside the worker, so it must pickle by name"""
+
+    def __init__(self, mode):
+        self.mode = mode
+        self.frames = 0
+
+    def process(self, frame, timestamp=None):
+        time.sleep(FRAME_DELAY)
+        self.frames += 1
+        return FrameResult(timestamp=timestamp, face_count=1, left_ear=float(np.mean(frame)),
+                           blink_count=self.frames)
+
+    def flush(self):
+        return self.frames + BUFFERED_BLINKS
+
+
+def slow_analyzer_factory(mode):
+    return SlowAnalyzer(mode)
+
+
+@pytest.fixture(scope='module')
+def server():
+    server = InferenceServer(num_workers=1, max_pending=2, max_inflight_per_worker=1, max_sessions_per_worker=3,
+                             analyzer_factory=slow_analyzer_factory).start()
+    yield server
+    server.stop()
+
+
+def frame(value):
+    return np.full((4, 6, 3), value, dtype=np.uint8)
+
+
+def test_full_queue_drops_oldest_waiting_frame(server):
+    server.open_session('pressure')
+    futures = [server.submit('pressure', frame(i), float(i)) for i in range(6)]
+    assert server.session_pressure('pressure') == 1.0
+    wait(futures, timeout=10)
+    dropped = [i for i, future in enumerate(futures) if isinstance(future.exception(), FrameDropped)]
+    done = [future.result() for future in futures if future.exception() is None]
+    # At most one frame was in flight and two waiting; every older one was dropped
+    assert len(done) <= 3
+    assert len(dropped) == 6 - len(done)
+    assert [result.timestamp for result in done][-2:] == [4.0, 5.0]
+    assert done[-1].left_ear == 5.0
+    assert server.session_pressure('pressure') == 0.0
+    server.close_session('pressure')
+
+
+def test_flush_counts_every_frame_dispatched_before_it(server):
+    server.open_session('flush')
+    try:
+        for i in range(2):
+            server.submit('flush', frame(1), float(i)).result(10)
+        # In flight when the flush is sent, so it is analyzed first
+        inflight = server.submit('flush', frame(1), 2.0)
+        while server.stats()['pending']:
+            time.sleep(0.01)
+        assert server.flush_session('flush').result(10) == 3 + BUFFERED_BLINKS
+        assert inflight.result(10).blink_count == 3
+    finally:
+        server.close_session('flush')
+    with pytest.raises(KeyError):
+        server.flush_session('flush')
+
+
+def test_client_passes_frames_through_shared_memory(server):
+    client = server.open_session('client')
+    results = []
+    client.subscribe(results.append)
+    try:
+        first = client.process(frame(3), 1.0)
+        second = client.process(frame(9), 2.0)
+        assert client.ring is not None
+        assert (first.left_ear, second.left_ear) == (3.0, 9.0)
+        assert results == [first, second]
+        assert client.flush() == 2 + BUFFERED_BLINKS
+        assert client.blink_count == 2 + BUFFERED_BLINKS
+    finally:
+        client.close()
+    assert server.session_count == 0
+
+
+def test_closing_a_session_fails_its_waiting_frames(server):
+    server.open_session('closing')
+    futures = [server.submit('closing', frame(1), float(i)) for i in range(3)]
+    server.close_session('closing')
+    wait(futures, timeout=10)
+    assert any(isinstance(future.exception(), FrameDropped) for future in futures)
+    with pytest.raises(KeyError):
+        server.submit('closing', frame(1))
+
+
+def test_full_server_rejects_sessions(server):
+    for i in range(3):
+        server.open_session(f"full-{i}")
+    try:
+        with pytest.raises(ServerOverloaded):
+            server.open_session('one-too-many')
+    finally:
+        for i in range(3):
+            server.close_session(f"full-{i}")
@@ -0,0 +1,107 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from proctoring.shm import FrameRing
+
+
+@pytest.fixture
+def ring():
+    ring = FrameRing(3, 4 * 5 * 3)
+    yield ring
+    ring.close()
+
+
+def frame(value, shape=(4, 5, 3)):
+    return np.full(shape, value, dtype=np.uint8)
+
+
+def test_write_then_read(ring):
+    slot, seq = ring.write(frame(7), 1.5)
+    view, timestamp = ring.read(slot, seq)
+    assert timestamp == 1.5
+    assert view.shape == (4, 5, 3)
+    assert (view == 7).all()
+    assert ring.valid(slot, seq)
+    assert ring.owns(view)
+
+
+def test_sequence_numbers_increase_across_slots(ring):
+    refs = [ring.write(frame(i), float(i)) for i in range(4)]
+    assert [slot for slot, _ in refs] == [0, 1, 2, 0]
+    assert [seq for _, seq in refs] == [1, 2, 3, 4]
+
+
+def test_overwritten_slot_is_detected(ring):
+    first = ring.write(frame(1), 1.0)
+    for i in range(3):
+        ring.write(frame(2), 2.0 + i)
+    assert ring.read(*first) is None
+    assert not ring.valid(*first)
+
+
+def test_reserved_slot_is_invalid_until_commit(ring):
+    slot, seq = ring.write(frame(1), 1.0)
+    for _ in range(2):
+        ring.write(frame(2), 2.0)
+    view = ring.reserve((4, 5, 3))
+    # The slot being written no longer holds the old frame
+    assert not ring.valid(slot, seq)
+    assert ring.read(slot, seq) is None
+    view[:] = 9
+    slot, seq = ring.commit(view, 3.0)
+    assert (ring.read(slot, seq)[0] == 9).all()
+
+
+def test_commit_after_wraparound_is_rejected(ring):
+    stale = ring.reserve((4, 5, 3))
+    for _ in range(3):
+        ring.reserve((4, 5, 3))
+    assert ring.commit(stale, 1.0) is None
+
+
+def test_grayscale_frames(ring):
+    slot, seq = ring.write(frame(3, (4, 5)), 1.0)
+    view, _ = ring.read(slot, seq)
+    assert view.shape == (4, 5)
+
+
+def test_oversized_frames_do_not_fit(ring):
+    big = frame(0, (8, 8, 3))
+    assert not ring.fits(big)
+    assert ring.fits(frame(0))
+    assert not ring.fits(frame(0).astype(np.float32))
+    with pytest.raises(ValueError):
+        ring.reserve(big.shape)
+
+
+def test_owns_only_ring_views(ring):
+    assert not ring.owns(frame(0))
+    assert not ring.owns(None)
+
+
+def test_first_seq_continues_numbering():
+    ring = FrameRing(2, 16, first_seq=10)
+    try:
+        assert ring.write(frame(0, (4, 4)), 0.0) == (0, 10)
+    finally:
+        ring.close()
+
+
+def test_pickled_ring_attaches_to_same_memory(ring):
+    slot, seq = ring.write(frame(5), 4.0)
+    attached = pickle.loads(pickle.dumps(ring))
+    try:
+        assert not attached.owner
+        assert attached.name == ring.name
+        view, timestamp = attached.read(slot, seq)
+        assert timestamp == 4.0
+        assert (view == 5).all()
+        del view
+        # A frame overwritten by the owner is seen as gone by the attached side
+        for _ in range(3):
+            ring.write(frame(6), 5.0)
+        assert not attached.valid(slot, seq)
+    finally:
+        attached.close()
@@ -0,0 +1,93 @@
+import pickle
+
+import pytest
+
+from proctoring.stats import SessionStats
+
+# (timestamp, face_count, cumulative blinks)
+FRAMES = [(0.0, 1, 0), (0.5, 1, 1), (1.0, 0, 1), (1.5, 2, 1), (2.0, 1, 2), (2.5, 1, 2),
+          (3.0, 0, 2), (6.0, 1, 2), (6.5, 1, 3)]
+
+
+def record(frames, blink_offset=0):
+    stats = SessionStats()
+    for timestamp, face_count, blinks in frames:
+        stats.update(timestamp, face_count, blinks - blink_offset)
+    return stats
+
+
+def test_intervals_are_credited_to_earlier_frame():
+    stats = record(FRAMES).snapshot()
+    assert stats['frames'] == 9
+    assert stats['no_face_frames'] == 2
+    assert stats['multi_face_frames'] == 1
+    assert stats['single_face_time'] == pytest.approx(2.5)
+    assert stats['no_face_time'] == pytest.approx(0.5)
+    assert stats['multi_face_time'] == pytest.approx(0.5)
+    # The 3s stall after t=3.0 is longer than max_frame_gap
+    assert stats['tracked_time'] == pytest.approx(3.5)
+    assert stats['blink_count'] == 3
+
+
+@pytest.mark.parametrize('split', range(1, len(FRAMES)))
+def test_merged_chunks_match_single_pass(split):
+    first = record(FRAMES[:split])
+    # Each chunk counts its own blinks from zero
+    second = record(FRAMES[split:], blink_offset=FRAMES[split - 1][2])
+    assert first.merge(second).snapshot() == pytest.approx(record(FRAMES).snapshot())
+
+
+def test_merge_with_empty_stats():
+    stats = record(FRAMES)
+    expected = stats.snapshot()
+    assert stats.merge(SessionStats()).snapshot() == expected
+    merged = SessionStats().merge(stats)
+    assert merged.snapshot() == expected
+    merged.update(7.0, 1, 4)
+    assert merged.frames == 10
+    assert stats.frames == 9
+
+
+def test_merge_ignores_gap_between_distant_chunks():
+    first = record(FRAMES[:3])
+    second = record([(t + 100, f, b) for t, f, b in FRAMES[3:]])
+    merged = first.merge(second).snapshot()
+    assert merged['no_face_time'] == pytest.approx(0.0)
+    assert merged['last_timestamp'] == pytest.approx(106.5)
+
+
+def test_pickle_round_trip():
+    stats = pickle.loads(pickle.dumps(record(FRAMES)))
+    stats.update(7.0, 1, 3)
+    assert stats.frames == 10
+    assert stats.single_face_time == pytest.approx(3.0)
+
+
+@pytest.mark.parametrize('gap, credited', [(0.5, 0.5), (2.0, 2.0), (2.01, 0.0), (10.0, 0.0)])
+def test_gap_is_credited_only_up_to_max_frame_gap(gap, credited):
+    stats = record([(0.0, 0, 0), (gap, 1, 0)])
+    assert stats.no_face_time == pytest.approx(credited)
+    assert stats.single_face_time == 0.0
+
+
+def test_max_frame_gap_is_configurable():
+    stats = SessionStats(max_frame_gap=5.0)
+    stats.update(0.0, 2, 0)
+    stats.update(4.0, 1, 0)
+    assert stats.multi_face_time == pytest.approx(4.0)
+
+
+@pytest.mark.parametrize('dt', [0.0, -1.0])
+def test_repeated_or_out_of_order_timestamps_add_no_time(dt):
+    stats = record([(5.0, 0, 0), (5.0 + dt, 0, 0), (6.0, 1, 0)])
+    assert stats.frames == 3
+    assert stats.no_face_frames == 2
+    # Only the interval from the frame just before t=6 counts
+    assert stats.no_face_time == pytest.approx(1.0 - dt)
+
+
+def test_frames_after_a_stall_are_tracked_again():
+    stats = record([(0.0, 1, 0), (1.0, 1, 0), (30.0, 1, 0), (31.0, 2, 0), (31.5, 2, 0)])
+    assert stats.single_face_time == pytest.approx(2.0)
+    assert stats.multi_face_time == pytest.approx(0.5)
+    assert stats.snapshot()['first_timestamp'] == 0.0
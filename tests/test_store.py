@@ -0,0 +1,99 @@
+import os
+
+import numpy as np
+import pytest
+
+from proctoring.report import build_report, frame_timeline
+from proctoring.stats import SessionStats
+from proctoring.store import FrameStore
+
+
+def fill(store, count, start=0):
+    for i in range(start, start + count):
+        store.append(timestamps=float(i), face_counts=i % 3, blink_counts=i // 2)
+
+
+def test_grows_by_doubling_and_keeps_frames():
+    store = FrameStore(initial_capacity=4)
+    fill(store, 9)
+    assert len(store) == 9
+    assert store.capacity == 16
+    np.testing.assert_array_equal(store.timestamps, np.arange(9, dtype=np.float64))
+    np.testing.assert_array_equal(store.face_counts, np.arange(9) % 3)
+    assert store.last('blink_counts') == 4
+    assert store.face_counts.dtype == np.int8
+
+
+def test_columns_are_views():
+    store = FrameStore(initial_capacity=8)
+    fill(store, 5)
+    assert np.shares_memory(store.timestamps, store.column('timestamps'))
+    assert store.timestamps.base is not None
+
+
+def test_spills_to_disk_past_memory_limit(tmp_path):
+    store = FrameStore(initial_capacity=4, spill_dir=str(tmp_path), max_memory_frames=8)
+    fill(store, 8)
+    assert not store.spilled
+    assert os.listdir(tmp_path) == []
+    fill(store, 20, start=8)
+    assert store.spilled
+    assert store.nbytes == 0
+    assert isinstance(store.column('timestamps').base, np.memmap)
+    assert len(os.listdir(tmp_path)) == len(store.dtypes)
+    np.testing.assert_array_equal(store.timestamps, np.arange(28, dtype=np.float64))
+    np.testing.assert_array_equal(store.blink_counts, np.arange(28) // 2)
+
+
+def test_close_removes_spill_files(tmp_path):
+    store = FrameStore(initial_capacity=4, spill_dir=str(tmp_path), max_memory_frames=4)
+    fill(store, 10)
+    assert store.spilled
+    store.close()
+    assert os.listdir(tmp_path) == []
+    assert len(store) == 0
+    assert not store.spilled
+
+
+def test_appending_after_close_starts_new_columns(tmp_path):
+    store = FrameStore(initial_capacity=4, spill_dir=str(tmp_path), max_memory_frames=4)
+    fill(store, 10)
+    store.close()
+    fill(store, 3)
+    np.testing.assert_array_equal(store.timestamps, [0.0, 1.0, 2.0])
+    store.close()
+    assert os.listdir(tmp_path) == []
+
+
+def test_timeline_buckets_frames():
+    store = FrameStore()
+    # (seconds from start, faces, cumulative blinks)
+    frames = [(0, 1, 0), (30, 0, 1), (59, 2, 2), (61, 1, 2), (150, 1, 5)]
+    for offset, faces, blinks in frames:
+        store.append(timestamps=1000.0 + offset, face_counts=faces, blink_counts=blinks)
+    assert frame_timeline(store, bucket_seconds=60.0) == [
+        {'start_seconds': 0.0, 'frames': 3, 'no_face_frames': 1, 'multi_face_frames': 1, 'blinks': 2},
+        {'start_seconds': 60.0, 'frames': 1, 'no_face_frames': 0, 'multi_face_frames': 0, 'blinks': 0},
+        {'start_seconds': 120.0, 'frames': 1, 'no_face_frames': 0, 'multi_face_frames': 0, 'blinks': 3},
+    ]
+
+
+def test_timeline_ignores_blink_counter_restart():
+    store = FrameStore()
+    for t, blinks in [(0, 0), (1, 2), (2, 0), (3, 1)]:
+        store.append(timestamps=float(t), face_counts=1, blink_counts=blinks)
+    assert [bucket['blinks'] for bucket in frame_timeline(store)] == [3]
+
+
+def test_report_includes_timeline():
+    assert frame_timeline(FrameStore()) == []
+    report = build_report(SessionStats().snapshot(), 0, 0, timeline=[])
+    assert report['timeline'] == []
+    assert 'timeline' not in build_report(SessionStats().snapshot(), 0, 0)
+
+
+@pytest.mark.parametrize('count', [0, 1, 4097])
+def test_timeline_counts_every_frame(count):
+    store = FrameStore()
+    fill(store, count)
+    assert sum(bucket['frames'] for bucket in frame_timeline(store, bucket_seconds=100.0)) == count
@@ -0,0 +1,159 @@
+import json
+import time
+import urllib.error
+import urllib.request
+
+import pytest
+
+from proctoring.quizserver import QuizStore, start_quiz_server
+from proctoring.risk import RiskEngine
+from proctoring.tabs import (BLUR, FOCUS, HIDDEN, VISIBLE, TabActivityTracker, TabInbox, clock_offset,
+                             parse_events)
+
+
+def test_parse_events_skips_malformed_entries():
+    events = parse_events([[1, "h", 1500], [2, "v"], "junk", [3, "v", "x"], ["4", "f", 4000]])
+    assert events == [(1, "h", 1.5), (4, "f", 4.0)]
+    assert parse_events({"events": []}) == []
+
+
+def test_clock_offset_from_page_clock():
+    assert clock_offset(130000, [], 10.0) == pytest.approx(-120.0)
+    # Without the page's clock the newest event is taken as just sent
+    assert clock_offset(None, [[1, "h", 5000], [2, "v", 7000]], 10.0) == pytest.approx(3.0)
+    assert clock_offset("bad", [], 10.0) == 0.0
+    assert parse_events([[1, "h", 5000]], offset=-3.0) == [(1, "h", 2.0)]
+
+
+def test_inbox_drops_resent_events_and_acks_highest():
+    inbox = TabInbox()
+    assert inbox.post([(1, HIDDEN, 1.0), (2, VISIBLE, 2.0)]) == 2
+    # A retry after a lost reply resends events the inbox already has
+    assert inbox.post([(2, VISIBLE, 2.0), (3, BLUR, 3.0)]) == 3
+    assert [seq for seq, _, _ in inbox.drain()] == [1, 2, 3]
+    assert inbox.drain() == []
+
+
+def test_inbox_tracks_when_listener_last_posted():
+    inbox = TabInbox()
+    assert inbox.silent_for(inbox.opened + 30) == pytest.approx(30)
+    # Heartbeats post no events but still count as contact
+    inbox.post([])
+    assert inbox.silent_for(inbox.last_post + 2) == pytest.approx(2)
+    assert inbox.drain() == []
+
+
+def test_inbox_keeps_only_latest_events():
+    inbox = TabInbox(max_events=2)
+    inbox.post([(i, HIDDEN, float(i)) for i in range(1, 6)])
+    assert [seq for seq, _, _ in inbox.drain()] == [4, 5]
+
+
+def test_tracker_counts_switches_and_away_time():
+    tracker = TabActivityTracker()
+    switches = tracker.ingest([(3, VISIBLE, 13.0), (1, HIDDEN, 10.0), (2, BLUR, 11.0), (4, FOCUS, 14.0),
+                               (5, BLUR, 20.0)])
+    assert switches == [10.0, 20.0]
+    # Events already applied are ignored
+    assert tracker.ingest([(4, FOCUS, 14.0)]) == []
+    snapshot = tracker.snapshot(now=25.0)
+    assert snapshot['switches'] == 2
+    assert snapshot['away_seconds'] == pytest.approx(9.0)
+    assert snapshot['longest_away_seconds'] == pytest.approx(5.0)
+    assert snapshot['away']
+
+
+def test_tracker_accepts_restarted_sequence_after_reload():
+    tracker = TabActivityTracker()
+    tracker.ingest([(1, HIDDEN, 1.0), (2, VISIBLE, 2.0)])
+    tracker.reset_sequence()
+    assert tracker.ingest([(1, HIDDEN, 5.0)]) == [5.0]
+
+
+def test_inboxes_close_separately_from_quizzes():
+    store = QuizStore()
+    quiz_token, _ = store.register({'questions': []})
+    token, inbox = store.open_inbox()
+    store.remove(token)
+    assert store.inbox(token) is inbox
+    store.close_inbox(token)
+    assert store.inbox(token) is None
+    assert store.get(quiz_token) is not None
+
+
+def test_idle_inboxes_are_dropped():
+    store = QuizStore(inbox_max_idle=60.0)
+    stale, stale_inbox = store.open_inbox()
+    active, active_inbox = store.open_inbox()
+    stale_inbox.opened -= 120
+    active_inbox.opened -= 120
+    active_inbox.post([])
+    store.open_inbox()
+    assert store.inbox(stale) is None
+    assert store.inbox(active) is active_inbox
+
+
+@pytest.fixture
+def server():
+    server, store = start_quiz_server(port=0)
+    yield f"http://127.0.0.1:{server.server_address[1]}", store
+    server.shutdown()
+    server.server_close()
+
+
+def post(url, body):
+    request = urllib.request.Request(url, data=body.encode('utf-8'), method='POST')
+    with urllib.request.urlopen(request, timeout=5) as response:
+        return response.headers, json.loads(response.read())
+
+
+def test_tabs_endpoint_posts_to_inbox(server):
+    url, store = server
+    token, inbox = store.open_inbox()
+    body = {'events': [[1, "b", 1000], [2, "f", 3000]], 'now': 4000}
+    before = time.time()
+    headers, reply = post(f"{url}/api/{token}/tabs", json.dumps(body))
+    after = time.time()
+    assert reply == {'ack': 2}
+    assert headers['Access-Control-Allow-Origin'] == '*'
+    (_, blur, blurred), (_, focus, focused) = inbox.drain()
+    assert (blur, focus) == ("b", "f")
+    assert before - 3.0 <= blurred <= after - 3.0
+    assert focused - blurred == pytest.approx(2.0)
+
+
+@pytest.mark.parametrize('skew', [120.0, -120.0])
+def test_skewed_page_clock_does_not_shift_risk_windows(server, skew):
+    url, store = server
+    token, inbox = store.open_inbox()
+    now = time.time()
+    engine = RiskEngine()
+    tracker = TabActivityTracker()
+    for i in range(31):
+        engine.observe_frame(now - 30 + i, 0, 0)
+    page_now = (now + skew) * 1000
+    post(f"{url}/api/{token}/tabs", json.dumps({'events': [[1, "h", page_now - 500]], 'now': page_now}))
+    for switch_time in tracker.ingest(inbox.drain()):
+        assert abs(switch_time - now) < 5.0
+        engine.record_event('tab_switch', switch_time)
+    scores = engine.rule_scores()
+    assert scores['tab_switches'] == pytest.approx(20.0)
+    assert scores['no_face'] == pytest.approx(50.0)
+    assert tracker.snapshot(time.time())['away_seconds'] < 5.0
+
+
+def test_tabs_endpoint_rejects_unknown_token_and_bad_body(server):
+    url, store = server
+    token, _ = store.open_inbox()
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(f"{url}/api/unknown/tabs", '{"events": []}')
+    assert error.value.code == 404
+    # Error replies must be readable from the exam page's origin too
+    assert error.value.headers['Access-Control-Allow-Origin'] == '*'
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(f"{url}/api/{token}/tabs", 'not json')
+    assert error.value.code == 400
+    store.close_inbox(token)
+    with pytest.raises(urllib.error.HTTPError) as error:
+        post(f"{url}/api/{token}/tabs", '{"events": []}')
+    assert error.value.code == 404